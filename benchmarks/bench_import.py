@@ -0,0 +1,65 @@
+"""
+Measures the time to import the library's modules in a fresh interpreter, and checks the heavy dependencies are only
+loaded when used.
+
+    python benchmarks/bench_import.py [--repeat N]
+
+Each module is imported --repeat times in a new process, the median import time is reported. The exit code is 1 if
+importing a module loads one of the lazily imported dependencies.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = [
+    'pyfetchtv.api.json_objects.set_top_box',
+    'pyfetchtv.api.json_objects.epg',
+    'pyfetchtv.api.fetchtv',
+    'pyfetchtv.api.fetchtv_manager',
+]
+
+# Loaded when first used: searching the EPG, JSONPath lookups, connecting and making requests
+LAZY_DEPENDENCIES = ['fuzzy_match', 'numpy', 'jsonpath_ng', 'websocket', 'requests', 'http.server', 'opentelemetry']
+
+_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, *[m for m in {lazy!r} if m in sys.modules])
+'''
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """
+    :return: Seconds to import the module in a new interpreter, and the lazy dependencies it loaded
+    """
+    output = subprocess.run([sys.executable, '-c', _SCRIPT.format(module=module, lazy=LAZY_DEPENDENCIES)],
+                            cwd=ROOT, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    values = output.strip().split('\n')[-1].split()
+    return float(values[0]), values[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<45} {'ms':>8}  eagerly loaded")
+    for module in MODULES:
+        results = [measure(module) for _ in range(args.repeat)]
+        loaded = sorted({m for _, modules in results for m in modules})
+        failed = failed or bool(loaded)
+        print(f"{module:<45} {statistics.median(e for e, _ in results) * 1000:>8.1f}  {', '.join(loaded)}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures inbound websocket message throughput, on_message -> process_message -> publish.
+
+Replays frames recorded in a MessageJournal directory, or synthetic frames when no journal is given:
+    python benchmarks/bench_messages.py [--journal DIR] [--count N] [--boxes N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyfetchtv.api.fetchtv import FetchTV  # noqa: E402
+from pyfetchtv.api.fetchtv_messages import FetchTvMessageHandler  # noqa: E402
+from pyfetchtv.api.helpers.journal import MessageJournal, JournalEntry  # noqa: E402
+from pyfetchtv.tests import fixtures  # noqa: E402
+
+
+def synthetic_frames(count: int, boxes: int) -> List[str]:
+    terminal_ids = [f'box{i}' for i in range(boxes)]
+    recordings = [fixtures.recording_json(i, series_id=f's{i % 20}') for i in range(200)]
+    future = {'data': [fixtures.recording_json(1000 + i) for i in range(20)]}
+    frames = [fixtures.frame(t, 'I_AM_ALIVE', fixtures.box_json(t, channels=40, recordings=recordings))
+              for t in terminal_ids]
+    templates = [
+        lambda t, i: fixtures.media_state_frame(t, str(i % 40 + 1), 'PLAYING'),
+        lambda t, i: fixtures.frame(t, 'PAUSED'),
+        lambda t, i: fixtures.frame(t, 'UNPAUSED'),
+        lambda t, i: fixtures.frame(t, 'PONG'),
+        lambda t, i: json.dumps({'sender': t, 'message': dict(type='FUTURE_RECORDINGS_LIST', **future)}),
+        lambda t, i: fixtures.frame(t, 'RECORDINGS_UPDATE', {
+            'activeRecordings': [i % 200],
+            'recordingUpdates': [{'eventName': 'RECORD_PROGRAM_START',
+                                  'recording': fixtures.recording_json(i % 200, series_id=f's{i % 20}')}]}),
+    ]
+    for i in range(count):
+        frames.append(templates[i % len(templates)](terminal_ids[i % boxes], i))
+    return frames
+
+
+def journal_frames(directory: str) -> List[str]:
+    journal = MessageJournal(directory)
+    frames = [json.dumps(e.data) for e in journal.replay(kinds=[JournalEntry.RAW])]
+    journal.close()
+    return frames
+
+
+def run(frames: List[str], subscriber: bool, **fetchtv_options) -> float:
+    fetchtv = FetchTV(send_rate_per_sec=0, **fetchtv_options)
+    if subscriber:
+        fetchtv.add_subscriber('bench', lambda msg: None)
+    handler = FetchTvMessageHandler('bench', fetchtv, send_rate_per_sec=0)
+    try:
+        start = time.perf_counter()
+        for frame in frames:
+            handler.on_message(frame)
+        return time.perf_counter() - start
+    finally:
+        handler.close()
+        fetchtv.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--journal', help='MessageJournal directory of recorded frames')
+    parser.add_argument('--count', type=int, default=20000, help='Number of synthetic frames')
+    parser.add_argument('--boxes', type=int, default=2, help='Number of synthetic boxes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+    frames = journal_frames(args.journal) if args.journal else synthetic_frames(args.count, args.boxes)
+    for subscriber in [False, True]:
+        best = min(run(frames, subscriber) for _ in range(args.repeat))
+        label = 'with subscriber' if subscriber else 'no subscriber'
+        print(f'{label:>16}: {len(frames)} messages in {best:.3f}s, {len(frames) / best:,.0f} messages/second')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmarks the EPG and message hot paths, reporting time and peak memory against stored baselines.
+
+    python benchmarks/bench_suite.py [--channels N] [--days N] [--journal DIR] [--save] [--tolerance 0.25]
+
+The EPG is served by the local stand-in from synthetic data, sized by --channels and --days. Each case reports the
+best time of --repeat runs and the peak memory allocated during one run. Results are compared to
+benchmarks/baselines.json, a case is a regression when it is slower or uses more memory than its baseline by more
+than --tolerance, and the exit code is 1 if any case regressed. --save stores the results as the new baselines.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_messages import synthetic_frames, journal_frames, run as run_messages  # noqa: E402
+from pyfetchtv.api.fetchtv import FetchTV  # noqa: E402
+from pyfetchtv.api.json_objects.epg import Program  # noqa: E402
+from pyfetchtv.api.json_objects.recording import Recording  # noqa: E402
+from pyfetchtv.api.json_objects.set_top_box import SetTopBox  # noqa: E402
+from pyfetchtv.testing import synthetic  # noqa: E402
+from pyfetchtv.testing.server import FetchTvStandIn  # noqa: E402
+from pyfetchtv.testing.synthetic import SyntheticConfig  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+class Case:
+
+    def __init__(self, name: str, action: Callable[[], object], repeat: int):
+        self.name = name
+        self.action = action
+        self.repeat = repeat
+
+    def measure(self) -> Dict[str, float]:
+        self.action()  # warm up caches
+        best = min(self.__time() for _ in range(self.repeat))
+        tracemalloc.start()
+        try:
+            self.action()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {'seconds': best, 'peak_kb': peak / 1024}
+
+    def __time(self) -> float:
+        start = time.perf_counter()
+        self.action()
+        return time.perf_counter() - start
+
+
+def epg_cases(fetchtv: FetchTV, config: SyntheticConfig, repeat: int) -> List[Case]:
+    epg = fetchtv.epg
+    rows = [row for programs in epg['channels'].values() for row in programs]
+    box = next(iter(fetchtv.get_boxes().values()))
+    channels = list(box.dvb_channels.values())
+    now = int(time.time() * 1000)
+    return [
+        Case(f'Program x{len(rows)}', lambda: [Program(row, epg['synopses']) for row in rows], repeat),
+        Case(f'get_epg {config.channels}ch x {config.epg_days}d', fetchtv.get_epg, repeat),
+        Case(f'get_program x{len(channels)}', lambda: [fetchtv.get_program(c, now) for c in channels], repeat),
+        Case('find_program', lambda: fetchtv.find_program('Program 7'), repeat),
+    ]
+
+
+def object_cases(repeat: int) -> List[Case]:
+    config = SyntheticConfig(channels=50, recordings=500, series=20)
+    box_json = synthetic.synthetic_box_json(config, 'bench')
+    box = SetTopBox(box_json)
+    recordings = list(box.recordings.items.values())
+    return [
+        Case('SetTopBox.__init__ 500 recordings', lambda: SetTopBox(box_json), repeat),
+        Case('SetTopBox.to_dict', box.to_dict, repeat),
+        Case(f'Recording.__init__ x{len(recordings)}',
+             lambda: [Recording(box, item) for item in box_json['recordings']], repeat),
+        Case(f'Recording.to_dict x{len(recordings)}', lambda: [r.to_dict() for r in recordings], repeat),
+    ]
+
+
+def message_cases(frames: List[str], repeat: int) -> List[Case]:
+    return [
+        Case(f'on_message x{len(frames)}', lambda: run_messages(frames, False), repeat),
+        Case(f'on_message x{len(frames)} subscribed', lambda: run_messages(frames, True), repeat),
+        Case(f'on_message x{len(frames)} snapshot diffs', lambda: run_messages(frames, True, snapshot_diffs=True),
+             repeat),
+    ]
+
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], tolerance: float) -> bool:
+    regressed = False
+    print(f"{'case':<40} {'ms':>10} {'base ms':>10} {'peak KB':>10} {'base KB':>10}")
+    for name, result in results.items():
+        base = baselines.get(name)
+        flags = []
+        if base:
+            if result['seconds'] > base['seconds'] * (1 + tolerance):
+                flags.append('SLOWER')
+            if result['peak_kb'] > base['peak_kb'] * (1 + tolerance):
+                flags.append('MORE MEMORY')
+        regressed = regressed or bool(flags)
+        print(f"{name:<40} {result['seconds'] * 1000:>10.2f} "
+              f"{base['seconds'] * 1000 if base else float('nan'):>10.2f} "
+              f"{result['peak_kb']:>10.0f} {base['peak_kb'] if base else float('nan'):>10.0f} {' '.join(flags)}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=50, help='Synthetic EPG channels')
+    parser.add_argument('--days', type=int, default=2, help='Synthetic EPG days')
+    parser.add_argument('--journal', help='MessageJournal directory of recorded frames')
+    parser.add_argument('--count', type=int, default=5000, help='Number of synthetic frames')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save', action='store_true', help='Store the results as the baselines')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    config = SyntheticConfig(channels=args.channels, epg_days=args.days)
+    frames = journal_frames(args.journal) if args.journal else synthetic_frames(args.count, 2)
+    results = {}
+    with FetchTvStandIn(config) as stand_in:
+        fetchtv = FetchTV(send_rate_per_sec=0, **stand_in.fetchtv_options)
+        try:
+            fetchtv.login(config.activation_code, config.pin)
+            fetchtv.epg_ready.result(30)
+            cases = epg_cases(fetchtv, config, args.repeat)
+            cases += object_cases(args.repeat) + message_cases(frames, max(1, args.repeat // 2))
+            for case in cases:
+                results[case.name] = case.measure()
+        finally:
+            fetchtv.close()
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as file:
+            baselines = json.load(file).get('results', {})
+    regressed = compare(results, baselines, args.tolerance)
+    if args.save:
+        with open(BASELINES, 'w') as file:
+            json.dump({'saved': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                       'results': results}, file, indent=2)
+        print(f'Saved baselines to {BASELINES}')
+    elif regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -85,3 +85,8 @@ class MessageTypeIn(Enum):
     SERIES_ADDED = 53
     RECORDINGS_DELETE = 54
     RECORD_PROGRAM_START = 55
+    BOX_CHANGED = 56
+
+
+# Lookup of received message type names, avoids scanning the enumeration for each message
+MESSAGE_TYPES_IN = {e.name: e for e in MessageTypeIn}
@@ -0,0 +1,15 @@
+from enum import Enum, unique
+
+
+@unique
+class OverflowPolicy(Enum):
+    """
+    What to do when a subscriber dispatch queue is full.
+    """
+    # Wait for space in the queue, applying back pressure to the websocket thread
+    BLOCK = 1
+    # Discard the oldest queued message to make room
+    DROP_OLDEST = 2
+    # Remove a queued message with the same terminal, group and command and queue the new one at the tail,
+    # otherwise drop the oldest
+    COALESCE = 3
@@ -0,0 +1,14 @@
+from enum import Enum, unique
+
+
+@unique
+class QueueResult(Enum):
+    """
+    What happened to a command put on the outbound queue.
+    """
+    # Queued, or sent straight away when rate limiting is off
+    QUEUED = 1
+    # Answered by an identical command already queued
+    COALESCED = 2
+    # Discarded, the queue is closed
+    CLOSED = 3
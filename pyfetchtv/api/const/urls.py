@@ -1,7 +1,11 @@
 URL_BASE_STATIC = 'https://static.fetchtv.com.au'
 URL_BASE_APIS = 'https://apis.fetchtv.com.au/'
-URL_AUTHENTICATE = f'{URL_BASE_APIS}/v3/authenticate'
+PATH_AUTHENTICATE = '/v3/authenticate'
+PATH_EPG = '/v2/epg/programslist'
+PATH_EPG_CHANNELS = '/v2/epg/channels'
+PATH_CATALOGUE = '/v3/vod/catalogue/tab'
+URL_AUTHENTICATE = f'{URL_BASE_APIS}{PATH_AUTHENTICATE}'
 URL_MESSAGES = 'wss://messages.fetchtv.com.au/v2/message/ws/messages'
-URL_EPG = f'{URL_BASE_APIS}/v2/epg/programslist'
-URL_EPG_CHANNELS = f'{URL_BASE_APIS}/v2/epg/channels'
-URL_CATALOGUE = f'{URL_BASE_APIS}/v3/vod/catalogue/tab'
+URL_EPG = f'{URL_BASE_APIS}{PATH_EPG}'
+URL_EPG_CHANNELS = f'{URL_BASE_APIS}{PATH_EPG_CHANNELS}'
+URL_CATALOGUE = f'{URL_BASE_APIS}{PATH_CATALOGUE}'
@@ -1,17 +1,28 @@
+import itertools
 import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from fuzzy_match import algorithims
 
-import requests
 import logging
 
-from typing import Optional, Dict, List, Callable
+from typing import Optional, Dict, List, Callable, Iterable, TYPE_CHECKING
 
-from pyfetchtv.api.const.urls import URL_AUTHENTICATE, URL_MESSAGES, URL_EPG, URL_EPG_CHANNELS
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.const.overflow_policy import OverflowPolicy
+from pyfetchtv.api.const.urls import URL_BASE_APIS, URL_MESSAGES, PATH_AUTHENTICATE, PATH_EPG, PATH_EPG_CHANNELS
 from pyfetchtv.api.fetchtv_box import FetchTvBox
+from pyfetchtv.api.fetchtv_catalogue import FetchTvCatalogue
 from pyfetchtv.api.fetchtv_interface import FetchTvInterface, SubscriberMessage
 from pyfetchtv.api.fetchtv_messages import FetchTvMessageHandler
+from pyfetchtv.api.helpers.dispatcher import SubscriberDispatcher
+from pyfetchtv.api.helpers.epg_store import EpgStore
+from pyfetchtv.api.helpers.http_transport import HttpTransport
+from pyfetchtv.api.helpers.journal import MessageJournal
+from pyfetchtv.api.helpers.metrics import Gauge, MetricsRegistry, SIZE_BUCKETS
+from pyfetchtv.api.helpers.scheduler import Scheduler
+from pyfetchtv.api.helpers.subscriptions import SubscriptionTable
+from pyfetchtv.api.helpers.tracing import Tracer
 from pyfetchtv.api.json_objects.account import Account
 from pyfetchtv.api.json_objects.channel import Channel
 from pyfetchtv.api.json_objects.epg import Program
@@ -19,6 +30,10 @@ from pyfetchtv.api.json_objects.epg_channel import EpgChannel
 from pyfetchtv.api.json_objects.epg_region import EpgRegion
 from pyfetchtv.api.json_objects.set_top_box import SetTopBox
 
+if TYPE_CHECKING:
+    from requests.adapters import HTTPAdapter
+    from pyfetchtv.api.helpers.recordings_store import RecordingsStore
+
 STANDARD_HEADERS = {
     "Accept": "application/json",
     "X-FTV-Capabilities": "no_pin,android,v3.21.1.4988,tenplay_v2",
@@ -27,28 +42,55 @@ STANDARD_HEADERS = {
     "Accept-Encoding": "gzip, deflate, br"
 }
 
+EPG_REFRESH_SEC = 60 * 60
+# The longest an EPG update waits for boxes to stop reporting
+EPG_DEBOUNCE_MAX_SEC = 5
+
 logger = logging.getLogger(__name__)
 
+# Numbers the default instance label of each FetchTV
+_INSTANCES = itertools.count(1)
+
+
+def _resolve(future: Future, result):
+    if not future.done():
+        try:
+            future.set_result(result)
+        except Exception:
+            # Completed or cancelled by another thread
+            pass
+
 
 class FetchTV(FetchTvInterface):
 
     def publish_to_subscribers(self, msg: SubscriberMessage):
-        thread = threading.Thread(target=self.__publish_runnable, args=(msg,))
-        thread.start()
+        self.__published_counter.inc(msg.group.name)
+        self.__dispatcher.publish(msg)
 
     def __publish_runnable(self, msg: SubscriberMessage):
-        for callback in self.__subscribers.values():
+        callbacks = self.__subscribers.match(msg.group, msg.command, msg.terminal_id)
+        span = self.__tracer.start_span('dispatch', group=msg.group.name, command=msg.command.name,
+                                        terminal_id=msg.terminal_id, callbacks=len(callbacks))
+        for callback in callbacks:
+            start = time.perf_counter()
             try:
                 callback(msg)
             except:
                 logger.error('Callback to subscriber failed', exc_info=True)
+            self.__callback_histogram.observe(time.perf_counter() - start)
+        span.finish()
+
+    def has_subscribers(self, group: MessageType, command: MessageTypeIn, terminal_id: str) -> bool:
+        return len(self.__subscribers.match(group, command, terminal_id)) > 0
 
-    def add_subscriber(self, subscriber_id: str, callback: Callable[[SubscriberMessage], None]):
-        self.__subscribers[subscriber_id] = callback
+    def add_subscriber(self, subscriber_id: str, callback: Callable[[SubscriberMessage], None],
+                       groups: Optional[Iterable[MessageType]] = None,
+                       commands: Optional[Iterable[MessageTypeIn]] = None,
+                       terminal_ids: Optional[Iterable[str]] = None):
+        self.__subscribers.add(subscriber_id, callback, groups, commands, terminal_ids)
 
     def remove_subscriber(self, subscriber_id: str):
-        if subscriber_id in self.__subscribers.keys():
-            del self.__subscribers[subscriber_id]
+        self.__subscribers.remove(subscriber_id)
 
     @property
     def epg(self) -> dict:
@@ -58,6 +100,52 @@ class FetchTV(FetchTvInterface):
     def messages(self):
         return self.__message_handler.messages
 
+    def replay_messages(self, callback: Callable[[SubscriberMessage], None], since_msec: int = 0) -> int:
+        """
+        Feed journaled subscriber messages to a callback, requires a journal.
+        :param callback: Called with each message in the order published
+        :param since_msec: Only replay messages at or after this time, in milliseconds since the epoch
+        :return: The number of messages replayed
+        """
+        return self.__message_handler.replay_messages(callback, since_msec)
+
+    def rebuild_state(self, since_msec: int = 0) -> int:
+        """
+        Rebuild box state from journaled websocket messages, requires a journal.
+        :param since_msec: Only replay messages at or after this time, in milliseconds since the epoch
+        :return: The number of messages replayed
+        """
+        return self.__message_handler.rebuild_state(since_msec)
+
+    @property
+    def dispatch_metrics(self) -> dict:
+        return self.__dispatcher.metrics
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """
+        :return: The metrics registry, disabled unless one was passed in
+        """
+        return self.__metrics
+
+    @property
+    def tracer(self) -> Tracer:
+        """
+        :return: The tracer, add a TraceHook to receive spans
+        """
+        return self.__tracer
+
+    @property
+    def http_metrics(self) -> dict:
+        """
+        :return: HTTP requests, retries and failures, and connection reuse, across the pool when it is shared
+        """
+        return self.__transport.metrics
+
+    @property
+    def outbound_metrics(self) -> dict:
+        return self.__message_handler.outbound_metrics
+
     def __enter__(self):
         return self
 
@@ -65,40 +153,123 @@ class FetchTV(FetchTvInterface):
         self.close()
 
     def __update_epg_periodic(self):
-        while self.__connected:
+        if self.__connected:
             self.__update_epg()
-            for _ in range(60 * 60):  # wait for an hour
-                if not self.__connected:
-                    break
-                time.sleep(1)
-
-    def __update_epg(self):
-        if not self.__epg_channels:
-            response = self.__request('get epg channels', URL_EPG_CHANNELS, {})
+
+    @property
+    def epg_ready(self) -> Future:
+        """
+        :return: Completes with the EPG once it is first received after login
+        """
+        return self.__epg_ready
+
+    @property
+    def boxes_ready(self) -> Future:
+        """
+        :return: Completes with the boxes once every active box on the account has reported its state after login,
+            or with the boxes reported so far after boxes_ready_timeout_sec, e.g. when a box is switched off
+        """
+        return self.__boxes_ready
+
+    def __schedule_now_next(self):
+        # Refresh media state when the earliest current program across the boxes ends, so subscribers see
+        # the next program without polling
+        with self.__now_next_lock:
+            if self.__now_next_task:
+                self.__now_next_task.cancel()
+                self.__now_next_task = None
+            if not self.__connected or 'channels' not in self.__epg:
+                return
+            programs = [box.get_current_program() for box in list(self.get_boxes().values())]
+            ends = [program.end for program in programs if program]
+            if not ends:
+                return
+            delay_sec = max(1.0, (min(ends) - time.time() * 1000) / 1000 + 1)
+            self.__now_next_task = self.__scheduler.schedule(delay_sec, self.__on_program_boundary,
+                                                             name='FetchTv-now-next')
+
+    def __on_program_boundary(self):
+        for box in list(self.get_boxes().values()):
+            box.update_media_state()
+        self.__schedule_now_next()
+
+    def __update_epg_channels(self):
+        if self.__epg_channels:
+            return
+        response = self.__epg_store.channels(lambda: self.__request('get epg channels', self.__api_url + PATH_EPG_CHANNELS, {}))
+        if response:
             self.__epg_channels = {k: EpgChannel(v) for k, v in response['channels'].items()}
             self.__epg_regions = {k: EpgRegion(v, k) for k, v in response['region_details'].items()}
 
-        with self.__epg_lock:
+    def __request_epg_update(self):
+        # Boxes report together at login and after reconnects, the update waits for them to settle so one
+        # request covers them all. It runs on the scheduler, never on the websocket thread.
+        with self.__epg_pending_lock:
+            now = time.monotonic()
+            if self.__epg_update_task:
+                self.__epg_update_task.cancel()
+            else:
+                self.__epg_first_request = now
+            self.__epg_update_generation += 1
+            generation = self.__epg_update_generation
+            due = min(now + self.__epg_debounce_sec,
+                      self.__epg_first_request + max(self.__epg_debounce_sec, EPG_DEBOUNCE_MAX_SEC))
+            self.__epg_update_task = self.__scheduler.schedule(due - now, lambda: self.__run_epg_update(generation),
+                                                               name='FetchTv-epg-update')
+
+    def __run_epg_update(self, generation: int):
+        with self.__epg_pending_lock:
+            if generation != self.__epg_update_generation:
+                # Replaced by a later request
+                return
+            self.__epg_update_task = None
+        self.__update_epg(False)
+
+    def __update_epg(self, refresh: bool = True):
+        """
+        :param refresh: Refresh channels older than EPG_REFRESH_SEC, otherwise only fetch when the boxes' channels
+            have changed
+        """
+        self.__update_epg_channels()
+
+        # Updates run one at a time so an older fetch can't replace a newer EPG. The fetch happens outside
+        # the EPG lock, readers keep using the current EPG until the new one is ready.
+        with self.__epg_update_lock:
             channel_ids = []
 
             if len(self.get_boxes()) == 0:
                 return
 
-            for box in self.get_boxes().values():
+            for box in list(self.get_boxes().values()):
                 # Get EPG Ids for local channels
                 channel_ids.extend([str(v.epg_id) for v in box.dvb_channels.values()])
-            channel_ids = set(channel_ids)
+            channel_ids = frozenset(channel_ids)
             for_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            params = {
-                "channel_ids": ','.join(channel_ids),
-                "block": f"4-{int(for_date.timestamp() / 14400)}",
-                "count": 42,
-                "extended": 1,
-                "off_air_catchup": 0,
-                "include_catchup": 0
-            }
-            response = self.__request('update epg', URL_EPG, params)
-            self.__epg = response
+            block = f"4-{int(for_date.timestamp() / 14400)}"
+            if not refresh and (channel_ids, block) == self.__epg_key:
+                return
+
+            def fetch(missing_ids: List[str]) -> Optional[dict]:
+                params = {
+                    "channel_ids": ','.join(missing_ids),
+                    "block": block,
+                    "count": 42,
+                    "extended": 1,
+                    "off_air_catchup": 0,
+                    "include_catchup": 0
+                }
+                return self.__request('update epg', self.__api_url + PATH_EPG, params)
+
+            # Channels already in the store, from this or another account, are not requested again. A little
+            # under the refresh interval so periodic refreshes don't find them just fresh enough to skip.
+            response = self.__epg_store.get(id(self), channel_ids, block, fetch, EPG_REFRESH_SEC - 60)
+            if response is not None:
+                with self.__epg_lock:
+                    self.__epg = response
+                    # Channels missing after a failed request are tried again on the next update
+                    self.__epg_key = (channel_ids, block) if channel_ids <= response['channels'].keys() else None
+                _resolve(self.__epg_ready, response)
+        self.__schedule_now_next()
 
     def get_epg(self, for_date=None) -> Dict[str, List[Program]]:
         result = {}
@@ -131,6 +302,8 @@ class FetchTV(FetchTvInterface):
         return self.__epg_regions
 
     def get_program(self, channel: Channel, for_time_msec: int) -> Optional[Program]:
+        if 'channels' not in self.epg:
+            return None
         if str(channel.epg_id) not in self.epg['channels']:
             logger.error(f"Unable to find expected epg_channel [{channel.epg_id}] in {len(self.epg['channels'])} epg channels.")
             return None
@@ -144,6 +317,8 @@ class FetchTV(FetchTvInterface):
         return None
 
     def find_program(self, name: str):
+        # Imported on first search, it loads numpy
+        from fuzzy_match import algorithims
         program_fields = self.__epg['__meta__']['program_fields']
         results = {}
         synopses = self.__epg['synopses']
@@ -162,6 +337,20 @@ class FetchTV(FetchTvInterface):
         results.sort(reverse=True, key=lambda x: x['match'])
         return results
 
+    @property
+    def catalogue(self) -> FetchTvCatalogue:
+        """
+        :return: The VOD catalogue, available after login
+        """
+        return self.__catalogue
+
+    @property
+    def recordings_store(self) -> Optional['RecordingsStore']:
+        """
+        :return: The store the boxes' recordings are kept in, if one was passed in
+        """
+        return self.__recordings_store
+
     @property
     def is_connected(self) -> bool:
         return self.__connected
@@ -170,19 +359,101 @@ class FetchTV(FetchTvInterface):
     def account(self) -> Account:
         return self.__account
 
-    def __init__(self, ping_sec=60):
+    def __init__(self, ping_sec=60, dispatch_workers=4, dispatch_queue_size=1000,
+                 overflow_policy=OverflowPolicy.BLOCK, send_rate_per_sec=4.0, send_burst=8,
+                 response_timeout_sec=30, max_missed_pongs=2, history_size=10,
+                 journal: Optional[MessageJournal] = None, scheduler: Optional[Scheduler] = None,
+                 epg_store: Optional[EpgStore] = None, http_adapter: Optional['HTTPAdapter'] = None,
+                 api_url: str = URL_BASE_APIS, messages_url: str = URL_MESSAGES,
+                 metrics: Optional[MetricsRegistry] = None, tracer: Optional[Tracer] = None,
+                 connect_timeout_sec: float = 5, read_timeout_sec: float = 30, http_retries: int = 3,
+                 http_pool_maxsize: int = 10, catalogue_prefetch_pages: int = 2, catalogue_cache_size: int = 200,
+                 catalogue_cache_ttl_sec: float = 900, epg_debounce_sec: float = 0.5,
+                 snapshot_diffs: bool = False, snapshot_history: int = 100,
+                 recordings_store: Optional['RecordingsStore'] = None, instance: Optional[str] = None,
+                 boxes_ready_timeout_sec: float = 30):
         super().__init__()
+        # Labels the gauges, so accounts sharing a registry each report their own values
+        self.__instance = instance if instance is not None else f'fetchtv-{next(_INSTANCES)}'
+        self.__tracer = tracer if tracer is not None else Tracer()
+        self.__metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self.__request_histogram = self.__metrics.histogram('http_request_seconds', 'HTTP request duration',
+                                                            ('action',))
+        self.__response_size_histogram = self.__metrics.histogram('http_response_bytes', 'HTTP response size',
+                                                                  ('action',), SIZE_BUCKETS)
+        self.__request_counter = self.__metrics.counter('http_requests', 'HTTP requests', ('action', 'status'))
+        self.__published_counter = self.__metrics.counter('published', 'Messages published to subscribers',
+                                                          ('group',))
+        self.__callback_histogram = self.__metrics.histogram('subscriber_callback_seconds',
+                                                             'Subscriber callback duration')
+        # The service URLs can be overridden, e.g. to use a local stand-in
+        self.__api_url = api_url
+        self.__messages_url = messages_url
         self.__epg_channels = {}
         self.__epg_regions = {}
-        self.__subscribers = {}
+        self.__subscribers = SubscriptionTable()
         self.__connected = False
-        self.__session = requests.Session()
+        # A shared adapter shares its connection pool, cookies stay with each transport
+        self.__transport = HttpTransport(connect_timeout_sec, read_timeout_sec, http_retries,
+                                         pool_maxsize=http_pool_maxsize, adapter=http_adapter)
+        self.__epg_store = epg_store if epg_store is not None else EpgStore()
+        self.__catalogue = FetchTvCatalogue(self.__request, self.__api_url, prefetch_pages=catalogue_prefetch_pages,
+                                            cache_size=catalogue_cache_size, cache_ttl_sec=catalogue_cache_ttl_sec)
         self.__epg = {}
         self.__account = None  # type: Optional[Account]
         self.__set_top_boxes = {}  # type: Dict[str, SetTopBox]
-        self.__message_handler = FetchTvMessageHandler('FetchTv', self, ping_sec)
+        # One scheduler runs the periodic work: EPG refresh, keep-alive pings and now/next updates
+        self.__owns_scheduler = scheduler is None
+        self.__scheduler = scheduler if scheduler is not None else Scheduler('FetchTv-scheduler')
+        self.__message_handler = FetchTvMessageHandler('FetchTv', self, ping_sec, send_rate_per_sec,
+                                                       send_burst, response_timeout_sec, max_missed_pongs,
+                                                       history_size, journal, self.__scheduler, self.__metrics,
+                                                       self.__tracer, self.__instance)
         self.__epg_lock = threading.Lock()
-        self.__epg_thread = None
+        self.__epg_update_lock = threading.Lock()
+        self.__epg_pending_lock = threading.Lock()
+        self.__epg_debounce_sec = epg_debounce_sec
+        self.__snapshot_diffs = snapshot_diffs
+        self.__snapshot_history = snapshot_history
+        self.__recordings_store = recordings_store
+        self.__epg_update_task = None
+        self.__epg_update_generation = 0
+        self.__epg_first_request = 0.0
+        # The channels and block of the current EPG
+        self.__epg_key = None
+        self.__epg_ready = Future()  # type: Future
+        self.__boxes_ready = Future()  # type: Future
+        self.__boxes_ready_timeout_sec = boxes_ready_timeout_sec
+        self.__boxes_ready_task = None
+        # Terminals boxes_ready waits for, set on login
+        self.__expected_boxes = None  # type: Optional[set]
+        self.__epg_task = None
+        self.__now_next_lock = threading.Lock()
+        self.__now_next_task = None
+        self.__dispatcher = SubscriberDispatcher('FetchTv', self.__publish_runnable, dispatch_workers,
+                                                 dispatch_queue_size, overflow_policy)
+        self.__gauges = []  # type: List[Gauge]
+        self.__gauge('dispatch_queue_depth', 'Messages waiting for subscribers',
+                     lambda: self.__dispatcher.metrics['total_depth'])
+        self.__gauge('dispatch_dropped', 'Messages dropped by the overflow policy',
+                     lambda: self.__dispatcher.metrics['dropped'])
+        self.__gauge('http_retries', 'HTTP requests retried', lambda: self.__transport.metrics['retries'])
+        self.__gauge('http_connections_opened', 'HTTP connections opened',
+                     lambda: self.__transport.metrics['connections_opened'])
+        self.__gauge('http_connections_reused', 'HTTP requests sent on a kept-alive connection',
+                     lambda: self.__transport.metrics['connections_reused'])
+
+    def __gauge(self, name: str, description: str, function: Callable[[], float]):
+        gauge = self.__metrics.gauge(name, description, ('instance',))
+        gauge.set_function(function, self.__instance)
+        self.__gauges.append(gauge)
+
+    @property
+    def instance(self) -> str:
+        """
+        :return: The instance label of this account's gauges
+        """
+        return self.__instance
 
     def get_boxes(self):
         return self.__set_top_boxes
@@ -192,48 +463,98 @@ class FetchTV(FetchTvInterface):
 
     def close(self):
         self.__connected = False
-        self.__session.close()
-        try:
-            self.__epg_thread.join(timeout=10)
-        except TimeoutError:
-            pass
+        self.__catalogue.close()
+        self.__transport.close()
+        self.__epg_store.release(id(self))
+        for task in [self.__epg_task, self.__now_next_task, self.__epg_update_task, self.__boxes_ready_task]:
+            if task:
+                task.cancel()
         self.__message_handler.close()
+        if self.__owns_scheduler:
+            self.__scheduler.close()
+        self.__dispatcher.close()
+        for future in [self.__epg_ready, self.__boxes_ready]:
+            future.cancel()
+        for gauge in self.__gauges:
+            gauge.remove(self.__instance)
 
     def login(self, activation_code: str, pin: str) -> bool:
+        """
+        Authenticate and connect, returning without waiting for the boxes or the EPG.
+        Wait on epg_ready and boxes_ready for those.
+        :return: True if authenticated
+        """
+        # The EPG channel details don't need authenticating, fetch them at the same time
+        self.__scheduler.schedule(0, self.__update_epg_channels, name='FetchTv-epg-channels')
         params = {}
         data = {"activation_code": activation_code, "pin": pin}
-        response = self.__request('login', URL_AUTHENTICATE, params, data)
+        response = self.__request('login', self.__api_url + PATH_AUTHENTICATE, params, data)
         if not response:
             return False
         logger.info("FetchTV --> login successful.")
         self.__account = Account(response)
         self.__connected = True
-        self.__epg_thread = threading.Thread(target=self.__update_epg_periodic)
-        self.__epg_thread.start()
+        self.__epg_task = self.__scheduler.every(EPG_REFRESH_SEC, self.__update_epg_periodic, 'FetchTv-epg-refresh')
         self.__message_handler.connect(
-            url=URL_MESSAGES,
-            cookie="auth=" + self.__session.cookies.get('auth')
+            url=self.__messages_url,
+            cookie="auth=" + self.__transport.cookies.get('auth')
         )
         for box in self.__account.terminals.values():
             logger.info(f"FetchTV --> Found box [{box.friendly_name}], Status: [{box.status}:{box.activation_status}]")
+        # Inactive boxes never report, and a switched off box may not for hours, don't wait on them
+        self.__expected_boxes = {k for k, v in self.__account.terminals.items() if v.is_active}
+        self.__check_boxes_ready()
+        self.__boxes_ready_task = self.__scheduler.schedule(self.__boxes_ready_timeout_sec,
+                                                            self.__on_boxes_ready_timeout, name='FetchTv-boxes-ready')
         return True
 
+    def __check_boxes_ready(self):
+        if self.__expected_boxes is not None and self.__expected_boxes <= set(self.__set_top_boxes.keys()):
+            _resolve(self.__boxes_ready, self.__set_top_boxes)
+
+    def __on_boxes_ready_timeout(self):
+        if self.__boxes_ready.done():
+            return
+        missing = sorted(self.__expected_boxes - set(self.__set_top_boxes.keys()))
+        logger.warning(f'FetchTV --> Boxes {missing} did not report within {self.__boxes_ready_timeout_sec} seconds, '
+                       f'continuing without them.')
+        _resolve(self.__boxes_ready, self.__set_top_boxes)
+
     def set_box(self, terminal_id, box_json: dict):
-        self.__set_top_boxes[terminal_id] = FetchTvBox(self.__message_handler, box_json)
-        self.__update_epg()
+        box = self.__set_top_boxes.get(terminal_id)
+        channels_changed = True
+        if box is not None:
+            # Update in place, subscribers holding the box, its channels or recordings keep current objects
+            channels_changed = 'channels' in box.update(box_json)
+        else:
+            self.__set_top_boxes[terminal_id] = FetchTvBox(self.__message_handler, box_json, self.__snapshot_diffs,
+                                                           self.__snapshot_history, self.__recordings_store)
+        self.__check_boxes_ready()
+        if self.__connected and channels_changed:
+            self.__request_epg_update()
 
     def __request(self, action: str, url: str, params: dict, data: dict = None):
-        response = self.__session.post(
-            url=URL_AUTHENTICATE,
-            params=params,
-            headers=STANDARD_HEADERS,
-            data=data
-        ) if data else \
-            self.__session.get(
-                url=url,
-                params=params,
-                headers=STANDARD_HEADERS
-            )
+        import requests
+        start = time.perf_counter()
+        span = self.__tracer.start_span('http', action=action, url=url)
+        try:
+            response = self.__transport.post(url, params, data, STANDARD_HEADERS) if data else \
+                self.__transport.get(url, params, STANDARD_HEADERS)
+        except requests.RequestException as e:
+            span.finish(e)
+            self.__request_histogram.observe(time.perf_counter() - start, action)
+            self.__request_counter.inc(action, 'error')
+            logger.error(f"FetchTV --> {action} failed. {type(e).__name__}: {e}")
+            return None
+        except Exception as e:
+            span.finish(e)
+            raise
+        span.set_attribute('status', response.status_code)
+        span.set_attribute('bytes', len(response.content))
+        span.finish()
+        self.__request_histogram.observe(time.perf_counter() - start, action)
+        self.__response_size_histogram.observe(len(response.content), action)
+        self.__request_counter.inc(action, str(response.status_code))
         if response.status_code != 200:
             logger.error(f"FetchTV --> {action} failed. {response.status_code}: {response.text}")
             return None
@@ -1,120 +1,253 @@
 import logging
+import threading
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List, Tuple, TYPE_CHECKING
 
 from pyfetchtv.api.const.remote_keys import RemoteKey
 from pyfetchtv.api.fetchtv_box_interface import FetchTvBoxInterface, RecordSeriesParameters, RecordProgramParameters
 from pyfetchtv.api.fetchtv_interface import SubscriberMessage
 from pyfetchtv.api.fetchtv_messages_interface import FetchTvMessagesInterface
+from pyfetchtv.api.helpers import bulk_delete
+from pyfetchtv.api.helpers.snapshot import VersionedSnapshot, REMOVED
 from pyfetchtv.api.json_objects.epg import Program
 from pyfetchtv.api.json_objects.recording import Recording
 from pyfetchtv.api.json_objects.series import Series
 from pyfetchtv.api.json_objects.set_top_box import State
-from pyfetchtv.api.const.message_types import MessageTypeIn, MessageType
+from pyfetchtv.api.const.message_types import MessageTypeIn, MessageType, MESSAGE_TYPES_IN
+
+if TYPE_CHECKING:
+    from pyfetchtv.api.helpers.recordings_store import RecordingsStore
 
 
 class FetchTvBox(FetchTvBoxInterface):
 
-    def send_key(self, key: RemoteKey):
-        self.__msg_handler.send_remote_key(self.terminal_id, key)
+    def send_key(self, key: RemoteKey) -> Optional[Future]:
+        return self.__msg_handler.send_remote_key(self.terminal_id, key)
 
-    def __init__(self, msg_handler: FetchTvMessagesInterface, json):
+    def __init__(self, msg_handler: FetchTvMessagesInterface, json, snapshot_diffs: bool = False,
+                 snapshot_history: int = 100, recordings_store: Optional['RecordingsStore'] = None):
+        """
+        :param msg_handler: Sends the box's commands
+        :param json: The box's full state
+        :param snapshot_diffs: Publish the JSON patch from the previous snapshot version instead of each message's
+            payload, messages which change nothing are not published
+        :param snapshot_history: The number of snapshot versions kept for patches_since()
+        :param recordings_store: Keeps the box's recordings, future recordings and series in SQLite
+        """
         super().__init__(json)
         self.__msg_handler = msg_handler
+        # Changes from the last update(), reported by the I_AM_ALIVE message which carried them
+        self.__changes = None  # type: Optional[dict]
+        self.__snapshot_diffs = snapshot_diffs
+        self.__snapshot_history = snapshot_history
+        self.__recordings_store = recordings_store
+        self.__snapshot_lock = threading.Lock()
+        # Only kept once something needs it: diffs, a store or a call to snapshot()
+        self.__snapshot = None  # type: Optional[VersionedSnapshot]
+        if snapshot_diffs or recordings_store is not None:
+            self.__start_snapshot()
+        # The snapshot change from the message being processed
+        self.__patch = None  # type: Optional[dict]
+
+    def update(self, json: dict) -> dict:
+        self.__changes = super().update(json)
+        sections = {'hardware': 'box'}
+        self.__changed(lambda: self.__sections({sections.get(k, k) for k in self.__changes}))
+        return self.__changes
+
+    def snapshot(self) -> dict:
+        return self.__start_snapshot().snapshot()
+
+    def patches_since(self, version: int) -> Optional[dict]:
+        return self.__start_snapshot().patches_since(version)
+
+    def __start_snapshot(self) -> VersionedSnapshot:
+        with self.__snapshot_lock:
+            if self.__snapshot is None:
+                snapshot = VersionedSnapshot(self.__snapshot_history)
+                values = self.__sections(self._SNAPSHOT_SECTIONS)
+                snapshot.update(values)
+                if self.__recordings_store is not None:
+                    self.__recordings_store.apply(self.terminal_id, values)
+                self.__snapshot = snapshot
+            return self.__snapshot
+
+    _SNAPSHOT_SECTIONS = ('box', 'storage', 'state', 'channels', 'recordings', 'future', 'series', 'active')
+
+    def __sections(self, names) -> Dict[Tuple, object]:
+        values = {}
+        for name in names:
+            if name == 'box':
+                values[('box',)] = {'label': self.label, 'ip_address': self.ip_address,
+                                    'is_in_standby': self.is_in_standby, 'is_idle': self.is_idle,
+                                    'terminal_id': self.terminal_id, 'mac_address': self.mac_address,
+                                    'dlna_port': self.dlna_port, 'dlna_url': self.dlna_url, 'up_from': self.up_from,
+                                    'hardware': self.hardware.to_dict()}
+            elif name == 'storage':
+                values[('storage',)] = self.storage.to_dict()
+            elif name == 'state':
+                values[('state',)] = self.state.to_dict()
+            elif name == 'channels':
+                values[('channels',)] = {str(k): v.to_dict() for k, v in self.dvb_channels.items()}
+            elif name == 'recordings':
+                values[('recordings',)] = {str(k): v.to_dict() for k, v in self.recordings.items.items()}
+            elif name == 'future':
+                values[('future',)] = {str(k): v.to_dict() for k, v in self.recordings.future.items()}
+            elif name == 'series':
+                values[('series',)] = {str(v.id): v.to_dict() for v in self.recordings.series}
+            elif name == 'active':
+                values[('active',)] = sorted(self.recordings.active)
+        return values
 
-    def ping(self):
-        self.__msg_handler.send_ping(self.terminal_id)
+    def __changed(self, build_values: Callable[[], Dict[Tuple, object]]):
+        """
+        Record a change to the snapshot, if one is kept.
+        :param build_values: Builds the changed values by snapshot path, only called if a snapshot is kept
+        """
+        if self.__snapshot is None:
+            return
+        values = build_values()
+        self.__patch = self.__snapshot.update(values)
+        if self.__recordings_store is not None and self.__patch is not None:
+            self.__recordings_store.apply(self.terminal_id, values)
 
-    def is_alive(self):
-        self.__msg_handler.send_is_alive(self.terminal_id)
+    def ping(self) -> Future:
+        return self.__msg_handler.send_ping(self.terminal_id)
 
-    def process_message(self, message: dict):
+    def is_alive(self) -> Future:
+        return self.__msg_handler.send_is_alive(self.terminal_id)
+
+    def process_message(self, message: dict) -> Optional[SubscriberMessage]:
         msg_type = message['message']['type']
 
-        if msg_type not in [e.name for e in MessageTypeIn]:
+        msg_command = MESSAGE_TYPES_IN.get(msg_type)
+        if msg_command is None:
             logging.info(f'FetchTV --> Skipping processing message: {msg_type}')
-
-        msg_command = MessageTypeIn[msg_type]
-        if msg_command in [MessageTypeIn.NOW_PLAYING, MessageTypeIn.UNPAUSED]:
+            return None
+        if msg_command in (MessageTypeIn.NOW_PLAYING, MessageTypeIn.UNPAUSED):
             msg_command = MessageTypeIn.PLAYING
-        sub_message = {}
-        msg_group = MessageType.UNKNOWN
-
-        if msg_type == MessageTypeIn.I_AM_ALIVE.name:
-            msg_group = MessageType.BOX
-            msg_command = MessageTypeIn.BOX_FOUND
-
-        elif msg_type in [MessageTypeIn.MEDIA_STATE.name, MessageTypeIn.NOW_PLAYING.name]:
-            self._state = State(message['message']['data']['currentPlaybackMedia'])
-            sub_message = self.state.to_dict()
-            msg_group = MessageType.STATE
-
-        elif msg_type in [MessageTypeIn.PAUSED.name, MessageTypeIn.UNPAUSED.name]:
-            self._state.set_value('playBackState', msg_type)
-            sub_message = self.state.to_dict()
-            msg_group = MessageType.STATE
-
-        elif msg_type == MessageTypeIn.FUTURE_RECORDINGS_LIST.name:
-            self._recordings.set_future(message['message'], 'data')
-            sub_message = [rec.to_dict() for rec in self.recordings.future.values()]
-            msg_group = MessageType.FUTURE_RECORDINGS
-
-        elif msg_type == MessageTypeIn.PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS.name:
-            # Update recordings to delete pending
-            recordings_ids = message['message']['data']['recordingsIds']
-            msg_command = MessageTypeIn.RECORDINGS_DELETE
-            msg_group = MessageType.RECORDINGS
-            sub_message = []
-            for rec in self._recordings.items.values():
-                if rec.id in recordings_ids:
-                    sub_message.append(rec.to_dict())
-
-        elif msg_type == MessageTypeIn.RECORDINGS_UPDATE.name:
-            recordings = message['message']['data']['recordingUpdates']
-            event_name = recordings[0]['eventName']
-            if event_name == 'SERIES_TAG_CANCELLED':
-                series_link = recordings[0]['seriesTag']['id']
-                series = [i for i in range(len(self.recordings.series))
-                          if self.recordings.series[i].series_link == series_link]
-                sub_message = self.recordings.series[series[0]].to_dict()
-                msg_command = MessageTypeIn.SERIES_CANCELLED
-                msg_group = MessageType.SERIES
-                del self.recordings.series[series[0]]
-
-            elif event_name == 'SERIES_TAG_SET':
-                series = Series(recordings[0]['seriesTag'])
-                self.recordings.series.append(series)
-                msg_command = MessageTypeIn.SERIES_ADDED
-                msg_group = MessageType.SERIES
-                sub_message = series.to_dict()
-
-            else:
-                recording = Recording(self, recordings[len(recordings) - 1]['recording'])
-                # Add to/update recordings list
-                self._recordings.items[recording.id] = recording
-                last_event_name = recordings[len(recordings) - 1]['eventName']
-                sub_message = recording.to_dict()
-                msg_group = MessageType.RECORDING
-                self._recordings.set_active(message['message']['data']['activeRecordings'])
-                if event_name == 'RECORD_PROGRAM_SUCCESS':
-                    # Add to future
-                    self._recordings.future[recording.id] = recording
-                    msg_command = MessageTypeIn.RECORD_PROGRAM_SUCCESS
-
-                if last_event_name in ['RECORD_PROGRAM_START', 'RECORD_PROGRAM_STOP', 'RECORD_PROGRAM_CANCEL']:
-                    msg_command = MessageTypeIn[last_event_name]
-                    if last_event_name in ['RECORD_PROGRAM_STOP', 'RECORD_PROGRAM_CANCEL']:
-                        # Remove from future
-                        del self._recordings.future[recording.id]
 
+        handler = self._MESSAGE_HANDLERS.get(msg_type)
+        if handler:
+            result = handler(self, message['message'], msg_command)
+            if result is None:
+                # Nothing to report
+                return None
+            msg_group, msg_command, build_message = result
+            if self.__snapshot_diffs:
+                patch, self.__patch = self.__patch, None
+                if patch is None:
+                    return None
+                build_message = lambda: patch
+        else:
+            msg_group, build_message = MessageType.UNKNOWN, dict
+
+        sub_message = {}
+        if self.__msg_handler.wants_message(msg_group, msg_command, self.terminal_id):
+            sub_message = build_message()
         return SubscriberMessage(time=int(datetime.now().timestamp()),
                                  message=sub_message,
                                  msg_command=msg_command,
                                  msg_group=msg_group,
                                  terminal_id=self.terminal_id)
 
-    def update_media_state(self):
-        self.__msg_handler.send_media_state(self.terminal_id)
+    # Message handlers, each updates the box state and returns the message group, command and a function
+    # building the subscriber payload, which is only called if a subscriber wants the message.
+    # Each also records its change to the snapshot
+
+    def _on_box_found(self, message: dict, msg_command: MessageTypeIn):
+        changes, self.__changes = self.__changes, None
+        if changes is None:
+            if self.__snapshot_diffs:
+                # A new box, the whole snapshot is the change
+                snapshot = self.__snapshot.snapshot()
+                self.__patch = {'version': snapshot['version'], 'base_version': 0,
+                                'patch': [{'op': 'replace', 'path': '', 'value': snapshot['data']}]}
+            return MessageType.BOX, MessageTypeIn.BOX_FOUND, dict
+        if not changes:
+            return None
+        return MessageType.BOX, MessageTypeIn.BOX_CHANGED, lambda: changes
+
+    def _on_media_state(self, message: dict, msg_command: MessageTypeIn):
+        self._state = State(message['data']['currentPlaybackMedia'])
+        self.__changed(lambda: self.__sections(['state']))
+        return MessageType.STATE, msg_command, self.state.to_dict
+
+    def _on_pause_changed(self, message: dict, msg_command: MessageTypeIn):
+        self._state.set_value('playBackState', message['type'])
+        self.__changed(lambda: self.__sections(['state']))
+        return MessageType.STATE, msg_command, self.state.to_dict
+
+    def _on_future_recordings(self, message: dict, msg_command: MessageTypeIn):
+        changes = self._recordings.update_future(message, 'data')
+        if changes:
+            future = self.recordings.future
+            self.__changed(lambda: {('future', str(i)): future[i].to_dict() if i in future else REMOVED
+                                    for ids in changes.values() for i in ids})
+        return MessageType.FUTURE_RECORDINGS, msg_command, \
+            lambda: [rec.to_dict() for rec in self.recordings.future.values()]
+
+    def _on_recordings_deleted(self, message: dict, msg_command: MessageTypeIn):
+        # Update recordings to delete pending
+        deleted = self._recordings.mark_pending_delete(message['data']['recordingsIds'])
+        self.__changed(lambda: {('recordings', str(rec.id)): rec.to_dict() for rec in deleted})
+        return MessageType.RECORDINGS, MessageTypeIn.RECORDINGS_DELETE, lambda: [rec.to_dict() for rec in deleted]
+
+    def _on_recordings_update(self, message: dict, msg_command: MessageTypeIn):
+        recordings = message['data']['recordingUpdates']
+        event_name = recordings[0]['eventName']
+        if event_name == 'SERIES_TAG_CANCELLED':
+            series_link = recordings[0]['seriesTag']['id']
+            cancelled = self._recordings.remove_series(series_link)
+            self.__changed(lambda: {('series', str(series_link)): REMOVED})
+            return MessageType.SERIES, MessageTypeIn.SERIES_CANCELLED, \
+                cancelled.to_dict if cancelled else lambda: {'id': series_link}
+
+        if event_name == 'SERIES_TAG_SET':
+            series = Series(recordings[0]['seriesTag'])
+            self._recordings.add_series(series)
+            self.__changed(lambda: {('series', str(series.id)): series.to_dict()})
+            return MessageType.SERIES, MessageTypeIn.SERIES_ADDED, series.to_dict
+
+        recording = Recording(self, recordings[len(recordings) - 1]['recording'])
+        # Add to/update recordings list
+        self._recordings.update(recording)
+        last_event_name = recordings[len(recordings) - 1]['eventName']
+        self._recordings.set_active(message['data']['activeRecordings'])
+        if event_name == 'RECORD_PROGRAM_SUCCESS':
+            # Add to future
+            self._recordings.add_future(recording)
+            msg_command = MessageTypeIn.RECORD_PROGRAM_SUCCESS
+
+        if last_event_name in ('RECORD_PROGRAM_START', 'RECORD_PROGRAM_STOP', 'RECORD_PROGRAM_CANCEL'):
+            msg_command = MESSAGE_TYPES_IN[last_event_name]
+            if last_event_name in ('RECORD_PROGRAM_STOP', 'RECORD_PROGRAM_CANCEL'):
+                # Remove from future
+                self._recordings.remove_future(recording.id)
+        future = self._recordings.future.get(recording.id)
+
+        def values():
+            result = {('recordings', str(recording.id)): recording.to_dict(),
+                      ('future', str(recording.id)): future.to_dict() if future else REMOVED}
+            result.update(self.__sections(['active']))
+            return result
+        self.__changed(values)
+        return MessageType.RECORDING, msg_command, recording.to_dict
+
+    _MESSAGE_HANDLERS = {
+        MessageTypeIn.I_AM_ALIVE.name: _on_box_found,
+        MessageTypeIn.MEDIA_STATE.name: _on_media_state,
+        MessageTypeIn.NOW_PLAYING.name: _on_media_state,
+        MessageTypeIn.PAUSED.name: _on_pause_changed,
+        MessageTypeIn.UNPAUSED.name: _on_pause_changed,
+        MessageTypeIn.FUTURE_RECORDINGS_LIST.name: _on_future_recordings,
+        MessageTypeIn.PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS.name: _on_recordings_deleted,
+        MessageTypeIn.RECORDINGS_UPDATE.name: _on_recordings_update,
+    }
+
+    def update_media_state(self) -> Future:
+        return self.__msg_handler.send_media_state(self.terminal_id)
 
     def play_channel(self, channel_id: str):
         self.__msg_handler.play_channel(self.terminal_id, channel_id)
@@ -123,14 +256,19 @@ class FetchTvBox(FetchTvBoxInterface):
         self.play_channel(channel_id)
         self.__msg_handler.send_remote_key(self.terminal_id, RemoteKey.Record)
 
-    def record_program(self, params: RecordProgramParameters):
-        self.__msg_handler.record_program(self.terminal_id, params)
+    def record_program(self, params: RecordProgramParameters) -> Future:
+        return self.__msg_handler.record_program(self.terminal_id, params)
+
+    def cancel_recording(self, program_id: str) -> Future:
+        return self.__msg_handler.cancel_recording(self.terminal_id, program_id)
 
-    def cancel_recording(self, program_id: str):
-        self.__msg_handler.cancel_recording(self.terminal_id, program_id)
+    def delete_recordings(self, recording_ids: List[int]) -> Future:
+        return self.__msg_handler.send_delete_recordings(self.terminal_id, recording_ids)
 
-    def delete_recordings(self, recording_ids: List[int]):
-        self.__msg_handler.send_delete_recordings(self.terminal_id, recording_ids)
+    def delete_recordings_bulk(self, recording_ids: List[int], batch_size: int = bulk_delete.BATCH_SIZE,
+                               in_flight: int = bulk_delete.IN_FLIGHT, retries: int = bulk_delete.RETRIES) -> Future:
+        return bulk_delete.delete_in_batches(lambda ids: self.delete_recordings(ids), recording_ids, batch_size,
+                                             in_flight, retries, f'{self.terminal_id} bulk delete')
 
     def get_current_program(self) -> Optional[Program]:
         if not self.state:
@@ -141,8 +279,8 @@ class FetchTvBox(FetchTvBoxInterface):
         channel = self.dvb_channels[channel_id]
         return self.__msg_handler.fetchtv.get_program(channel, int(datetime.now().timestamp() * 1000))
 
-    def record_series(self, params: RecordSeriesParameters):
-        self.__msg_handler.record_series(self.terminal_id, params)
+    def record_series(self, params: RecordSeriesParameters) -> Future:
+        return self.__msg_handler.record_series(self.terminal_id, params)
 
-    def cancel_series(self, program_id: str, series_link: str):
-        self.__msg_handler.cancel_series(self.terminal_id, program_id, series_link)
+    def cancel_series(self, program_id: str, series_link: str) -> Future:
+        return self.__msg_handler.cancel_series(self.terminal_id, program_id, series_link)
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
 from typing import Optional, List
 
 from pyfetchtv.api.const.remote_keys import RemoteKey
@@ -41,17 +42,18 @@ class RecordSeriesParameters(RecordProgramParameters):
 class FetchTvBoxInterface(SetTopBox, ABC):
 
     @abstractmethod
-    def ping(self):
+    def ping(self) -> Future:
         """
         Send a ping message to this box, it should respond with a pong
+        :return: A future resolving to the PONG message
         """
         pass
 
     @abstractmethod
-    def is_alive(self) -> bool:
+    def is_alive(self) -> Future:
         """
-        .
-        :return True if this box is responding to pings:
+        Ask this box to send its full state
+        :return: A future resolving to the I_AM_ALIVE message
         """
         pass
 
@@ -64,9 +66,29 @@ class FetchTvBoxInterface(SetTopBox, ABC):
         pass
 
     @abstractmethod
-    def update_media_state(self):
+    def snapshot(self) -> dict:
+        """
+        Get the box state as a versioned JSON document, the version increases each time the state changes.
+        :return: {'version', 'data'}, data has 'box', 'storage', 'state', 'channels', 'recordings', 'future',
+            'series' and 'active'
+        """
+        pass
+
+    @abstractmethod
+    def patches_since(self, version: int) -> Optional[dict]:
+        """
+        Get the JSON patch from a snapshot version to the current state.
+        :param version: The version held
+        :return: {'version', 'base_version', 'patch'}, or None if the version is no longer kept and a new snapshot
+            is needed
+        """
+        pass
+
+    @abstractmethod
+    def update_media_state(self) -> Future:
         """
         Retrieves the current media state from the FetchTV box
+        :return: A future resolving to the MEDIA_STATE message, once the box state is updated
         """
         pass
 
@@ -87,10 +109,11 @@ class FetchTvBoxInterface(SetTopBox, ABC):
         pass
 
     @abstractmethod
-    def record_program(self, params: RecordProgramParameters):
+    def record_program(self, params: RecordProgramParameters) -> Future:
         """
         Schedules the provided program to record.
         :param params: The program details
+        :return: A future resolving to the RECORDINGS_UPDATE message, or raising CommandFailedError
         """
         pass
 
@@ -102,43 +125,62 @@ class FetchTvBoxInterface(SetTopBox, ABC):
         pass
 
     @abstractmethod
-    def record_series(self, params: RecordSeriesParameters):
+    def record_series(self, params: RecordSeriesParameters) -> Future:
         """
         Schedules the specified series to record
         :param params: The series details
+        :return: A future resolving to the RECORDINGS_UPDATE message
         """
         pass
 
     @abstractmethod
-    def cancel_series(self, program_id: str, series_link: str):
+    def cancel_series(self, program_id: str, series_link: str) -> Future:
         """
         Cancels the series from recording
         :param program_id:
         :param series_link:
+        :return: A future resolving to the RECORDINGS_UPDATE message
         """
         pass
 
     @abstractmethod
-    def send_key(self, key: RemoteKey):
+    def send_key(self, key: RemoteKey) -> Optional[Future]:
         """
         Simulates pressing a remote key
         :param key:
+        :return: For RemoteKey.Stop a future resolving to the following MEDIA_STATE message, otherwise None
         """
         pass
 
     @abstractmethod
-    def cancel_recording(self, program_id: str):
+    def cancel_recording(self, program_id: str) -> Future:
         """
         Cancels the provided program from recording
         :param program_id:
+        :return: A future resolving to the RECORDINGS_UPDATE message
         """
         pass
 
     @abstractmethod
-    def delete_recordings(self, recording_ids: List[int]):
+    def delete_recordings(self, recording_ids: List[int]) -> Future:
         """
         Deletes the provided recordings from the FetchTV box.
         These will be set to pending delete and eventually removed.
         :param recording_ids:
+        :return: A future resolving to the PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS message
+        """
+        pass
+
+    @abstractmethod
+    def delete_recordings_bulk(self, recording_ids: List[int], batch_size: int = 50, in_flight: int = 4,
+                               retries: int = 2) -> Future:
+        """
+        Deletes any number of recordings, sending them in batches with a bounded number awaiting a response.
+        Recordings the box does not confirm are sent again.
+        :param recording_ids:
+        :param batch_size: The maximum recordings in each message
+        :param in_flight: The maximum batches awaiting a response
+        :param retries: Times an unconfirmed recording is sent again
+        :return: A future resolving to a BulkDeleteResult of the recordings confirmed and failed
         """
         pass
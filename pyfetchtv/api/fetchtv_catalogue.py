@@ -0,0 +1,137 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pyfetchtv.api.const.urls import PATH_CATALOGUE
+from pyfetchtv.api.helpers.ttl_cache import TtlCache
+from pyfetchtv.api.json_objects.catalogue import CatalogueItem, CataloguePage, CatalogueTab
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+
+
+class FetchTvCatalogue:
+    """
+    Reads the VOD catalogue a page at a time.
+    While a page is being consumed the next pages are fetched in the background, pages are cached with a TTL and
+    the least recently used pages are evicted.
+    """
+
+    def __init__(self, request: Callable[[str, str, dict], Optional[dict]], api_url: str,
+                 page_size: int = PAGE_SIZE, prefetch_pages: int = 2, cache_size: int = 200,
+                 cache_ttl_sec: float = 900):
+        """
+        :param request: Makes an API request: (action, url, params), returns the response or None on failure
+        :param api_url: The API base URL
+        :param page_size: Items requested per page
+        :param prefetch_pages: Pages fetched ahead of the one being consumed, 0 to fetch on demand
+        :param cache_size: Pages kept in the cache
+        :param cache_ttl_sec: Seconds a cached page is used for
+        """
+        self.__request = request
+        self.__url = api_url + PATH_CATALOGUE
+        self.__page_size = page_size
+        self.__prefetch_pages = prefetch_pages
+        self.__cache = TtlCache(cache_size, cache_ttl_sec)
+        self.__lock = threading.Lock()
+        self.__loading = {}  # type: Dict[Tuple[str, int], Future]
+        self.__executor = ThreadPoolExecutor(prefetch_pages, thread_name_prefix='FetchTv-catalogue') \
+            if prefetch_pages > 0 else None
+
+    @property
+    def cache_metrics(self) -> dict:
+        return self.__cache.metrics
+
+    def tabs(self) -> List[CatalogueTab]:
+        tabs = self.__cache.get('tabs')
+        if tabs is None:
+            response = self.__request('get catalogue tabs', self.__url, {})
+            if response is None:
+                return []
+            tabs = [CatalogueTab(tab) for tab in response.get('tabs', [])]
+            self.__cache.put('tabs', tabs)
+        return tabs
+
+    def get_page(self, tab_id: str, page: int) -> Optional[CataloguePage]:
+        """
+        :param tab_id: The catalogue tab
+        :param page: The page number, starting at 0
+        :return: The page, or None if the request failed
+        """
+        return self.__load(tab_id, page, False).result()
+
+    def pages(self, tab_id: str) -> Iterator[CataloguePage]:
+        """
+        Iterate the pages of a tab, fetching the next prefetch_pages in the background.
+        Stops early if a request fails.
+        """
+        prefetched = {}  # type: Dict[int, Future]
+        number = 0
+        pages = None
+        while pages is None or number < pages:
+            future = prefetched.pop(number, None)
+            page = (future if future else self.__load(tab_id, number, False)).result()
+            if page is None:
+                logger.warning(f'FetchTvCatalogue --> Stopped reading tab [{tab_id}] at page {number}.')
+                return
+            pages = page.pages
+            for ahead in range(number + 1, min(pages, number + 1 + self.__prefetch_pages)):
+                if ahead not in prefetched:
+                    prefetched[ahead] = self.__load(tab_id, ahead, True)
+            yield page
+            number += 1
+
+    def items(self, tab_id: str) -> Iterator[CatalogueItem]:
+        for page in self.pages(tab_id):
+            yield from page.items
+
+    def clear(self):
+        self.__cache.clear()
+
+    def close(self):
+        if self.__executor:
+            self.__executor.shutdown(wait=False)
+        self.__cache.clear()
+
+    def __load(self, tab_id: str, page: int, background: bool) -> Future:
+        key = (tab_id, page)
+        with self.__lock:
+            # A page already being fetched, e.g. by a prefetch, is shared rather than requested again
+            future = self.__loading.get(key)
+            if future:
+                return future
+            future = Future()
+            cached = self.__cache.get(key)
+            if cached is not None:
+                future.set_result(cached)
+                return future
+            self.__loading[key] = future
+        if background and self.__executor:
+            try:
+                self.__executor.submit(self.__fetch, key, future)
+                return future
+            except RuntimeError:
+                # Closed, fetch on the caller's thread instead
+                pass
+        self.__fetch(key, future)
+        return future
+
+    def __fetch(self, key: Tuple[str, int], future: Future):
+        tab_id, page = key
+        try:
+            response = self.__request('get catalogue page', self.__url,
+                                      {'tab': tab_id, 'page': page, 'count': self.__page_size})
+            result = None
+            if response is not None:
+                items = [CatalogueItem(item) for item in response.get('items', [])]
+                result = CataloguePage(tab_id, page, response.get('pages', page + 1), items)
+                self.__cache.put(key, result)
+            future.set_result(result)
+        except Exception as e:
+            logger.error(f'FetchTvCatalogue --> Failed reading tab [{tab_id}] page {page}.', exc_info=True)
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                self.__loading.pop(key, None)
@@ -0,0 +1,293 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urljoin, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from pyfetchtv.api.helpers.http_transport import HttpTransport
+from pyfetchtv.api.json_objects.recording import Recording, Recordings
+
+logger = logging.getLogger(__name__)
+
+# The ContentDirectory control URL, relative to the box's DLNA URL
+CONTENT_DIRECTORY_PATH = '../ContentDirectory/control'
+CONTENT_DIRECTORY_SERVICE = 'urn:schemas-upnp-org:service:ContentDirectory:1'
+ROOT_ID = '0'
+PAGE_SIZE = 100
+# Walks retried when the library changes part way through
+MAX_WALKS = 3
+# Characters of a DIDL-Lite document fed to the parser at a time
+_PARSE_CHARS = 64 * 1024
+
+_SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+_DIDL_NS = '{urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/}'
+_DC_NS = '{http://purl.org/dc/elements/1.1/}'
+_UPNP_NS = '{urn:schemas-upnp-org:metadata-1-0/upnp/}'
+
+
+class DlnaError(Exception):
+    pass
+
+
+class DlnaContainer:
+    """
+    A folder in the ContentDirectory.
+    """
+
+    def __init__(self, id: str, parent_id: str, title: str, child_count: int):
+        self.id = id
+        self.parent_id = parent_id
+        self.title = title
+        self.child_count = child_count
+
+
+class DlnaItem:
+    """
+    A media item in the ContentDirectory.
+    """
+
+    def __init__(self, id: str, parent_id: str, title: str, upnp_class: str, url: str, size: int,
+                 duration: str, date: str, protocol_info: str):
+        self.id = id
+        self.parent_id = parent_id
+        self.title = title
+        self.upnp_class = upnp_class
+        self.url = url
+        self.size = size
+        self.duration = duration
+        self.date = date
+        self.protocol_info = protocol_info
+
+    @property
+    def disk_id(self) -> Optional[int]:
+        """
+        :return: The recording's disk id, the last part of the media URL, or None if it isn't a recording
+        """
+        name = urlparse(self.url).path.rstrip('/').rsplit('/', 1)[-1]
+        return int(name) if name.isdigit() else None
+
+
+class DlnaPage:
+
+    def __init__(self, entries: List[Union[DlnaContainer, DlnaItem]], total: int, update_id: int):
+        self.entries = entries
+        self.total = total
+        self.update_id = update_id
+
+
+class Reconciliation:
+    """
+    A box's recordings joined to its ContentDirectory by disk id.
+    """
+
+    def __init__(self, matched: Dict[int, Tuple[Recording, DlnaItem]], missing: List[Recording],
+                 unmatched: List[DlnaItem], update_id: int):
+        # By recording id
+        self.matched = matched
+        # Recordings the box reports with no media
+        self.missing = missing
+        # Media with no recording
+        self.unmatched = unmatched
+        self.update_id = update_id
+
+
+def parse_didl(didl: str) -> Iterator[Union[DlnaContainer, DlnaItem]]:
+    """
+    Parse a DIDL-Lite document, yielding each entry as it is read.
+    The document itself is held whole, it arrives escaped inside the SOAP response, but each element is cleared once
+    read so the element tree for a large page is never built.
+    """
+    parser = ElementTree.XMLPullParser(events=('end',))
+    for start in range(0, len(didl), _PARSE_CHARS):
+        parser.feed(didl[start:start + _PARSE_CHARS])
+        for entry in _read_entries(parser):
+            yield entry
+    parser.close()
+    for entry in _read_entries(parser):
+        yield entry
+
+
+def _read_entries(parser: ElementTree.XMLPullParser) -> Iterator[Union[DlnaContainer, DlnaItem]]:
+    for _, element in parser.read_events():
+        if element.tag == _DIDL_NS + 'container':
+            yield DlnaContainer(element.get('id'), element.get('parentID'), element.findtext(_DC_NS + 'title', ''),
+                                int(element.get('childCount') or 0))
+        elif element.tag == _DIDL_NS + 'item':
+            res = element.find(_DIDL_NS + 'res')
+            url = (res.text or '').strip() if res is not None else ''
+            res_attrs = res.attrib if res is not None else {}
+            yield DlnaItem(element.get('id'), element.get('parentID'), element.findtext(_DC_NS + 'title', ''),
+                           element.findtext(_UPNP_NS + 'class', ''), url, int(res_attrs.get('size') or 0),
+                           res_attrs.get('duration', ''), element.findtext(_DC_NS + 'date', ''),
+                           res_attrs.get('protocolInfo', ''))
+        else:
+            continue
+        element.clear()
+
+
+class DlnaContentDirectory:
+    """
+    Browses a box's DLNA ContentDirectory.
+    Containers are read a page at a time, the pages after the first and the containers at each level are requested
+    concurrently. A walk is cached with the server's system update id, which changes whenever the library does, so
+    an unchanged library costs one small request. The id is read again after a walk, a walk during which it changed
+    is repeated.
+    """
+
+    def __init__(self, dlna_url: str, page_size: int = PAGE_SIZE, concurrency: int = 4,
+                 control_url: Optional[str] = None, transport: Optional[HttpTransport] = None):
+        """
+        :param dlna_url: The box's DLNA URL, SetTopBox.dlna_url
+        :param page_size: Entries requested per Browse
+        :param concurrency: Browse requests in flight at once
+        :param control_url: The ContentDirectory control URL, found from the DLNA URL by default
+        :param transport: Makes the requests, one with a pool of `concurrency` connections is created by default
+        """
+        self.__control_url = control_url if control_url else urljoin(dlna_url, CONTENT_DIRECTORY_PATH)
+        self.__page_size = page_size
+        self.__owns_transport = transport is None
+        self.__transport = transport if transport is not None else HttpTransport(pool_maxsize=concurrency)
+        self.__executor = ThreadPoolExecutor(concurrency, thread_name_prefix='FetchTv-dlna')
+        self.__lock = threading.Lock()
+        # Entries under an object by its id, with the system update id they were read at
+        self.__cache = {}  # type: Dict[Tuple[str, bool], Tuple[int, List[Union[DlnaContainer, DlnaItem]]]]
+        self.__requests = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def requests(self) -> int:
+        """
+        :return: The number of requests made
+        """
+        return self.__requests
+
+    def close(self):
+        self.__executor.shutdown(wait=False)
+        if self.__owns_transport:
+            self.__transport.close()
+
+    def system_update_id(self) -> int:
+        """
+        :return: The server's update id, it changes whenever the library changes
+        """
+        response = self.__call('GetSystemUpdateID', {})
+        return int(response.get('Id') or 0)
+
+    def browse(self, object_id: str = ROOT_ID, start: int = 0, count: Optional[int] = None) -> DlnaPage:
+        """
+        Read one page of a container's children.
+        :param object_id: The container id
+        :param start: The index of the first child
+        :param count: The maximum number of children, defaults to the page size
+        """
+        response = self.__call('Browse', {
+            'ObjectID': object_id, 'BrowseFlag': 'BrowseDirectChildren', 'Filter': '*', 'StartingIndex': start,
+            'RequestedCount': self.__page_size if count is None else count, 'SortCriteria': ''})
+        entries = list(parse_didl(response.get('Result') or ''))
+        return DlnaPage(entries, int(response.get('TotalMatches') or 0), int(response.get('UpdateID') or 0))
+
+    def entries(self, object_id: str = ROOT_ID, recursive: bool = True) -> List[Union[DlnaContainer, DlnaItem]]:
+        """
+        Read all the children of a container, using the cached entries if the library is unchanged.
+        :param object_id: The container id
+        :param recursive: Include the children of containers found
+        :return: Containers and items, each level in the server's order
+        """
+        update_id = self.system_update_id()
+        key = (object_id, recursive)
+        with self.__lock:
+            cached = self.__cache.get(key)
+        if cached and cached[0] == update_id:
+            return cached[1]
+        for _ in range(MAX_WALKS):
+            entries = self.__walk(object_id, recursive)
+            # Browse reports container update ids on some servers, only the system update id covers the library
+            walked_id = self.system_update_id()
+            if walked_id == update_id:
+                break
+            # Changed part way through, the pages may not agree
+            logger.info(f'DlnaContentDirectory --> Library changed while browsing {object_id}, browsing again')
+            update_id = walked_id
+        else:
+            raise DlnaError(f'Library kept changing while browsing {object_id}')
+        with self.__lock:
+            self.__cache[key] = (update_id, entries)
+        return entries
+
+    def items(self, object_id: str = ROOT_ID) -> List[DlnaItem]:
+        """
+        :return: The items under a container and its sub-containers
+        """
+        return [e for e in self.entries(object_id) if isinstance(e, DlnaItem)]
+
+    def reconcile(self, recordings: Recordings, object_id: str = ROOT_ID) -> Reconciliation:
+        """
+        Join a box's recordings to its media by disk id.
+        :param recordings: The box's recordings, SetTopBox.recordings
+        :param object_id: The container holding the recordings
+        """
+        items = self.items(object_id)
+        by_disk_id = {item.disk_id: item for item in items if item.disk_id is not None}
+        matched = {}
+        missing = []
+        for recording in recordings.items.values():
+            item = by_disk_id.pop(recording.disk_id, None)
+            if item is None:
+                missing.append(recording)
+            else:
+                matched[recording.id] = (recording, item)
+        unmatched = [item for item in items if item.disk_id is None or item.disk_id in by_disk_id]
+        with self.__lock:
+            update_id = self.__cache[(object_id, True)][0]
+        return Reconciliation(matched, missing, unmatched, update_id)
+
+    def __walk(self, object_id: str, recursive: bool) -> List[Union[DlnaContainer, DlnaItem]]:
+        """
+        Browse a level of containers at a time: the first page of each, then their remaining pages, concurrently.
+        """
+        entries = []
+        level = [object_id]
+        while level:
+            firsts = [(container_id, self.__executor.submit(self.browse, container_id, 0)) for container_id in level]
+            pages = []  # type: List[Tuple[int, Future]]
+            for position, (container_id, future) in enumerate(firsts):
+                page = future.result()
+                pages.append((position, future))
+                # Stepping by the entries returned, a server may return fewer than the page size. Each page asks for
+                # the same number, more could overlap the next page
+                step = len(page.entries)
+                if step:
+                    pages.extend((position, self.__executor.submit(self.browse, container_id, start, step))
+                                 for start in range(step, page.total, step))
+            next_level = []
+            for _, future in sorted(pages, key=lambda p: p[0]):
+                page = future.result()
+                entries.extend(page.entries)
+                next_level.extend(e.id for e in page.entries if recursive and isinstance(e, DlnaContainer))
+            level = next_level
+        return entries
+
+    def __call(self, action: str, arguments: dict) -> Dict[str, str]:
+        body = ''.join(f'<{k}>{escape(str(v))}</{k}>' for k, v in arguments.items())
+        envelope = (f'<?xml version="1.0" encoding="utf-8"?><s:Envelope xmlns:s="{_SOAP_NS}" '
+                    f's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body>'
+                    f'<u:{action} xmlns:u="{CONTENT_DIRECTORY_SERVICE}">{body}</u:{action}></s:Body></s:Envelope>')
+        headers = {'Content-Type': 'text/xml; charset="utf-8"',
+                   'SOAPAction': f'"{CONTENT_DIRECTORY_SERVICE}#{action}"'}
+        with self.__lock:
+            self.__requests += 1
+        response = self.__transport.request('POST', self.__control_url, data=envelope.encode(), headers=headers)
+        if response.status_code != 200:
+            raise DlnaError(f'{action} returned {response.status_code}')
+        result = ElementTree.fromstring(response.content).find(
+            f'{{{_SOAP_NS}}}Body/{{{CONTENT_DIRECTORY_SERVICE}}}{action}Response')
+        if result is None:
+            raise DlnaError(f'{action} response missing')
+        return {child.tag.rsplit('}', 1)[-1]: child.text for child in result}
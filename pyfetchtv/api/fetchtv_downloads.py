@@ -0,0 +1,402 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from pyfetchtv.api.helpers.backoff import Backoff
+from pyfetchtv.api.helpers.http_transport import HttpTransport
+from pyfetchtv.api.helpers.metrics import MetricsRegistry
+from pyfetchtv.api.json_objects.recording import Recording
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 8 * 1024 * 1024
+# Bytes read from the response and written to disk at a time
+WRITE_BYTES = 64 * 1024
+# Seconds over which the current throughput is measured
+THROUGHPUT_WINDOW_SEC = 5
+
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.part.json'
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadResult:
+    """
+    A completed download.
+    """
+
+    def __init__(self, recording_id: int, terminal_id: str, path: str, size: int, downloaded: int, resumed: int,
+                 chunks: int, seconds: float):
+        self.recording_id = recording_id
+        self.terminal_id = terminal_id
+        self.path = path
+        self.size = size
+        # Bytes fetched by this download, excluding chunks completed by an earlier attempt
+        self.downloaded = downloaded
+        self.resumed = resumed
+        self.chunks = chunks
+        self.seconds = seconds
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: Bytes per second fetched by this download
+        """
+        return self.downloaded / self.seconds if self.seconds > 0 else 0.0
+
+
+class _Download:
+
+    def __init__(self, recording: Recording, path: str, future: Future):
+        self.recording = recording
+        self.url = recording.dlna_url
+        self.path = path
+        self.future = future
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        # None when the server does not report it
+        self.size = 0  # type: Optional[int]
+        self.chunks = []  # type: List[Tuple[int, Optional[int]]]
+        self.done = set()  # type: Set[int]
+        self.pending = 0
+        self.downloaded = 0
+        self.resumed = 0
+        self.error = None  # type: Optional[Exception]
+
+    @property
+    def part_path(self) -> str:
+        return self.path + PART_SUFFIX
+
+    @property
+    def state_path(self) -> str:
+        return self.path + STATE_SUFFIX
+
+
+class RecordingDownloader:
+    """
+    Downloads recordings from the boxes' DLNA servers.
+    Each recording is fetched in chunks with HTTP range requests, in parallel, and streamed to a part file. The
+    completed chunks are recorded next to it, so a failed or interrupted download resumes where it stopped.
+    The connections to each box are limited, a box serves its own playback as well.
+    """
+
+    def __init__(self, workers: int = 8, connections_per_box: int = 4, chunk_bytes: int = CHUNK_BYTES,
+                 connect_timeout_sec: float = 5, read_timeout_sec: float = 30, retries: int = 3,
+                 metrics: Optional[MetricsRegistry] = None, transport: Optional[HttpTransport] = None):
+        """
+        :param workers: Chunks downloaded at once across all boxes
+        :param connections_per_box: Chunks downloaded at once from each box
+        :param chunk_bytes: The size of each range request
+        :param connect_timeout_sec: Seconds to wait for a connection
+        :param read_timeout_sec: Seconds to wait between bytes of a response
+        :param retries: Attempts after a request or a chunk's stream fails, a chunk resumes from the last byte
+            written
+        :param metrics: Records bytes downloaded and downloads completed
+        :param transport: Makes the requests, one with a pool of `workers` connections is created by default
+        """
+        self.__chunk_bytes = chunk_bytes
+        self.__connections_per_box = connections_per_box
+        self.__retries = retries
+        self.__backoff = Backoff(initial_sec=0.5, maximum_sec=10)
+        self.__owns_transport = transport is None
+        self.__transport = transport if transport is not None else HttpTransport(
+            connect_timeout_sec, read_timeout_sec, retries, pool_maxsize=workers)
+        self.__executor = ThreadPoolExecutor(workers, thread_name_prefix='FetchTv-download')
+        self.__lock = threading.Lock()
+        # Work waiting for a connection to each box, and the connections in use. Waiting work is queued here rather
+        # than in the pool, so a box at its limit doesn't hold threads other boxes could use
+        self.__box_queues = {}  # type: Dict[str, Deque[Callable[[], None]]]
+        self.__box_running = {}  # type: Dict[str, int]
+        self.__closed = threading.Event()
+        self.__active = 0
+        self.__completed = 0
+        self.__failed = 0
+        self.__bytes = 0
+        # (time, bytes) of recent writes, for the current throughput
+        self.__recent = deque()  # type: Deque[Tuple[float, int]]
+        self.__metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self.__bytes_counter = self.__metrics.counter('dlna_download_bytes', 'Bytes downloaded from boxes',
+                                                      ('terminal_id',))
+        self.__downloads_counter = self.__metrics.counter('dlna_downloads', 'Recording downloads finished',
+                                                          ('status',))
+        self.__metrics.gauge('dlna_download_bytes_per_sec', 'Current download throughput').set_function(
+            lambda: self.throughput)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: Bytes per second downloaded over the last few seconds, across all downloads
+        """
+        now = time.monotonic()
+        with self.__lock:
+            self.__trim(now)
+            return sum(b for _, b in self.__recent) / THROUGHPUT_WINDOW_SEC
+
+    @property
+    def metrics(self) -> dict:
+        """
+        :return: Downloads active, completed and failed, bytes downloaded and the current throughput
+        """
+        throughput = self.throughput
+        with self.__lock:
+            return {'active': self.__active, 'completed': self.__completed, 'failed': self.__failed,
+                    'bytes': self.__bytes, 'bytes_per_sec': throughput}
+
+    def __trim(self, now: float):
+        while self.__recent and self.__recent[0][0] < now - THROUGHPUT_WINDOW_SEC:
+            self.__recent.popleft()
+
+    def download(self, recording: Recording, path: str) -> 'Future[DownloadResult]':
+        """
+        Download a recording, resuming a previous attempt to the same path.
+        :param recording: The recording, from its box
+        :param path: The file to write, a part file is written alongside it until complete
+        :return: A future resolving to the DownloadResult, or failing with the error which stopped the download
+        """
+        future = Future()
+        if self.__closed.is_set():
+            future.set_exception(DownloadError('Downloader closed'))
+            return future
+        download = _Download(recording, path, future)
+        with self.__lock:
+            self.__active += 1
+        self.__run_for_box(recording.terminal_id, lambda: self.__start(download))
+        return future
+
+    def download_all(self, recordings: Iterable[Recording], directory: str) -> Dict[int, 'Future[DownloadResult]']:
+        """
+        Download recordings to a directory, each is named by its box and recording id.
+        :return: Futures by recording id
+        """
+        os.makedirs(directory, exist_ok=True)
+        return {r.id: self.download(r, os.path.join(directory, f'{r.terminal_id}-{r.id}.ts')) for r in recordings}
+
+    def close(self):
+        """
+        Stop downloading, part files are kept so the downloads can resume.
+        """
+        self.__closed.set()
+        self.__executor.shutdown(wait=True)
+        if self.__owns_transport:
+            self.__transport.close()
+
+    def __run_for_box(self, terminal_id: str, task: Callable[[], None]):
+        """
+        Run a task on the pool once one of the box's connections is free, each task uses one connection.
+        """
+        with self.__lock:
+            self.__box_queues.setdefault(terminal_id, deque()).append(task)
+        self.__drain(terminal_id)
+
+    def __drain(self, terminal_id: str):
+        while True:
+            with self.__lock:
+                queue = self.__box_queues.get(terminal_id)
+                running = self.__box_running.get(terminal_id, 0)
+                if not queue or running >= self.__connections_per_box:
+                    return
+                task = queue.popleft()
+                self.__box_running[terminal_id] = running + 1
+            try:
+                self.__executor.submit(self.__run_box_task, terminal_id, task, True)
+            except RuntimeError:
+                # Closed, run it here so its download records that it stopped, the loop takes the next
+                self.__run_box_task(terminal_id, task, False)
+
+    def __run_box_task(self, terminal_id: str, task: Callable[[], None], drain: bool):
+        try:
+            task()
+        except Exception:
+            logger.error('RecordingDownloader --> Download task failed.', exc_info=True)
+        finally:
+            with self.__lock:
+                self.__box_running[terminal_id] -= 1
+        if drain:
+            self.__drain(terminal_id)
+
+    def __start(self, download: _Download):
+        try:
+            if self.__closed.is_set():
+                raise DownloadError('Downloader closed')
+            response = self.__transport.request('HEAD', download.url)
+            response.close()
+            if response.status_code != 200:
+                raise DownloadError(f'{download.url} returned {response.status_code}')
+            length = response.headers.get('Content-Length')
+            if length is None:
+                # Size unknown, one GET read to the end of the response
+                download.size = None
+                ranges = False
+                chunk_bytes = 0
+                download.chunks = [(0, None)]
+            else:
+                download.size = int(length)
+                ranges = response.headers.get('Accept-Ranges') == 'bytes'
+                chunk_bytes = self.__chunk_bytes if ranges else max(download.size, 1)
+                download.chunks = [(start, min(start + chunk_bytes, download.size))
+                                   for start in range(0, download.size, chunk_bytes)]
+            download.done = self.__load_state(download, chunk_bytes)
+            download.resumed = sum(end - start for i, (start, end) in enumerate(download.chunks)
+                                   if i in download.done)
+            if not download.done:
+                with open(download.part_path, 'wb') as file:
+                    file.truncate(download.size or 0)
+            self.__save_state(download, chunk_bytes)
+        except Exception as e:
+            download.error = e
+            self.__finish(download)
+            return
+        todo = [i for i in range(len(download.chunks)) if i not in download.done]
+        if download.resumed:
+            logger.info(f'RecordingDownloader --> Resuming {download.url}, {download.resumed} bytes already held')
+        if not todo:
+            self.__finish(download)
+            return
+        download.pending = len(todo)
+        for index in todo:
+            self.__run_for_box(download.recording.terminal_id,
+                               lambda i=index: self.__fetch_chunk(download, i, chunk_bytes, ranges))
+
+    def __load_state(self, download: _Download, chunk_bytes: int) -> Set[int]:
+        try:
+            with open(download.state_path) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return set()
+        if download.size is None or state.get('url') != download.url or state.get('size') != download.size or \
+                state.get('chunk_bytes') != chunk_bytes or not os.path.exists(download.part_path):
+            return set()
+        return set(state.get('done', []))
+
+    @staticmethod
+    def __save_state(download: _Download, chunk_bytes: int):
+        state = {'url': download.url, 'size': download.size, 'chunk_bytes': chunk_bytes, 'done': sorted(download.done)}
+        temp_path = download.state_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(temp_path, download.state_path)
+
+    def __fetch_chunk(self, download: _Download, index: int, chunk_bytes: int, ranges: bool):
+        import requests
+        error = None
+        if download.error is None and not self.__closed.is_set():
+            start, end = download.chunks[index]
+            position = start
+            attempt = 0
+            while True:
+                try:
+                    position = self.__stream(download, position, end, ranges)
+                    if end is None or position >= end:
+                        break
+                    reason = 'incomplete response'
+                except (requests.RequestException, OSError, DownloadError) as e:
+                    reason = f'{type(e).__name__}: {e}'
+                    if isinstance(e, DownloadError) or attempt >= self.__retries:
+                        error = e
+                        break
+                if attempt >= self.__retries:
+                    error = DownloadError(f'{download.url} bytes {position}-{end - 1 if end else ""}: {reason}')
+                    break
+                if not ranges:
+                    # Without range requests the download starts again
+                    position = start
+                attempt += 1
+                delay = self.__backoff.delay(attempt - 1)
+                logger.warning(f'RecordingDownloader --> {download.url} chunk {index} failed ({reason}), '
+                               f'retry {attempt} in {delay:.1f}s')
+                if self.__closed.wait(delay):
+                    error = DownloadError('Downloader closed')
+                    break
+        elif download.error is None:
+            error = DownloadError('Downloader closed')
+        with download.lock:
+            if error is not None:
+                download.error = download.error or error
+            elif download.error is None and not self.__closed.is_set():
+                if end is None:
+                    download.size = position
+                download.done.add(index)
+                self.__save_state(download, chunk_bytes)
+            download.pending -= 1
+            last = download.pending == 0
+        if last:
+            self.__finish(download)
+
+    def __stream(self, download: _Download, start: int, end: Optional[int], ranges: bool) -> int:
+        """
+        Write bytes start to end, exclusive, of the recording to its part file.
+        :param end: None to read to the end of the response
+        :return: The position reached, end unless the response stopped early
+        """
+        headers = {'Range': f'bytes={start}-{end - 1}'} if ranges else None
+        response = self.__transport.get(download.url, headers=headers, stream=True)
+        try:
+            if response.status_code != (206 if ranges else 200):
+                raise DownloadError(f'{download.url} returned {response.status_code}')
+            position = start
+            with open(download.part_path, 'r+b') as file:
+                file.seek(start)
+                for data in response.iter_content(WRITE_BYTES):
+                    if self.__closed.is_set():
+                        break
+                    if end is not None:
+                        data = data[:end - position]
+                    file.write(data)
+                    position += len(data)
+                    self.__count(download, len(data))
+                    if end is not None and position >= end:
+                        break
+                if end is None:
+                    # An earlier attempt may have written further
+                    file.truncate(position)
+            return position
+        finally:
+            response.close()
+
+    def __count(self, download: _Download, size: int):
+        now = time.monotonic()
+        with download.lock:
+            download.downloaded += size
+        with self.__lock:
+            self.__bytes += size
+            self.__recent.append((now, size))
+            self.__trim(now)
+        self.__bytes_counter.inc(download.recording.terminal_id, amount=size)
+
+    def __finish(self, download: _Download):
+        error = download.error
+        if error is None:
+            try:
+                os.replace(download.part_path, download.path)
+                os.remove(download.state_path)
+            except OSError as e:
+                error = e
+        with self.__lock:
+            self.__active -= 1
+            if error is None:
+                self.__completed += 1
+            else:
+                self.__failed += 1
+        self.__downloads_counter.inc('completed' if error is None else 'failed')
+        if error is not None:
+            logger.error(f'RecordingDownloader --> Download of {download.url} failed. {type(error).__name__}: {error}')
+            download.future.set_exception(error)
+            return
+        recording = download.recording
+        download.future.set_result(DownloadResult(recording.id, recording.terminal_id, download.path, download.size,
+                                                  download.downloaded, download.resumed, len(download.chunks),
+                                                  time.monotonic() - download.start))
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, List, Callable
+from typing import Dict, Optional, List, Callable, Iterable
 
 from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
 from pyfetchtv.api.fetchtv_box_interface import FetchTvBoxInterface
@@ -47,6 +47,14 @@ class SubscriberMessage:
             'terminal_id': self.__terminal_id
         }
 
+    @staticmethod
+    def from_dict(value: dict) -> 'SubscriberMessage':
+        return SubscriberMessage(time=value['time'],
+                                 message=value['message'],
+                                 msg_group=MessageType[value['group']],
+                                 msg_command=MessageTypeIn[value['command']],
+                                 terminal_id=value['terminal_id'])
+
 
 class FetchTvInterface(ABC):
 
@@ -108,7 +116,26 @@ class FetchTvInterface(ABC):
         pass
 
     @abstractmethod
-    def add_subscriber(self, subscriber_id: str, callback: Callable[[SubscriberMessage], None]):
+    def add_subscriber(self, subscriber_id: str, callback: Callable[[SubscriberMessage], None],
+                       groups: Optional[Iterable[MessageType]] = None,
+                       commands: Optional[Iterable[MessageTypeIn]] = None,
+                       terminal_ids: Optional[Iterable[str]] = None):
+        """
+        Register a callback for subscriber messages.
+        Filters left as None match everything, otherwise only messages matching every filter are delivered.
+        :param subscriber_id: Unique id for the subscriber, replaces an existing subscriber with the same id
+        :param callback: Called with each matching message
+        :param groups: The message groups to receive
+        :param commands: The message commands to receive
+        :param terminal_ids: The FetchTV Box IDs to receive messages for
+        """
+        pass
+
+    @abstractmethod
+    def has_subscribers(self, group: MessageType, command: MessageTypeIn, terminal_id: str) -> bool:
+        """
+        :return: True if any subscriber wants a message with the provided group, command and terminal id
+        """
         pass
 
     @abstractmethod
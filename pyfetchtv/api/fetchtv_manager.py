@@ -0,0 +1,102 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.helpers.epg_store import EpgStore
+from pyfetchtv.api.helpers.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class FetchTvManager:
+    """
+    Hosts many FetchTV accounts in one process.
+    The accounts share one HTTP connection pool, one EPG store, so accounts with the same channels share the EPG
+    and its requests, and one scheduler for their periodic work.
+    """
+
+    def __init__(self, scheduler_workers: int = 4, pool_maxsize: int = 10, **fetchtv_options):
+        """
+        :param scheduler_workers: Threads running periodic work for all accounts
+        :param pool_maxsize: Connections kept open to each host
+        :param fetchtv_options: Default options for each FetchTV, e.g. ping_sec
+        """
+        self.__lock = threading.Lock()
+        self.__accounts = {}  # type: Dict[str, FetchTV]
+        self.__options = fetchtv_options
+        self.__scheduler = Scheduler('FetchTvManager-scheduler', scheduler_workers)
+        self.__epg_store = EpgStore()
+        from requests.adapters import HTTPAdapter
+        self.__http_adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def accounts(self) -> Dict[str, FetchTV]:
+        with self.__lock:
+            return dict(self.__accounts)
+
+    @property
+    def epg_store(self) -> EpgStore:
+        return self.__epg_store
+
+    @property
+    def scheduler(self) -> Scheduler:
+        return self.__scheduler
+
+    def get_account(self, name: str) -> Optional[FetchTV]:
+        return self.__accounts.get(name)
+
+    def create_account(self, name: str, **fetchtv_options) -> FetchTV:
+        """
+        Create a FetchTV using the shared resources, without logging in.
+        :param name: Unique name for the account
+        :param fetchtv_options: Options for this account, overriding the manager's defaults
+        """
+        # The account name labels its gauges in a shared metrics registry
+        options = dict(self.__options, instance=name)
+        options.update(fetchtv_options)
+        fetchtv = FetchTV(scheduler=self.__scheduler, epg_store=self.__epg_store, http_adapter=self.__http_adapter,
+                          **options)
+        with self.__lock:
+            previous = self.__accounts.get(name)
+            self.__accounts[name] = fetchtv
+        if previous:
+            previous.close()
+        return fetchtv
+
+    def add_account(self, name: str, activation_code: str, pin: str, **fetchtv_options) -> Optional[FetchTV]:
+        """
+        Create and login to an account.
+        :param name: Unique name for the account
+        :param activation_code: The account activation code
+        :param pin: The account PIN
+        :param fetchtv_options: Options for this account, overriding the manager's defaults
+        :return: The logged in FetchTV, or None if the login failed
+        """
+        fetchtv = self.create_account(name, **fetchtv_options)
+        if not fetchtv.login(activation_code, pin):
+            logger.error(f'FetchTvManager --> Login to account [{name}] failed.')
+            self.remove_account(name)
+            return None
+        return fetchtv
+
+    def remove_account(self, name: str):
+        with self.__lock:
+            fetchtv = self.__accounts.pop(name, None)
+        if fetchtv:
+            fetchtv.close()
+
+    def close(self):
+        with self.__lock:
+            accounts = list(self.__accounts.values())
+            self.__accounts = {}
+        for fetchtv in accounts:
+            fetchtv.close()
+        self.__scheduler.close()
+        self.__http_adapter.close()
@@ -1,15 +1,25 @@
-import json
 import logging
 import threading
 import time
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Callable, Deque, Dict, Tuple
 
-from pyfetchtv.api.const.message_types import MessageTypeOut
+from pyfetchtv.api.const.message_types import MessageTypeOut, MessageType, MessageTypeIn
+from pyfetchtv.api.const.queue_result import QueueResult
 from pyfetchtv.api.const.remote_keys import RemoteKey
 from pyfetchtv.api.fetchtv_box_interface import RecordSeriesParameters, RecordProgramParameters
 from pyfetchtv.api.fetchtv_interface import FetchTvInterface, SubscriberMessage
 from pyfetchtv.api.fetchtv_messages_interface import FetchTvMessagesInterface
+from pyfetchtv.api.helpers import json_codec
+from pyfetchtv.api.helpers.correlation import ResponseCorrelator, recording_update_matcher, series_update_matcher, \
+    deleted_recordings_matcher
+from pyfetchtv.api.helpers.journal import MessageJournal, JournalEntry
+from pyfetchtv.api.helpers.metrics import MetricsRegistry
+from pyfetchtv.api.helpers.outbound_queue import OutboundQueue
+from pyfetchtv.api.helpers.scheduler import Scheduler
+from pyfetchtv.api.helpers.tracing import Tracer, Span
 from pyfetchtv.api.helpers.ws_message_handler import WsMessageHandler
 
 logger = logging.getLogger(__name__)
@@ -21,39 +31,169 @@ class FetchTvMessageHandler(WsMessageHandler, FetchTvMessagesInterface):
     def fetchtv(self) -> FetchTvInterface:
         return self.__fetchtv
 
-    def __init__(self, name: str, fetchtv: FetchTvInterface, ping_sec: int = 60):
-        super().__init__(name, ping_sec)
+    def __init__(self, name: str, fetchtv: FetchTvInterface, ping_sec: int = 60, send_rate_per_sec: float = 4.0,
+                 send_burst: int = 8, response_timeout_sec: float = 30, max_missed_pongs: int = 2,
+                 history_size: int = 10, journal: Optional[MessageJournal] = None, scheduler: Scheduler = None,
+                 metrics: MetricsRegistry = None, tracer: Tracer = None, instance: str = None):
+        super().__init__(name, ping_sec, scheduler=scheduler, metrics=metrics, instance=instance)
+        self.__tracer = tracer if tracer is not None else Tracer()
+        # Command spans waiting to send, by messageId, with whether they also wait for a response
+        self.__sending = {}  # type: Dict[str, Tuple[Span, bool]]
         self.__fetchtv = fetchtv
+        self.__outbound = OutboundQueue(name, self.send_message, send_rate_per_sec, send_burst)
         self.__last_receive_time = None
-        self.__messages = []  # type: List[SubscriberMessage]
+        self.__messages = deque(maxlen=history_size)  # type: Deque[SubscriberMessage]
+        self.__journal = journal
         self.__lock = threading.Lock()
+        self.__correlator = ResponseCorrelator(response_timeout_sec)
+        self.__last_message_id = 0
+        self.__max_missed_pongs = max_missed_pongs
+        self.__missed_pongs = 0
+        self.__awaiting_pong = False
+        self.__expiry_task = None
+        self.__received_counter = self.metrics.counter('ws_messages_received', 'Websocket messages received',
+                                                       ('type',))
+        self.__ping_histogram = self.metrics.histogram('ping_rtt_seconds', 'PING to PONG round trip',
+                                                       ('terminal_id',))
+        self.__outbound_gauge = self.metrics.gauge('outbound_queue_depth', 'Commands waiting to send', ('instance',))
+        self.__outbound_gauge.set_function(lambda: sum(self.__outbound.metrics['depth'].values()), self.instance)
 
     @property
     def messages(self) -> List[SubscriberMessage]:
-        return self.__messages
+        with self.__lock:
+            return list(self.__messages)
+
+    @property
+    def journal(self) -> Optional[MessageJournal]:
+        return self.__journal
+
+    def wants_message(self, group: MessageType, command: MessageTypeIn, terminal_id: str) -> bool:
+        # The history and journal keep every message for later consumers, set history_size=0 without a journal to
+        # build payloads only for subscribers
+        return (self.__journal is not None or self.__messages.maxlen > 0
+                or self.__fetchtv.has_subscribers(group, command, terminal_id))
 
     @property
     def last_received(self) -> datetime:
         return self.__last_receive_time
 
+    @property
+    def outbound_metrics(self) -> dict:
+        return self.__outbound.metrics
+
     def keep_alive(self):
         account = self.__fetchtv.account
         if not account:
             return
+        if self.__check_missed_pongs():
+            return
         for key in self.__fetchtv.account.terminals.keys():
             self.send_ping(key)
 
+    def __check_missed_pongs(self) -> bool:
+        """
+        Detect a silently dropped connection, nothing received since the last round of pings.
+        Only applies once a box has responded, so a box which is switched off does not cause reconnects.
+        :return: True if a reconnect was started
+        """
+        if not self.__awaiting_pong or not self.__fetchtv.get_boxes():
+            self.__awaiting_pong = True
+            return False
+        self.__missed_pongs += 1
+        if self.__missed_pongs < self.__max_missed_pongs:
+            return False
+        logger.warning(f'{self.name} --> No response to {self.__missed_pongs} pings, reconnecting.')
+        self.__missed_pongs = 0
+        self.__awaiting_pong = False
+        self._reconnect()
+        return True
+
+    def on_reconnect(self):
+        # Restore box state without a full login
+        account = self.__fetchtv.account
+        if not account:
+            return
+        logger.info(f'{self.name} --> Reconnected, resyncing {len(account.terminals)} boxes.')
+        for terminal_id in account.terminals.keys():
+            self.send_is_alive(terminal_id)
+        for terminal_id in self.__fetchtv.get_boxes().keys():
+            self.send_media_state(terminal_id)
+            self.send_future_recordings(terminal_id)
+
     def _call_send_message(self, to: str, msg_type: MessageTypeOut, is_queueable=False, requires_settopbox=False,
-                           only_paired_settopbox=False, values=None):
+                           only_paired_settopbox=False, values=None,
+                           matcher: Callable[[dict], bool] = None) -> Optional[Future]:
         msg = self.__create_msg(to, msg_type, is_queueable, requires_settopbox, only_paired_settopbox, values)
-        logger.info(f'{self.name} --> Sending {msg_type.name} message to {to}')
-        self.send_message(msg)
-
-    def send_ping(self, terminal_id: str):
-        self._call_send_message(terminal_id, MessageTypeOut.PING, only_paired_settopbox=True)
+        message_id = msg['message']['data']['messageId']
+        future = None
+        if self.__correlator.expects_response(msg_type):
+            # Register before sending so a fast response cannot be missed
+            future = self.__correlator.register(to, message_id, msg_type, matcher)
+        span = None
+        if self.__tracer.enabled:
+            span = self.__tracer.start_span('command', message_id, type=msg_type.name, terminal_id=to)
+            self.__sending[message_id] = (span, future is not None)
+            if future:
+                future.add_done_callback(lambda done: self.__finish_command(span, done))
+        result = self.__outbound.put(to, msg_type, msg)
+        if result == QueueResult.QUEUED:
+            logger.info(f'{self.name} --> Sending {msg_type.name} message to {to}')
+        elif result == QueueResult.COALESCED:
+            logger.debug(f'{self.name} --> Coalesced {msg_type.name} message to {to}')
+            if span:
+                # Answered by the response to the command already queued
+                self.__sending.pop(message_id, None)
+                span.set_attribute('coalesced', True)
+                if not future:
+                    span.finish()
+        else:
+            logger.warning(f'{self.name} --> Discarded {msg_type.name} message to {to}, the handler is closed.')
+            if span:
+                self.__sending.pop(message_id, None)
+                span.set_attribute('discarded', True)
+                span.finish()
+            if future:
+                future.cancel()
+        return future
 
     @staticmethod
-    def __create_msg(to: str, msg_type: MessageTypeOut, is_queueable=False, requires_settopbox=False,
+    def __finish_command(span: Span, future: Future):
+        if future.cancelled():
+            span.set_attribute('cancelled', True)
+            span.finish()
+        elif future.exception() is not None:
+            span.finish(future.exception())
+        else:
+            span.set_attribute('response_type', future.result().get('type'))
+            span.finish()
+
+    def send_message(self, message: dict):
+        sending = self.__sending.pop(message['message']['data'].get('messageId'), None) if self.__sending else None
+        super().send_message(message)
+        if sending:
+            span, awaiting_response = sending
+            span.add_event('sent')
+            if not awaiting_response:
+                span.finish()
+
+    def send_ping(self, terminal_id: str) -> Future:
+        future = self._call_send_message(terminal_id, MessageTypeOut.PING, only_paired_settopbox=True)
+        if self.metrics.enabled:
+            start = time.perf_counter()
+
+            def observe(done: Future):
+                if not done.cancelled() and done.exception() is None:
+                    self.__ping_histogram.observe(time.perf_counter() - start, terminal_id)
+            future.add_done_callback(observe)
+        return future
+
+    def __next_message_id(self, to: str) -> str:
+        # Millisecond timestamp, bumped when needed so ids stay unique when commands are pipelined
+        with self.__lock:
+            self.__last_message_id = max(round(time.time() * 1000), self.__last_message_id + 1)
+            return f"{to}_{self.__last_message_id}"
+
+    def __create_msg(self, to: str, msg_type: MessageTypeOut, is_queueable=False, requires_settopbox=False,
                      only_paired_settopbox=False, values=None):
         result = {
             "to": to,
@@ -68,18 +208,19 @@ class FetchTvMessageHandler(WsMessageHandler, FetchTvMessagesInterface):
         }
         if values:
             result['message'].update(values)
-        result['message']['data']['messageId'] = f"{to}_{str(round(time.time() * 1000))}"
+        result['message']['data']['messageId'] = self.__next_message_id(to)
         return result
 
-    def send_is_alive(self, terminal_id):
-        self._call_send_message(terminal_id, MessageTypeOut.ARE_YOU_ALIVE, is_queueable=True,
+    def send_is_alive(self, terminal_id) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.ARE_YOU_ALIVE, is_queueable=True,
                                 only_paired_settopbox=True)
 
-    def send_remote_key(self, terminal_id: str, key: RemoteKey):
+    def send_remote_key(self, terminal_id: str, key: RemoteKey) -> Optional[Future]:
         self._call_send_message(terminal_id, MessageTypeOut.KEYEVENT, requires_settopbox=True,
                                 values={"keyName": str(key.value)})
         if key == RemoteKey.Stop:
-            self.send_media_state(terminal_id)
+            return self.send_media_state(terminal_id)
+        return None
 
     def send_keycode(self, terminal_id: str, key: str):
         self._call_send_message(terminal_id, MessageTypeOut.KEYCODE, requires_settopbox=True,
@@ -89,15 +230,15 @@ class FetchTvMessageHandler(WsMessageHandler, FetchTvMessagesInterface):
         self._call_send_message(terminal_id, MessageTypeOut.PLAY_CHANNEL, requires_settopbox=True,
                                 values={"channelId": int(channel_id)})
 
-    def send_media_state(self, terminal_id: str):
-        self._call_send_message(terminal_id, MessageTypeOut.MEDIA_STATE, requires_settopbox=True)
+    def send_media_state(self, terminal_id: str) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.MEDIA_STATE, requires_settopbox=True)
 
-    def send_future_recordings(self, terminal_id: str):
-        self._call_send_message(terminal_id, MessageTypeOut.FUTURE_RECORDINGS_LIST, requires_settopbox=True)
+    def send_future_recordings(self, terminal_id: str) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.FUTURE_RECORDINGS_LIST, requires_settopbox=True)
 
-    def send_delete_recordings(self, terminal_id: str, recording_ids: List[int]):
+    def send_delete_recordings(self, terminal_id: str, recording_ids: List[int]) -> Future:
         recording_ids = [rid for rid in recording_ids]
-        self._call_send_message(terminal_id,
+        return self._call_send_message(terminal_id,
                                 MessageTypeOut.PENDING_DELETE_RECORDINGS_BY_ID,
                                 requires_settopbox=True,
                                 values={
@@ -108,61 +249,140 @@ class FetchTvMessageHandler(WsMessageHandler, FetchTvMessagesInterface):
                                     'data': {
                                         'recordingIds': recording_ids
                                     }
-                                })
+                                },
+                                matcher=deleted_recordings_matcher(recording_ids))
+
+    def close(self):
+        if self.__expiry_task:
+            self.__expiry_task.cancel()
+        self.__outbound.close()
+        self.__outbound_gauge.remove(self.instance)
+        self.__correlator.cancel_all()
+        for span, _ in list(self.__sending.values()):
+            span.set_attribute('discarded', True)
+            span.finish()
+        self.__sending.clear()
+        super().close()
+        if self.__journal:
+            self.__journal.close()
 
     def on_open(self):
         logger.info(f'{self.name} --> Connected to FetchTV Web Socket')
+        if not self.__expiry_task:
+            self.__expiry_task = self.scheduler.every(1, self.__correlator.expire, f'{self.name}-expire-commands')
 
     def on_error(self, error: str):
         logger.info(f"{self.name} --> {error}")
 
     def on_message(self, message):
         self.__last_receive_time = datetime.now()
-        message = json.loads(message)
+        self.__awaiting_pong = False
+        self.__missed_pongs = 0
+        if self.__journal:
+            self.__journal.append_raw(message)
+        message = json_codec.loads(message)
+        if not self.__tracer.enabled:
+            self.__handle_message(message)
+            return
+        body = message.get('message') or {}
+        data = body.get('data')
+        message_id = data.get('messageId') if isinstance(data, dict) else None
+        span = self.__tracer.start_span('message', message_id, type=body.get('type'), terminal_id=message.get('sender'))
+        try:
+            self.__handle_message(message)
+        except Exception as e:
+            span.finish(e)
+            raise
+        span.finish()
+
+    def __handle_message(self, message: dict, replaying=False):
         if 'type' not in message['message']:
             if message['message']['frag'] not in ['SUBSCRIPTIONS_INITIALISED']:
                 logger.warning(f"{self.name} --> Received unknown message:\n{message['message']}")
             return
         msg_type = message['message']['type']
         terminal_id = message['sender']
-        logger.info(f"{self.name} --> Received {msg_type} from {terminal_id}.")
+        if not replaying:
+            self.__received_counter.inc(msg_type)
+        logger.info(f"{self.name} --> {'Replaying' if replaying else 'Received'} {msg_type} from {terminal_id}.")
         if msg_type == 'I_AM_ALIVE':
             self.__fetchtv.set_box(terminal_id, message['message']['data'])
         box = self.__fetchtv.get_box(terminal_id)
+        if replaying:
+            if box:
+                box.process_message(message)
+            return
         if msg_type == 'PONG' and not box:
             self.send_is_alive(terminal_id)
-        if not box:
-            return
-        msg = box.process_message(message)
-        with self.__lock:
-            if len(self.__messages) > 10:
-                self.__messages.pop(0)
-            self.__messages.append(msg)
-        self.__fetchtv.publish_to_subscribers(msg)
+        msg = box.process_message(message) if box else None
+        if msg:
+            with self.__lock:
+                self.__messages.append(msg)
+            if self.__journal:
+                self.__journal.append(JournalEntry.SUBSCRIBER, msg.to_dict())
+            if self.__fetchtv.has_subscribers(msg.group, msg.command, msg.terminal_id):
+                self.__fetchtv.publish_to_subscribers(msg)
+        # Complete waiting commands after the box state is updated
+        self.__correlator.resolve(terminal_id, msg_type, message['message'])
+
+    def replay_messages(self, callback: Callable[[SubscriberMessage], None], since_msec: int = 0) -> int:
+        """
+        Feed journaled subscriber messages to a callback, e.g. to catch up a new subscriber.
+        :param callback: Called with each message in the order published
+        :param since_msec: Only replay messages journaled at or after this time, in milliseconds since the epoch
+        :return: The number of messages replayed
+        """
+        count = 0
+        for entry in self.__replay(since_msec, JournalEntry.SUBSCRIBER):
+            callback(SubscriberMessage.from_dict(entry.data))
+            count += 1
+        return count
+
+    def __replay(self, since_msec: int, kind: str):
+        if self.__journal is None:
+            raise RuntimeError('Replaying messages requires a journal, create FetchTV with journal=MessageJournal(...)')
+        return self.__journal.replay(since_msec, [kind])
+
+    def rebuild_state(self, since_msec: int = 0) -> int:
+        """
+        Rebuild box state by reprocessing journaled websocket messages, without publishing or sending anything.
+        :param since_msec: Only replay messages journaled at or after this time, in milliseconds since the epoch
+        :return: The number of messages replayed
+        """
+        count = 0
+        for entry in self.__replay(since_msec, JournalEntry.RAW):
+            try:
+                self.__handle_message(entry.data, replaying=True)
+            except Exception:
+                logger.error(f'{self.name} --> Replaying message failed', exc_info=True)
+            count += 1
+        return count
 
-    def record_program(self, terminal_id: str, params: RecordProgramParameters):
-        self._call_send_message(terminal_id, MessageTypeOut.RECORD_PROGRAM, requires_settopbox=True, values={
+    def record_program(self, terminal_id: str, params: RecordProgramParameters) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.RECORD_PROGRAM, requires_settopbox=True, values={
             "channelId": params.channel_id,
             "programId": params.program_id,
             "epgProgramId": params.epg_program_id,
             "lagTime": params.lag_time_min,
             "leadTime": params.lead_time_min,
             "protected": params.protect_item
-        })
+        }, matcher=recording_update_matcher(params.program_id))
 
-    def cancel_recording(self, terminal_id: str, program_id: str):
-        self._call_send_message(terminal_id, MessageTypeOut.RECORD_PROGRAM_CANCEL, requires_settopbox=True, values={
-            "programId": program_id
-        })
+    def cancel_recording(self, terminal_id: str, program_id: str) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.RECORD_PROGRAM_CANCEL, requires_settopbox=True,
+                                       values={
+                                           "programId": program_id
+                                       }, matcher=recording_update_matcher(program_id))
 
-    def cancel_series(self, terminal_id: str, program_id: str, series_link: str):
-        self._call_send_message(terminal_id, MessageTypeOut.DISABLE_SERIES_TAG, requires_settopbox=True, values={
-            "programId": program_id,
-            "seriesLinkId": series_link
-        })
+    def cancel_series(self, terminal_id: str, program_id: str, series_link: str) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.DISABLE_SERIES_TAG, requires_settopbox=True,
+                                       values={
+                                           "programId": program_id,
+                                           "seriesLinkId": series_link
+                                       }, matcher=series_update_matcher(series_link))
 
-    def record_series(self, terminal_id: str, params: RecordSeriesParameters):
-        self._call_send_message(terminal_id, MessageTypeOut.ENABLE_SERIES_TAG, requires_settopbox=True, values={
+    def record_series(self, terminal_id: str, params: RecordSeriesParameters) -> Future:
+        return self._call_send_message(terminal_id, MessageTypeOut.ENABLE_SERIES_TAG, requires_settopbox=True, values={
             "seriesLink": params.series_link,
             "channelId": params.channel_id,
             "epgProgramId": params.epg_program_id,
@@ -171,4 +391,4 @@ class FetchTvMessageHandler(WsMessageHandler, FetchTvMessagesInterface):
             "lagTime": params.lag_time_min,
             "episodesToKeep": params.num_episodes_to_keep,
             "seasonsVal": params.start_season
-        })
+        }, matcher=series_update_matcher(params.series_link))
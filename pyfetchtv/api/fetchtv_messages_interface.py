@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
 from pyfetchtv.api.const.remote_keys import RemoteKey
 from pyfetchtv.api.fetchtv_box_interface import RecordSeriesParameters, RecordProgramParameters
 from pyfetchtv.api.fetchtv_interface import FetchTvInterface, SubscriberMessage
@@ -19,27 +21,30 @@ class FetchTvMessagesInterface(ABC):
         pass
 
     @abstractmethod
-    def send_ping(self, terminal_id: str):
+    def send_ping(self, terminal_id: str) -> Future:
         """
         Send a Ping message to a FetchTV Box. Responds with a "PONG" message.
         :param terminal_id: The FetchTV Box ID
+        :return: A future resolving to the "PONG" message
         """
         pass
 
     @abstractmethod
-    def send_is_alive(self, terminal_id: str):
+    def send_is_alive(self, terminal_id: str) -> Future:
         """
         Send is alive message, returns full Fetch TV Box state as an "I_AM_ALIVE" message.
         :param terminal_id: The FetchTV Box ID
+        :return: A future resolving to the "I_AM_ALIVE" message
         """
         pass
 
     @abstractmethod
-    def send_remote_key(self, terminal_id: str, key: RemoteKey):
+    def send_remote_key(self, terminal_id: str, key: RemoteKey) -> Optional[Future]:
         """
         Sends a Remote Key to the FetchTV box. e.g. Play, Pause, Stop etc...
         :param terminal_id: The FetchTV Box ID
         :param key: RemoteKey enumeration
+        :return: For RemoteKey.Stop a future resolving to the following "MEDIA_STATE" message, otherwise None
         """
         pass
 
@@ -53,19 +58,21 @@ class FetchTvMessagesInterface(ABC):
         pass
 
     @abstractmethod
-    def send_media_state(self, terminal_id: str):
+    def send_media_state(self, terminal_id: str) -> Future:
         """
         Sends a message to get the current media state of the FetchTV Box. Returns a "MEDIA_STATE" message.
         :param terminal_id: The FetchTV Box ID
+        :return: A future resolving to the "MEDIA_STATE" message
         """
         pass
 
     @abstractmethod
-    def record_program(self, terminal_id: str, params: RecordProgramParameters):
+    def record_program(self, terminal_id: str, params: RecordProgramParameters) -> Future:
         """
         Schedule the provided program to record.
         :param terminal_id: The FetchTV Box ID
         :param params: The program details
+        :return: A future resolving to the "RECORDINGS_UPDATE" message, or raising CommandFailedError
         """
         pass
 
@@ -79,21 +86,23 @@ class FetchTvMessagesInterface(ABC):
         pass
 
     @abstractmethod
-    def cancel_recording(self, terminal_id: str, program_id: str):
+    def cancel_recording(self, terminal_id: str, program_id: str) -> Future:
         """
         Cancel the specified program from recording.
         :param terminal_id: The FetchTV Box ID
         :param program_id: The Program ID
+        :return: A future resolving to the "RECORDINGS_UPDATE" message
         """
         pass
 
     @abstractmethod
-    def send_delete_recordings(self, terminal_id: str, recording_ids: List[int]):
+    def send_delete_recordings(self, terminal_id: str, recording_ids: List[int]) -> Future:
         """
         Delete the specified stored recordings from the FetchTV box.
         This sets the recordings to Pending Delete, the FetchTV box will delete them eventually, or as needed.
         :param terminal_id: The FetchTV Box ID
         :param recording_ids: A list of the Recording IDs
+        :return: A future resolving to the "PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS" message
         """
         pass
 
@@ -102,24 +111,34 @@ class FetchTvMessagesInterface(ABC):
     def messages(self) -> List[SubscriberMessage]:
         """
         .
-        :return: A list of messages sent to Subscribers from oldest to newest, capped at 10 messages.
+        :return: A list of messages sent to Subscribers from oldest to newest, capped at the history size.
         """
         pass
 
     @abstractmethod
-    def cancel_series(self, terminal_id: str, program_id: str, series_link: str):
+    def wants_message(self, group: MessageType, command: MessageTypeIn, terminal_id: str) -> bool:
+        """
+        :return: True if a message with the provided group, command and terminal id will be published, kept in the
+        history or journaled, so its payload needs to be built.
+        """
+        pass
+
+    @abstractmethod
+    def cancel_series(self, terminal_id: str, program_id: str, series_link: str) -> Future:
         """
         Cancel the specified Series from recording.
         :param terminal_id: The FetchTV Box ID
         :param program_id: The program ID
         :param series_link: The series ID
+        :return: A future resolving to the "RECORDINGS_UPDATE" message
         """
         pass
 
     @abstractmethod
-    def record_series(self, terminal_id: str, params: RecordSeriesParameters):
+    def record_series(self, terminal_id: str, params: RecordSeriesParameters) -> Future:
         """
         :param terminal_id: The FetchTV Box ID
         :param params: The details of the series to record
+        :return: A future resolving to the "RECORDINGS_UPDATE" message
         """
         pass
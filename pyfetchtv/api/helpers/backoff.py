@@ -0,0 +1,38 @@
+import random
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter.
+    Each delay is the exponential delay for the attempt, reduced by a random amount of up to `jitter` of itself.
+    """
+
+    def __init__(self, initial_sec: float = 1, maximum_sec: float = 60, multiplier: float = 2, jitter: float = 0.5):
+        self.__initial_sec = initial_sec
+        self.__maximum_sec = maximum_sec
+        self.__multiplier = multiplier
+        self.__jitter = min(max(jitter, 0), 1)
+        self.__attempt = 0
+
+    @property
+    def attempt(self) -> int:
+        return self.__attempt
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: The attempt number, starting at 0
+        :return: Seconds to wait before the attempt
+        """
+        base = min(self.__maximum_sec, self.__initial_sec * (self.__multiplier ** min(attempt, 64)))
+        return base * (1 - self.__jitter * random.random())
+
+    def next(self) -> float:
+        """
+        :return: Seconds to wait before the next attempt
+        """
+        result = self.delay(self.__attempt)
+        self.__attempt += 1
+        return result
+
+    def reset(self):
+        self.__attempt = 0
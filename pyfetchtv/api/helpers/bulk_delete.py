@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Recording ids sent in each PENDING_DELETE_RECORDINGS_BY_ID message
+BATCH_SIZE = 50
+# Batches awaiting their response at once
+IN_FLIGHT = 4
+# Times an unconfirmed recording is sent again
+RETRIES = 2
+
+
+class BulkDeleteResult:
+    """
+    The outcome of deleting recordings in batches.
+    """
+
+    def __init__(self, requested: List[int], confirmed: Set[int], failed: Dict[int, str], batches: int,
+                 retried: int, seconds: float):
+        self.requested = requested
+        # Recordings the box reported as pending delete
+        self.confirmed = confirmed
+        # The last error of each recording never confirmed
+        self.failed = failed
+        # Messages sent, including retries
+        self.batches = batches
+        # Recordings sent again
+        self.retried = retried
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def to_dict(self) -> dict:
+        return {'requested': len(self.requested), 'confirmed': sorted(self.confirmed), 'failed': self.failed,
+                'batches': self.batches, 'retried': self.retried, 'seconds': self.seconds}
+
+
+class BulkDelete:
+    """
+    Deletes recordings a batch at a time, keeping a bounded number of batches in flight.
+    Each recording is confirmed from the ids in the success response for its batch, recordings missing from it or
+    in a batch which failed or timed out are sent again in later batches.
+    Nothing blocks: the next batches are sent as responses arrive.
+    """
+
+    def __init__(self, send: Callable[[List[int]], Optional[Future]], recording_ids: Iterable[int],
+                 batch_size: int = BATCH_SIZE, in_flight: int = IN_FLIGHT, retries: int = RETRIES,
+                 name: str = 'BulkDelete'):
+        """
+        :param send: Sends a batch, returning a future resolving to the PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS
+            message
+        :param recording_ids: The recordings to delete, duplicates are sent once
+        :param batch_size: The maximum recordings in each message
+        :param in_flight: The maximum batches awaiting a response
+        :param retries: Times a recording is sent again before it fails
+        :param name: Prefix for log messages
+        """
+        if batch_size < 1 or in_flight < 1 or retries < 0:
+            raise ValueError('batch_size and in_flight must be at least 1 and retries at least 0')
+        self.name = name
+        self.__send = send
+        self.__batch_size = batch_size
+        self.__in_flight_max = in_flight
+        self.__retries = retries
+        self.__requested = list(dict.fromkeys(recording_ids))
+        self.__lock = threading.Lock()
+        # (recording ids, attempt) waiting to be sent
+        self.__queue = deque()  # type: Deque[Tuple[List[int], int]]
+        self.__enqueue(self.__requested, 0)
+        self.__in_flight = 0
+        self.__sending = False
+        self.__finished = False
+        self.__confirmed = set()  # type: Set[int]
+        self.__failed = {}  # type: Dict[int, str]
+        self.__batches = 0
+        self.__retried = 0
+        self.__start = 0.0
+        self.__result = Future()  # type: Future
+
+    def start(self) -> Future:
+        """
+        Start sending the batches.
+        :return: A future resolving to the BulkDeleteResult once every recording is confirmed or has failed
+        """
+        self.__start = time.monotonic()
+        self.__pump()
+        return self.__result
+
+    def __enqueue(self, recording_ids: List[int], attempt: int):
+        for i in range(0, len(recording_ids), self.__batch_size):
+            self.__queue.append((recording_ids[i:i + self.__batch_size], attempt))
+
+    def __pump(self):
+        # Callbacks of futures already done run inside send(), they queue their work and leave the sending to the
+        # caller already in this loop rather than recursing
+        with self.__lock:
+            if self.__sending:
+                return
+            self.__sending = True
+        while True:
+            with self.__lock:
+                batches = []
+                while self.__queue and self.__in_flight < self.__in_flight_max:
+                    batches.append(self.__queue.popleft())
+                    self.__in_flight += 1
+                self.__batches += len(batches)
+                if not batches:
+                    self.__sending = False
+                    finished = self.__in_flight == 0 and not self.__finished
+                    self.__finished = self.__finished or finished
+                    break
+            for recording_ids, attempt in batches:
+                self.__send_batch(recording_ids, attempt)
+        if finished:
+            result = BulkDeleteResult(self.__requested, set(self.__confirmed), dict(self.__failed), self.__batches,
+                                      self.__retried, time.monotonic() - self.__start)
+            logger.debug(f'{self.name} --> Deleted {len(result.confirmed)} of {len(result.requested)} recordings '
+                         f'in {result.batches} batches, {len(result.failed)} failed')
+            self.__result.set_result(result)
+
+    def __send_batch(self, recording_ids: List[int], attempt: int):
+        try:
+            future = self.__send(recording_ids)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        if future is None:
+            future = Future()
+            future.set_exception(ConnectionError('Not sent'))
+        future.add_done_callback(lambda f: self.__on_response(recording_ids, attempt, f))
+
+    def __on_response(self, recording_ids: List[int], attempt: int, future: Future):
+        try:
+            confirmed = {int(i) for i in (future.result().get('data') or {}).get('recordingsIds') or []}
+            reason = 'Not confirmed'
+        except Exception as e:
+            confirmed = set()
+            reason = f'{type(e).__name__}: {e}'
+        missing = [i for i in recording_ids if i not in confirmed]
+        with self.__lock:
+            self.__in_flight -= 1
+            self.__confirmed.update(i for i in recording_ids if i in confirmed)
+            if missing and attempt < self.__retries:
+                logger.debug(f'{self.name} --> Retrying {len(missing)} recordings, {reason}')
+                self.__retried += len(missing)
+                self.__enqueue(missing, attempt + 1)
+            else:
+                for i in missing:
+                    self.__failed[i] = reason
+        self.__pump()
+
+
+def delete_in_batches(send: Callable[[List[int]], Optional[Future]], recording_ids: Iterable[int],
+                      batch_size: int = BATCH_SIZE, in_flight: int = IN_FLIGHT, retries: int = RETRIES,
+                      name: str = 'BulkDelete') -> Future:
+    """
+    Delete recordings in batches, see BulkDelete.
+    :return: A future resolving to the BulkDeleteResult
+    """
+    return BulkDelete(send, recording_ids, batch_size, in_flight, retries, name).start()
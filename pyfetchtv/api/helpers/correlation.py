@@ -0,0 +1,194 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pyfetchtv.api.const.message_types import MessageTypeIn, MessageTypeOut
+
+# The inbound messages which complete each outbound command
+EXPECTED_RESPONSES = {
+    MessageTypeOut.PING: {MessageTypeIn.PONG},
+    MessageTypeOut.ARE_YOU_ALIVE: {MessageTypeIn.I_AM_ALIVE},
+    MessageTypeOut.MEDIA_STATE: {MessageTypeIn.MEDIA_STATE},
+    MessageTypeOut.FUTURE_RECORDINGS_LIST: {MessageTypeIn.FUTURE_RECORDINGS_LIST},
+    MessageTypeOut.RECORD_PROGRAM: {MessageTypeIn.RECORDINGS_UPDATE, MessageTypeIn.RECORD_PROGRAM_FAILURE},
+    MessageTypeOut.RECORD_PROGRAM_CANCEL: {MessageTypeIn.RECORDINGS_UPDATE, MessageTypeIn.COMMAND_ERROR},
+    MessageTypeOut.ENABLE_SERIES_TAG: {MessageTypeIn.RECORDINGS_UPDATE, MessageTypeIn.COMMAND_ERROR},
+    MessageTypeOut.DISABLE_SERIES_TAG: {MessageTypeIn.RECORDINGS_UPDATE, MessageTypeIn.COMMAND_ERROR},
+    MessageTypeOut.PENDING_DELETE_RECORDINGS_BY_ID: {MessageTypeIn.PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS,
+                                                     MessageTypeIn.COMMAND_ERROR},
+}
+
+# Responses which mean the command failed
+FAILURE_RESPONSES = {MessageTypeIn.RECORD_PROGRAM_FAILURE, MessageTypeIn.COMMAND_ERROR}
+
+# Commands where one response answers every request waiting for it
+SHARED_RESPONSES = {MessageTypeOut.PING, MessageTypeOut.ARE_YOU_ALIVE, MessageTypeOut.MEDIA_STATE,
+                    MessageTypeOut.FUTURE_RECORDINGS_LIST}
+
+
+def recording_update_matcher(program_id) -> Callable[[dict], bool]:
+    """
+    :return: A matcher accepting RECORDINGS_UPDATE messages which include the provided program
+    """
+    program_id = str(program_id)
+
+    def matches(message: dict) -> bool:
+        updates = (message.get('data') or {}).get('recordingUpdates') or []
+        return any(str((update.get('recording') or {}).get('programId')) == program_id for update in updates)
+    return matches
+
+
+def series_update_matcher(series_link: str) -> Callable[[dict], bool]:
+    """
+    :return: A matcher accepting RECORDINGS_UPDATE messages for the provided series tag
+    """
+    def matches(message: dict) -> bool:
+        updates = (message.get('data') or {}).get('recordingUpdates') or []
+        return any((update.get('seriesTag') or {}).get('id') == series_link for update in updates)
+    return matches
+
+
+def deleted_recordings_matcher(recording_ids: Iterable[int]) -> Callable[[dict], bool]:
+    """
+    :return: A matcher accepting PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS messages for any of the provided recordings,
+        so deletes in flight together each get their own response
+    """
+    recording_ids = {str(i) for i in recording_ids}
+
+    def matches(message: dict) -> bool:
+        return any(str(i) in recording_ids for i in (message.get('data') or {}).get('recordingsIds') or [])
+    return matches
+
+
+class CommandFailedError(Exception):
+    """
+    Raised from a command future when the FetchTV box responds with a failure.
+    """
+
+    def __init__(self, msg_type: MessageTypeOut, response: dict):
+        super().__init__(f"{msg_type.name} failed with {response.get('type')}")
+        self.msg_type = msg_type
+        self.response = response
+
+
+class _PendingCommand:
+
+    def __init__(self, message_id: str, msg_type: MessageTypeOut, deadline: float,
+                 matcher: Optional[Callable[[dict], bool]]):
+        self.message_id = message_id
+        self.msg_type = msg_type
+        self.deadline = deadline
+        self.matcher = matcher
+        self.future = Future()
+
+
+class ResponseCorrelator:
+    """
+    Tracks commands sent to each FetchTV box and completes their futures when the expected response arrives.
+    Responses are matched by messageId when the box echoes it, otherwise by response type in the order sent.
+    """
+
+    def __init__(self, timeout_sec: float = 30):
+        self.__timeout_sec = timeout_sec
+        self.__pending = {}  # type: Dict[str, List[_PendingCommand]]
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def expects_response(msg_type: MessageTypeOut) -> bool:
+        return msg_type in EXPECTED_RESPONSES
+
+    @property
+    def pending_count(self) -> int:
+        with self.__lock:
+            return sum(len(v) for v in self.__pending.values())
+
+    def register(self, terminal_id: str, message_id: str, msg_type: MessageTypeOut,
+                 matcher: Optional[Callable[[dict], bool]] = None, timeout_sec: Optional[float] = None) -> Future:
+        """
+        Register a sent command.
+        :param terminal_id: The FetchTV Box ID the command was sent to
+        :param message_id: The messageId of the command
+        :param msg_type: The command type
+        :param matcher: Optional check that a response of the expected type belongs to this command
+        :param timeout_sec: Seconds to wait for a response, defaults to the correlator timeout
+        :return: A future resolving to the response message
+        """
+        timeout_sec = self.__timeout_sec if timeout_sec is None else timeout_sec
+        pending = _PendingCommand(message_id, msg_type, time.monotonic() + timeout_sec, matcher)
+        with self.__lock:
+            self.__pending.setdefault(terminal_id, []).append(pending)
+        self.expire()
+        return pending.future
+
+    def resolve(self, terminal_id: str, msg_type: str, message: dict) -> int:
+        """
+        Complete the futures waiting for a received message.
+        :param terminal_id: The FetchTV Box ID which sent the message
+        :param msg_type: The received message type
+        :param message: The received message body
+        :return: The number of futures completed
+        """
+        if terminal_id not in self.__pending:
+            return 0
+        try:
+            response_type = MessageTypeIn[msg_type]
+        except KeyError:
+            return 0
+        message_id = (message.get('data') or {}).get('messageId') if isinstance(message, dict) else None
+        with self.__lock:
+            pending = self.__pending.get(terminal_id, [])
+            completed = [p for p in pending if message_id and p.message_id == message_id]
+            if not completed:
+                completed = self.__match(pending, response_type, message)
+            for item in completed:
+                pending.remove(item)
+            if not pending:
+                self.__pending.pop(terminal_id, None)
+        for item in completed:
+            if item.future.done():
+                continue
+            if response_type in FAILURE_RESPONSES:
+                item.future.set_exception(CommandFailedError(item.msg_type, message))
+            else:
+                item.future.set_result(message)
+        return len(completed)
+
+    @staticmethod
+    def __match(pending: List[_PendingCommand], response_type: MessageTypeIn, message: dict) \
+            -> List[_PendingCommand]:
+        completed = []
+        for item in pending:
+            if response_type not in EXPECTED_RESPONSES[item.msg_type]:
+                continue
+            if item.matcher and response_type not in FAILURE_RESPONSES and not item.matcher(message):
+                continue
+            completed.append(item)
+            if item.msg_type not in SHARED_RESPONSES:
+                break
+        return completed
+
+    def expire(self):
+        """
+        Fail any futures which have waited longer than their timeout.
+        """
+        now = time.monotonic()
+        expired = []
+        with self.__lock:
+            for terminal_id in list(self.__pending.keys()):
+                pending = self.__pending[terminal_id]
+                expired.extend([p for p in pending if p.deadline <= now])
+                pending[:] = [p for p in pending if p.deadline > now]
+                if not pending:
+                    del self.__pending[terminal_id]
+        for item in expired:
+            if item.future.done():
+                continue
+            item.future.set_exception(TimeoutError(f'No response to {item.msg_type.name} [{item.message_id}]'))
+
+    def cancel_all(self):
+        with self.__lock:
+            pending = [p for v in self.__pending.values() for p in v]
+            self.__pending = {}
+        for item in pending:
+            item.future.cancel()
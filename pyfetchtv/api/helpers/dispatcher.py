@@ -0,0 +1,163 @@
+import logging
+import threading
+import zlib
+from collections import deque
+from threading import Thread
+from typing import Callable, List, Optional
+
+from pyfetchtv.api.const.overflow_policy import OverflowPolicy
+from pyfetchtv.api.fetchtv_interface import SubscriberMessage
+
+logger = logging.getLogger(__name__)
+
+
+class _DispatchQueue:
+    """
+    A bounded queue feeding a single dispatch worker.
+    """
+
+    def __init__(self, max_size: int, overflow_policy: OverflowPolicy):
+        self.__items = deque()
+        self.__max_size = max_size
+        self.__overflow_policy = overflow_policy
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.dropped = 0
+        self.coalesced = 0
+        self.delivered = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self.__items)
+
+    @staticmethod
+    def __coalesce_key(msg: SubscriberMessage):
+        return msg.terminal_id, msg.group, msg.command
+
+    def put(self, msg: SubscriberMessage) -> bool:
+        with self.__condition:
+            if self.__closed:
+                return False
+            if len(self.__items) >= self.__max_size:
+                if self.__overflow_policy == OverflowPolicy.COALESCE and self.__coalesce(msg):
+                    return True
+                if self.__overflow_policy == OverflowPolicy.BLOCK:
+                    while len(self.__items) >= self.__max_size and not self.__closed:
+                        self.__condition.wait()
+                    if self.__closed:
+                        return False
+                else:
+                    self.__items.popleft()
+                    self.dropped += 1
+            self.__items.append(msg)
+            self.max_depth = max(self.max_depth, len(self.__items))
+            self.__condition.notify_all()
+            return True
+
+    def __coalesce(self, msg: SubscriberMessage) -> bool:
+        key = self.__coalesce_key(msg)
+        for i in range(len(self.__items) - 1, -1, -1):
+            if self.__coalesce_key(self.__items[i]) == key:
+                # The newer message goes to the tail, so subscribers don't see older messages after it
+                del self.__items[i]
+                self.__items.append(msg)
+                self.coalesced += 1
+                return True
+        return False
+
+    def get(self) -> Optional[SubscriberMessage]:
+        with self.__condition:
+            while not self.__items and not self.__closed:
+                self.__condition.wait()
+            if not self.__items:
+                return None
+            msg = self.__items.popleft()
+            self.__condition.notify_all()
+            return msg
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+
+class SubscriberDispatcher:
+    """
+    Delivers subscriber messages using a fixed pool of worker threads.
+    Messages for a terminal are always handled by the same worker, so they are delivered in the order received.
+    """
+
+    def __init__(self,
+                 name: str,
+                 deliver: Callable[[SubscriberMessage], None],
+                 workers: int = 4,
+                 queue_size: int = 1000,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK):
+        self.__name = name
+        self.__deliver = deliver
+        self.__queues = [_DispatchQueue(queue_size, overflow_policy) for _ in range(max(1, workers))]
+        self.__threads = []  # type: List[Thread]
+        self.__lock = threading.Lock()
+        self.__published = 0
+        self.__closed = False
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def metrics(self) -> dict:
+        """
+        :return: Queue depths and message counts for the dispatcher
+        """
+        depths = [len(q) for q in self.__queues]
+        return {
+            'workers': len(self.__queues),
+            'queue_depth': depths,
+            'total_depth': sum(depths),
+            'max_depth': max(q.max_depth for q in self.__queues),
+            'published': self.__published,
+            'delivered': sum(q.delivered for q in self.__queues),
+            'dropped': sum(q.dropped for q in self.__queues),
+            'coalesced': sum(q.coalesced for q in self.__queues)
+        }
+
+    def __start(self):
+        with self.__lock:
+            if self.__threads or self.__closed:
+                return
+            for i, queue in enumerate(self.__queues):
+                thread = Thread(target=self.__run, args=(queue,), name=f'{self.__name}-dispatch-{i}', daemon=True)
+                thread.start()
+                self.__threads.append(thread)
+
+    def __queue_for(self, terminal_id: str) -> _DispatchQueue:
+        index = zlib.crc32((terminal_id or '').encode()) % len(self.__queues)
+        return self.__queues[index]
+
+    def publish(self, msg: SubscriberMessage):
+        if self.__closed:
+            return
+        if not self.__threads:
+            self.__start()
+        if self.__queue_for(msg.terminal_id).put(msg):
+            self.__published += 1
+
+    def __run(self, queue: _DispatchQueue):
+        while True:
+            msg = queue.get()
+            if msg is None:
+                return
+            try:
+                self.__deliver(msg)
+            except Exception:
+                logger.error(f'{self.__name} --> Dispatching message failed', exc_info=True)
+            queue.delivered += 1
+
+    def close(self, timeout: float = 10):
+        self.__closed = True
+        for queue in self.__queues:
+            queue.close()
+        for thread in self.__threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+# An EPG channel id and program block
+_Key = Tuple[str, str]
+
+
+class _ChannelEntry:
+
+    def __init__(self):
+        self.programs = None  # type: Optional[list]
+        self.synopses = {}  # type: Dict[str, str]
+        self.fetched = 0.0
+        self.owners = set()  # type: Set[Hashable]
+        # Set while a request for the channel is in flight, other owners wait for it
+        self.loading = None  # type: Optional[Future]
+
+
+class EpgStore:
+    """
+    EPG programs shared between FetchTV instances.
+    Programs are kept per EPG channel and program block, so accounts and boxes with overlapping channels share one
+    copy and only channels not already held are requested. A channel is removed when no instance uses it any more.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__entries = {}  # type: Dict[_Key, _ChannelEntry]
+        self.__owner_keys = {}  # type: Dict[Hashable, FrozenSet[_Key]]
+        self.__meta = {}  # type: dict
+        self.__channels = None  # type: Optional[dict]
+        self.__channels_lock = threading.Lock()
+        self.__requests = 0
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    @property
+    def requests(self) -> int:
+        """
+        :return: The number of EPG requests made through the store
+        """
+        return self.__requests
+
+    def channels(self, fetch: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """
+        Get the EPG channel and region details, fetched once and shared.
+        :param fetch: Requests the details, returns None on failure
+        """
+        with self.__channels_lock:
+            if self.__channels is None:
+                self.__requests += 1
+                self.__channels = fetch()
+            return self.__channels
+
+    def get(self, owner: Hashable, channel_ids: Iterable[str], block: str,
+            fetch: Callable[[List[str]], Optional[dict]], max_age_sec: float) -> Optional[dict]:
+        """
+        Get the EPG for a set of channels, requesting only the channels with no copy younger than max_age_sec.
+        :param owner: Identifies the caller, channels it no longer asks for are released
+        :param channel_ids: The EPG channel ids
+        :param block: The program block requested
+        :param fetch: Requests the EPG for a list of channel ids, returns None on failure
+        :param max_age_sec: The maximum age of a shared copy
+        :return: The EPG for the channels held, including old copies if the request failed, or None if none are held
+        """
+        keys = frozenset((channel_id, block) for channel_id in channel_ids)
+        now = time.monotonic()
+        to_fetch = []  # type: List[_Key]
+        waiting = []  # type: List[Future]
+        future = Future()
+        with self.__lock:
+            previous = self.__owner_keys.get(owner, frozenset())
+            self.__owner_keys[owner] = keys
+            self.__release_keys(owner, previous - keys)
+            for key in keys:
+                entry = self.__entries.get(key)
+                if entry is None:
+                    entry = self.__entries[key] = _ChannelEntry()
+                entry.owners.add(owner)
+                if entry.loading is not None:
+                    waiting.append(entry.loading)
+                elif entry.programs is None or now - entry.fetched >= max_age_sec:
+                    entry.loading = future
+                    to_fetch.append(key)
+            if to_fetch:
+                self.__requests += 1
+        if to_fetch:
+            response = None
+            try:
+                response = fetch(sorted(channel_id for channel_id, _ in to_fetch))
+            finally:
+                self.__store(to_fetch, response)
+                future.set_result(None)
+        for loading in waiting:
+            loading.result()
+        return self.__assemble(keys)
+
+    def __store(self, keys: List[_Key], response: Optional[dict]):
+        with self.__lock:
+            for key in keys:
+                entry = self.__entries.get(key)
+                if entry is not None:
+                    entry.loading = None
+                    if not entry.owners:
+                        # Released while loading
+                        del self.__entries[key]
+            if response is None:
+                return
+            self.__meta = response.get('__meta__', self.__meta)
+            pos_synopsis = self.__meta['program_fields'].index('synopsis_id')
+            synopses = response['synopses']
+            now = time.monotonic()
+            for key in keys:
+                entry = self.__entries.get(key)
+                if entry is None:
+                    continue
+                # A channel missing from the response has no programs, it isn't requested again until stale
+                programs = response['channels'].get(key[0], [])
+                entry.programs = programs
+                entry.synopses = {str(p[pos_synopsis]): synopses[str(p[pos_synopsis])] for p in programs
+                                  if str(p[pos_synopsis]) in synopses}
+                entry.fetched = now
+
+    def __assemble(self, keys: FrozenSet[_Key]) -> Optional[dict]:
+        channels = {}
+        synopses = {}
+        with self.__lock:
+            for key in keys:
+                entry = self.__entries.get(key)
+                if entry is None or entry.programs is None:
+                    continue
+                channels[key[0]] = entry.programs
+                synopses.update(entry.synopses)
+            meta = self.__meta
+        if not channels:
+            return None
+        return {'channels': channels, 'synopses': synopses, '__meta__': meta}
+
+    def release(self, owner: Hashable):
+        """
+        Stop sharing the owner's channels, called when a FetchTV instance closes.
+        """
+        with self.__lock:
+            keys = self.__owner_keys.pop(owner, None)
+            if keys:
+                self.__release_keys(owner, keys)
+
+    def __release_keys(self, owner: Hashable, keys: Iterable[_Key]):
+        for key in keys:
+            entry = self.__entries.get(key)
+            if entry is None:
+                continue
+            entry.owners.discard(owner)
+            if not entry.owners and entry.loading is None:
+                del self.__entries[key]
@@ -0,0 +1,145 @@
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from pyfetchtv.api.helpers.backoff import Backoff
+
+if TYPE_CHECKING:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying, the service or a proxy in front of it is unavailable
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+
+class HttpTransport:
+    """
+    HTTP requests to the FetchTV APIs with timeouts, retries and a sized connection pool.
+    Connection errors, timeouts and 5xx responses are retried with exponential backoff, all the FetchTV
+    endpoints used are safe to repeat. A shared adapter shares its connection pool, cookies stay with the transport.
+    """
+
+    def __init__(self, connect_timeout_sec: float = 5, read_timeout_sec: float = 30, retries: int = 3,
+                 backoff: Backoff = None, pool_connections: int = 4, pool_maxsize: int = 10,
+                 adapter: 'HTTPAdapter' = None):
+        """
+        :param connect_timeout_sec: Seconds to wait for a connection
+        :param read_timeout_sec: Seconds to wait between bytes of the response
+        :param retries: Attempts after the first one fails
+        :param backoff: Delays between attempts, defaults to 0.5 seconds doubling up to 10 seconds
+        :param pool_connections: Hosts to keep pools for
+        :param pool_maxsize: Connections kept open to each host, the limit on parallel requests reusing connections
+        :param adapter: A shared adapter, pool sizes are ignored when provided
+        """
+        self.__timeout = (connect_timeout_sec, read_timeout_sec)
+        self.__retries = retries
+        self.__backoff = backoff if backoff else Backoff(initial_sec=0.5, maximum_sec=10)
+        self.__shared_adapter = adapter is not None
+        self.__adapter = adapter
+        self.__pool_connections = pool_connections
+        self.__pool_maxsize = pool_maxsize
+        # Created on the first request, requests is only imported by processes which use HTTP
+        self.__session = None  # type: Optional[requests.Session]
+        self.__session_lock = threading.Lock()
+        self.__closed = threading.Event()
+        self.__lock = threading.Lock()
+        self.__requests = 0
+        self.__retried = 0
+        self.__failures = 0
+
+    def __get_session(self) -> 'requests.Session':
+        with self.__session_lock:
+            if self.__session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                if self.__adapter is None:
+                    self.__adapter = HTTPAdapter(pool_connections=self.__pool_connections,
+                                                 pool_maxsize=self.__pool_maxsize)
+                session = requests.Session()
+                session.mount('https://', self.__adapter)
+                session.mount('http://', self.__adapter)
+                self.__session = session
+            return self.__session
+
+    @property
+    def cookies(self):
+        return self.__get_session().cookies
+
+    @property
+    def metrics(self) -> dict:
+        """
+        :return: Counts of requests, retries and failures, and connection reuse across the pool
+        """
+        opened = 0
+        pool_requests = 0
+        pools = self.__adapter.poolmanager.pools if self.__adapter else {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool:
+                opened += pool.num_connections
+                pool_requests += pool.num_requests
+        with self.__lock:
+            return {
+                'requests': self.__requests,
+                'retries': self.__retried,
+                'failures': self.__failures,
+                'connections_opened': opened,
+                'connections_reused': max(0, pool_requests - opened),
+                'reuse_ratio': (pool_requests - opened) / pool_requests if pool_requests else 0.0
+            }
+
+    def request(self, method: str, url: str, params: dict = None, data: dict = None,
+                headers: dict = None, stream: bool = False) -> 'requests.Response':
+        """
+        Send a request, retrying failures.
+        :param stream: Return once the headers are read, the body is read from the response and its connection
+            returned to the pool when the response is closed
+        :return: The response, a 5xx response once the retries are used up
+        :raises requests.RequestException: When the last attempt fails to connect or times out
+        """
+        import requests
+        session = self.__get_session()
+        attempt = 0
+        while True:
+            with self.__lock:
+                self.__requests += 1
+            try:
+                response = session.request(method, url, params=params, data=data, headers=headers,
+                                           timeout=self.__timeout, stream=stream)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.__retries:
+                    return response
+                reason = f'{response.status_code}'
+                response.close()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.__retries or self.__closed.is_set():
+                    with self.__lock:
+                        self.__failures += 1
+                    raise
+                reason = type(e).__name__
+            delay = self.__backoff.delay(attempt)
+            attempt += 1
+            with self.__lock:
+                self.__retried += 1
+            logger.warning(f'HttpTransport --> {method} {url} failed ({reason}), retry {attempt} in {delay:.1f}s')
+            if self.__closed.wait(delay):
+                raise requests.ConnectionError('Transport closed')
+
+    def get(self, url: str, params: dict = None, headers: dict = None, stream: bool = False) -> 'requests.Response':
+        return self.request('GET', url, params, headers=headers, stream=stream)
+
+    def post(self, url: str, params: dict = None, data: dict = None,
+             headers: dict = None) -> 'requests.Response':
+        return self.request('POST', url, params, data, headers)
+
+    def close(self):
+        self.__closed.set()
+        with self.__session_lock:
+            session = self.__session
+        if session is None:
+            return
+        if self.__shared_adapter:
+            # Leave the shared connection pool open for the other users
+            session.adapters.clear()
+        session.close()
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Iterator, List, Optional
+
+from pyfetchtv.api.helpers import json_codec
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = re.compile(r'^journal-(\d{13})-(\d{6})\.jsonl$')
+
+
+class JournalEntry:
+    """
+    An entry read back from the message journal.
+    """
+    RAW = 'raw'
+    SUBSCRIBER = 'sub'
+
+    def __init__(self, time_msec: int, kind: str, data):
+        self.time = time_msec
+        self.kind = kind
+        self.data = data
+
+
+class MessageJournal:
+    """
+    Append-only on-disk journal of messages, written as compact JSON lines.
+    A new segment file is started when the current one exceeds `segment_bytes`, and the oldest segments are
+    removed once there are more than `max_segments`.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024, max_segments: Optional[int] = None):
+        self.__directory = directory
+        self.__segment_bytes = segment_bytes
+        self.__max_segments = max_segments
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__size = 0
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self.__sequence = int(SEGMENT_PATTERN.match(os.path.basename(segments[-1])).group(2)) if segments else 0
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    def segments(self) -> List[str]:
+        """
+        :return: The segment file paths, oldest first
+        """
+        names = sorted(n for n in os.listdir(self.__directory) if SEGMENT_PATTERN.match(n))
+        return [os.path.join(self.__directory, n) for n in names]
+
+    def append_raw(self, message: str, time_msec: int = None):
+        """
+        Journal a message exactly as received from the websocket.
+        """
+        if '\n' in message:
+            message = json.dumps(json.loads(message), separators=(',', ':'))
+        self.__write(time_msec, JournalEntry.RAW, message)
+
+    def append(self, kind: str, data, time_msec: int = None):
+        self.__write(time_msec, kind, json_codec.dumps(data))
+
+    def __write(self, time_msec: Optional[int], kind: str, encoded: str):
+        time_msec = int(time.time() * 1000) if time_msec is None else time_msec
+        line = f'{{"t":{time_msec},"k":"{kind}","d":{encoded}}}\n'.encode()
+        with self.__lock:
+            if not self.__file or self.__size + len(line) > self.__segment_bytes:
+                self.__rotate(time_msec)
+            self.__file.write(line)
+            self.__file.flush()
+            self.__size += len(line)
+
+    def __rotate(self, time_msec: int):
+        if self.__file:
+            self.__file.close()
+        self.__sequence += 1
+        path = os.path.join(self.__directory, f'journal-{time_msec:013d}-{self.__sequence:06d}.jsonl')
+        self.__file = open(path, 'ab')
+        self.__size = 0
+        if self.__max_segments:
+            for old in self.segments()[:-self.__max_segments]:
+                os.remove(old)
+
+    def replay(self, since_msec: int = 0, kinds: Optional[List[str]] = None) -> Iterator[JournalEntry]:
+        """
+        Read journal entries in the order written.
+        :param since_msec: Only return entries at or after this time, in milliseconds since the epoch
+        :param kinds: Only return entries of these kinds, e.g. JournalEntry.RAW
+        """
+        with self.__lock:
+            if self.__file:
+                self.__file.flush()
+        segments = self.segments()
+        starts = [int(SEGMENT_PATTERN.match(os.path.basename(p)).group(1)) for p in segments]
+        for i, path in enumerate(segments):
+            # Skip segments which end before the requested time
+            if i + 1 < len(starts) and starts[i + 1] < since_msec:
+                continue
+            with open(path, 'rb') as file:
+                for line in file:
+                    try:
+                        entry = json_codec.loads(line)
+                    except ValueError:
+                        logger.warning(f'Skipping corrupt journal entry in {path}')
+                        continue
+                    if entry['t'] < since_msec or (kinds and entry['k'] not in kinds):
+                        continue
+                    yield JournalEntry(entry['t'], entry['k'], entry['d'])
+
+    def close(self):
+        with self.__lock:
+            if self.__file:
+                self.__file.close()
+                self.__file = None
@@ -0,0 +1,34 @@
+"""
+JSON decoding using the fastest available library, orjson or ujson when installed, otherwise the standard json.
+"""
+import json
+
+try:
+    import orjson
+
+    def loads(value):
+        return orjson.loads(value)
+
+    def dumps(value) -> str:
+        return orjson.dumps(value).decode()
+
+    DECODER = 'orjson'
+except ImportError:
+    try:
+        import ujson
+
+        def loads(value):
+            return ujson.loads(value)
+
+        def dumps(value) -> str:
+            return ujson.dumps(value, ensure_ascii=False, escape_forward_slashes=False)
+
+        DECODER = 'ujson'
+    except ImportError:
+        def loads(value):
+            return json.loads(value)
+
+        def dumps(value) -> str:
+            return json.dumps(value, separators=(',', ':'))
+
+        DECODER = 'json'
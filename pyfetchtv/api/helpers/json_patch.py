@@ -0,0 +1,79 @@
+import copy
+from typing import List, Sequence
+
+
+def pointer(path: Sequence) -> str:
+    """
+    :param path: Keys from the document root
+    :return: The JSON pointer for the path, e.g. ('recordings', 12) is '/recordings/12'
+    """
+    return ''.join('/' + str(key).replace('~', '~0').replace('/', '~1') for key in path)
+
+
+def _split(path: str) -> List[str]:
+    if not path:
+        return []
+    return [key.replace('~1', '/').replace('~0', '~') for key in path[1:].split('/')]
+
+
+def diff(old, new, path: str = '') -> List[dict]:
+    """
+    Build a JSON patch (RFC 6902) turning one JSON value into another.
+    Objects are compared key by key, so changing one entry of a large object gives a small patch, other values
+    including lists are replaced when they differ.
+    :param old: The previous value
+    :param new: The current value
+    :param path: The JSON pointer of the values, the patch paths are prefixed with it
+    :return: add, remove and replace operations, empty if the values are equal
+    """
+    patch = []
+    _diff(old, new, path, (), patch)
+    return patch
+
+
+def _diff(old, new, path: str, keys: tuple, patch: List[dict]):
+    # Pointers are only built for the operations added, not for every key compared
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                patch.append({'op': 'remove', 'path': path + pointer(keys + (key,))})
+        for key, value in new.items():
+            if key not in old:
+                patch.append({'op': 'add', 'path': path + pointer(keys + (key,)), 'value': value})
+            else:
+                _diff(old[key], value, path, keys + (key,), patch)
+        return
+    if old == new and type(old) == type(new):
+        return
+    patch.append({'op': 'replace', 'path': path + pointer(keys), 'value': new})
+
+
+def apply(document, patch: List[dict]):
+    """
+    Apply a JSON patch from diff(), the document is not changed.
+    :return: The patched copy of the document
+    """
+    result = copy.deepcopy(document)
+    for operation in patch:
+        keys = _split(operation['path'])
+        if not keys:
+            result = copy.deepcopy(operation.get('value'))
+            continue
+        parent = result
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        key = keys[-1]
+        if isinstance(parent, list):
+            key = len(parent) if key == '-' else int(key)
+        if operation['op'] == 'remove':
+            del parent[key]
+        elif operation['op'] == 'add' and isinstance(parent, list):
+            parent.insert(key, copy.deepcopy(operation['value']))
+        elif operation['op'] in ('add', 'replace'):
+            parent[key] = copy.deepcopy(operation['value'])
+        else:
+            raise ValueError(f"Unsupported patch operation: {operation['op']}")
+    return result
+
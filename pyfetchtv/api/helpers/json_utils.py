@@ -1,6 +1,10 @@
-from typing import Any
+import re
+from functools import lru_cache
+from typing import Any, Optional, Tuple
 
-from jsonpath_ng import parse
+# A path of plain keys, e.g. $.sysInfo.terminalId, is read directly without loading jsonpath_ng
+_SIMPLE_PATH = re.compile(r'^\$(\.[A-Za-z_][A-Za-z0-9_]*)+$')
+_MISSING = object()
 
 
 def json_get_value(json: dict, name: str, default=None) -> Any:
@@ -11,8 +15,27 @@ def json_has_value(json: dict, name: str) -> bool:
     return name in json.keys()
 
 
+@lru_cache(maxsize=256)
+def _parse(path: str):
+    from jsonpath_ng import parse
+    return parse(path)
+
+
+@lru_cache(maxsize=256)
+def _simple_path(path: str) -> Optional[Tuple[str, ...]]:
+    return tuple(path.split('.')[1:]) if _SIMPLE_PATH.match(path) else None
+
+
 def json_get_path_value(json: dict, path: str, default=None) -> Any:
-    json_exp = parse(path)
+    keys = _simple_path(path)
+    if keys is not None:
+        value = json
+        for key in keys:
+            value = value.get(key, _MISSING) if isinstance(value, dict) else _MISSING
+            if value is _MISSING:
+                return default
+        return value
+    json_exp = _parse(path)
     result = json_exp.find(json)
     for match in result:
         return match.value
@@ -0,0 +1,280 @@
+import bisect
+import threading
+from threading import Thread
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconds, from a fast websocket round trip to a slow programslist fetch
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes, from a small response to a full EPG
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 5 * 1024 * 1024, 20 * 1024 * 1024)
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return []
+
+
+class Counter(_Metric):
+    """
+    A count which only increases, e.g. messages received.
+    """
+    type = 'counter'
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, description, label_names)
+        self.__values = {}  # type: Dict[tuple, float]
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self.__values[label_values] = self.__values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self.__values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + '_total', dict(zip(self.label_names, k)), v) for k, v in self.__values.items()]
+
+
+class Gauge(_Metric):
+    """
+    A value which goes up and down, either set directly or read from a function when collected.
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, description, label_names)
+        self.__values = {}  # type: Dict[tuple, float]
+        self.__functions = {}  # type: Dict[tuple, Callable[[], float]]
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self.__values[label_values] = value
+
+    def set_function(self, function: Callable[[], float], *label_values):
+        with self._lock:
+            self.__functions[label_values] = function
+
+    def remove(self, *label_values):
+        """
+        Stop reporting the value for these labels, e.g. when the instance it was read from is closed.
+        """
+        with self._lock:
+            self.__values.pop(label_values, None)
+            self.__functions.pop(label_values, None)
+
+    def value(self, *label_values) -> float:
+        function = self.__functions.get(label_values)
+        return function() if function else self.__values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self.__values)
+            functions = dict(self.__functions)
+        values.update({k: f() for k, f in functions.items()})
+        return [(self.name, dict(zip(self.label_names, k)), v) for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into cumulative buckets, e.g. request latency.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.__values = {}  # type: Dict[tuple, list]
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            # Per bucket counts, then count of observations above every bucket, then sum
+            counts = self.__values.get(label_values)
+            if counts is None:
+                counts = self.__values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def count(self, *label_values) -> int:
+        counts = self.__values.get(label_values)
+        return sum(counts[:-1]) if counts else 0
+
+    def sum(self, *label_values) -> float:
+        counts = self.__values.get(label_values)
+        return counts[-1] if counts else 0.0
+
+    def samples(self):
+        result = []
+        with self._lock:
+            values = {k: list(v) for k, v in self.__values.items()}
+        for key, counts in values.items():
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += count
+                result.append((self.name + '_bucket', dict(labels, le=_format_value(bound)), cumulative))
+            result.append((self.name + '_count', labels, cumulative))
+            result.append((self.name + '_sum', labels, counts[-1]))
+        return result
+
+
+class _DisabledMetric:
+    """
+    Stands in for every metric type when metrics are disabled, each call does nothing.
+    """
+
+    def inc(self, *label_values, amount: float = 1):
+        pass
+
+    def set(self, value: float, *label_values):
+        pass
+
+    def set_function(self, function: Callable[[], float], *label_values):
+        pass
+
+    def remove(self, *label_values):
+        pass
+
+    def observe(self, value: float, *label_values):
+        pass
+
+
+_DISABLED_METRIC = _DisabledMetric()
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms for the library, read with collect() or exported in the Prometheus text format.
+    A disabled registry hands out metrics which do nothing, so instrumented code costs a method call.
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = 'fetchtv_'):
+        self.__enabled = enabled
+        self.__prefix = prefix
+        self.__lock = threading.Lock()
+        self.__metrics = {}  # type: Dict[str, _Metric]
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    def __get(self, cls, name: str, description: str, label_names: Tuple[str, ...], **kwargs):
+        if not self.__enabled:
+            return _DISABLED_METRIC
+        name = self.__prefix + name
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = self.__metrics[name] = cls(name, description, label_names, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'Metric {name} is already registered as a {metric.type}')
+            return metric
+
+    def counter(self, name: str, description: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self.__get(Counter, name, description, label_names)
+
+    def gauge(self, name: str, description: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self.__get(Gauge, name, description, label_names)
+
+    def histogram(self, name: str, description: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.__get(Histogram, name, description, label_names, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """
+        :param name: The metric name without the prefix
+        """
+        return self.__metrics.get(self.__prefix + name)
+
+    def collect(self) -> Dict[str, List[Tuple[str, Dict[str, str], float]]]:
+        """
+        :return: Samples by metric name, each sample is (sample name, labels, value)
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        return {m.name: m.samples() for m in metrics}
+
+    def to_prometheus(self) -> str:
+        """
+        :return: The metrics in the Prometheus text exposition format
+        """
+        with self.__lock:
+            metrics = sorted(self.__metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for sample, labels, value in metric.samples():
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{sample}{'{' + label_text + '}' if label_text else ''} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusExporter:
+    """
+    Serves a registry in the Prometheus text format at /metrics.
+    The metrics include terminal ids and account activity, so only local connections are accepted by default. Pass
+    host='0.0.0.0', or a specific interface address, to let a Prometheus server on another machine scrape them.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9464):
+        # Imported here, processes which only record metrics don't load the HTTP server
+        from http.server import ThreadingHTTPServer
+        self.__registry = registry
+        self.__server = ThreadingHTTPServer((host, port), self.__handler_class())
+        self.__server.daemon_threads = True
+        self.__thread = Thread(target=self.__server.serve_forever, name='PrometheusExporter', daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.__server.server_address[1]
+
+    def start(self):
+        self.__thread.start()
+
+    def close(self):
+        if self.__thread.is_alive():
+            self.__server.shutdown()
+        self.__server.server_close()
+
+    def __handler_class(self):
+        from http.server import BaseHTTPRequestHandler
+        registry = self.__registry
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
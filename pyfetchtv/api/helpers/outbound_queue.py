@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import deque
+from threading import Thread
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pyfetchtv.api.const.message_types import MessageTypeOut
+from pyfetchtv.api.const.queue_result import QueueResult
+
+logger = logging.getLogger(__name__)
+
+# Commands which return the same result however many times they are sent
+IDEMPOTENT_MESSAGES = frozenset([
+    MessageTypeOut.MEDIA_STATE,
+    MessageTypeOut.FUTURE_RECORDINGS_LIST,
+    MessageTypeOut.PING
+])
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter, allows bursts of up to `burst` messages then `rate` messages per second.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.__rate = rate
+        self.__burst = max(1, burst)
+        self.__tokens = float(self.__burst)
+        self.__updated = time.monotonic()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+
+    def wait_time(self) -> float:
+        """
+        :return: Seconds until a token is available, 0 if one is available now
+        """
+        self.__refill()
+        if self.__tokens >= 1:
+            return 0
+        return (1 - self.__tokens) / self.__rate
+
+    def take(self) -> bool:
+        self.__refill()
+        if self.__tokens < 1:
+            return False
+        self.__tokens -= 1
+        return True
+
+
+class _TerminalQueue:
+
+    def __init__(self, rate: float, burst: int):
+        self.items = deque()
+        self.bucket = TokenBucket(rate, burst)
+
+
+class OutboundQueue:
+    """
+    Queues outbound commands per terminal, rate limiting each terminal with a token bucket.
+    Idempotent commands already waiting in a terminal's queue are coalesced rather than sent twice.
+    A single sender thread flushes up to `batch_size` ready commands each time it wakes.
+    """
+
+    def __init__(self,
+                 name: str,
+                 send: Callable[[dict], None],
+                 rate_per_sec: float = 4.0,
+                 burst: int = 8,
+                 batch_size: int = 10,
+                 coalesce_types: Iterable[MessageTypeOut] = IDEMPOTENT_MESSAGES):
+        self.__name = name
+        self.__send = send
+        self.__rate = rate_per_sec
+        self.__burst = burst
+        self.__batch_size = max(1, batch_size)
+        self.__coalesce_types = frozenset(coalesce_types)
+        self.__queues = {}  # type: Dict[str, _TerminalQueue]
+        self.__condition = threading.Condition()
+        self.__thread = None  # type: Optional[Thread]
+        self.__closed = False
+        self.__queued = 0
+        self.__coalesced = 0
+        self.__sent = 0
+        self.__batches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.__rate)
+
+    @property
+    def metrics(self) -> dict:
+        """
+        :return: Counts of queued, coalesced and sent commands, and the current depth per terminal
+        """
+        with self.__condition:
+            return {
+                'queued': self.__queued,
+                'coalesced': self.__coalesced,
+                'sent': self.__sent,
+                'batches': self.__batches,
+                'depth': {k: len(v.items) for k, v in self.__queues.items()}
+            }
+
+    def put(self, terminal_id: str, msg_type: MessageTypeOut, msg: dict) -> QueueResult:
+        """
+        Queue a command for sending.
+        :return: COALESCED if the command was coalesced with one already queued, CLOSED if it was discarded
+        """
+        if not self.enabled:
+            self.__send(msg)
+            with self.__condition:
+                self.__queued += 1
+                self.__sent += 1
+            return QueueResult.QUEUED
+        with self.__condition:
+            if self.__closed:
+                return QueueResult.CLOSED
+            queue = self.__queues.get(terminal_id)
+            if not queue:
+                queue = self.__queues[terminal_id] = _TerminalQueue(self.__rate, self.__burst)
+            self.__queued += 1
+            if msg_type in self.__coalesce_types and any(t == msg_type for t, _ in queue.items):
+                self.__coalesced += 1
+                return QueueResult.COALESCED
+            queue.items.append((msg_type, msg))
+            if not self.__thread:
+                self.__thread = Thread(target=self.__run, name=f'{self.__name}-outbound', daemon=True)
+                self.__thread.start()
+            self.__condition.notify_all()
+            return QueueResult.QUEUED
+
+    def __take_batch(self) -> Tuple[List[dict], Optional[float]]:
+        batch = []
+        wait = None
+        progress = True
+        # Round robin across terminals so one busy box cannot starve the others
+        while progress and len(batch) < self.__batch_size:
+            progress = False
+            for queue in self.__queues.values():
+                if not queue.items:
+                    continue
+                if not queue.bucket.take():
+                    next_token = queue.bucket.wait_time()
+                    wait = next_token if wait is None else min(wait, next_token)
+                    continue
+                batch.append(queue.items.popleft()[1])
+                progress = True
+                if len(batch) >= self.__batch_size:
+                    break
+        return batch, wait
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                batch, wait = self.__take_batch()
+                while not batch and not self.__closed:
+                    self.__condition.wait(wait)
+                    batch, wait = self.__take_batch()
+                if self.__closed:
+                    return
+                self.__batches += 1
+            for msg in batch:
+                try:
+                    self.__send(msg)
+                except Exception:
+                    logger.error(f'{self.__name} --> Sending queued message failed', exc_info=True)
+            with self.__condition:
+                self.__sent += len(batch)
+
+    def close(self, timeout: float = 5):
+        with self.__condition:
+            self.__closed = True
+            discarded = sum(len(v.items) for v in self.__queues.values())
+            self.__queues = {}
+            self.__condition.notify_all()
+        if discarded:
+            logger.info(f'{self.__name} --> Discarded {discarded} unsent messages.')
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(timeout)
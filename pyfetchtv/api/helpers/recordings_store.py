@@ -0,0 +1,198 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pyfetchtv.api.helpers.snapshot import REMOVED
+
+_RECORDING_COLUMNS = ['terminal_id', 'id', 'disk_id', 'name', 'channel_id', 'program_id', 'description',
+                      'episode_title', 'season', 'episode', 'program_start', 'program_end', 'record_start',
+                      'record_end', 'created', 'series_id', 'episode_id', 'current_position', 'view_count',
+                      'last_viewed', 'size', 'pending_delete', 'dlna_url']
+_SERIES_COLUMNS = ['terminal_id', 'id', 'name', 'channel_id', 'priority', 'lead_time', 'lag_time', 'latest_season',
+                   'latest_episode', 'updated']
+
+# Snapshot sections stored, by table
+_TABLES = {'recordings': ('recordings', _RECORDING_COLUMNS),
+           'future': ('future_recordings', _RECORDING_COLUMNS),
+           'series': ('series', _SERIES_COLUMNS)}
+
+# Columns recordings can be ordered by
+ORDER_COLUMNS = ('created', 'size', 'last_viewed', 'record_start', 'program_start', 'name', 'view_count')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS recordings (
+    terminal_id TEXT NOT NULL, id INTEGER NOT NULL, disk_id INTEGER, name TEXT, channel_id TEXT, program_id INTEGER,
+    description TEXT, episode_title TEXT, season TEXT, episode TEXT, program_start INTEGER, program_end INTEGER,
+    record_start INTEGER, record_end INTEGER, created INTEGER, series_id TEXT, episode_id INTEGER,
+    current_position INTEGER, view_count INTEGER, last_viewed INTEGER, size INTEGER, pending_delete INTEGER,
+    dlna_url TEXT, PRIMARY KEY (terminal_id, id));
+CREATE INDEX IF NOT EXISTS recordings_series ON recordings (series_id);
+CREATE INDEX IF NOT EXISTS recordings_size ON recordings (size);
+CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created);
+CREATE INDEX IF NOT EXISTS recordings_last_viewed ON recordings (last_viewed);
+CREATE TABLE IF NOT EXISTS future_recordings (
+    terminal_id TEXT NOT NULL, id INTEGER NOT NULL, disk_id INTEGER, name TEXT, channel_id TEXT, program_id INTEGER,
+    description TEXT, episode_title TEXT, season TEXT, episode TEXT, program_start INTEGER, program_end INTEGER,
+    record_start INTEGER, record_end INTEGER, created INTEGER, series_id TEXT, episode_id INTEGER,
+    current_position INTEGER, view_count INTEGER, last_viewed INTEGER, size INTEGER, pending_delete INTEGER,
+    dlna_url TEXT, PRIMARY KEY (terminal_id, id));
+CREATE INDEX IF NOT EXISTS future_recordings_record_start ON future_recordings (record_start);
+CREATE TABLE IF NOT EXISTS series (
+    terminal_id TEXT NOT NULL, id TEXT NOT NULL, name TEXT, channel_id TEXT, priority INTEGER, lead_time INTEGER,
+    lag_time INTEGER, latest_season TEXT, latest_episode TEXT, updated INTEGER, PRIMARY KEY (terminal_id, id));
+'''
+
+
+class RecordingsStore:
+    """
+    Recordings, future recordings and series tags of any number of boxes in SQLite, kept in sync by the boxes as
+    messages arrive. Queries run in SQLite and return plain rows, the library is not loaded into Python objects.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        :param path: The database file, kept between runs, or ':memory:'
+        """
+        self.__lock = threading.Lock()
+        # Written from the websocket thread, queried from any
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def apply(self, terminal_id: str, values: Dict[Tuple, object]):
+        """
+        Store a box's changes, in the form kept by its snapshot.
+        :param terminal_id: The FetchTV Box ID
+        :param values: Values by snapshot path: a whole 'recordings', 'future' or 'series' section replaces the
+            box's rows, a path to one item replaces or, with REMOVED, deletes its row. Other sections are ignored
+        """
+        statements = []  # type: List[Tuple[str, list]]
+        for path, value in values.items():
+            table = _TABLES.get(path[0])
+            if table is None:
+                continue
+            name, columns = table
+            insert = f"INSERT OR REPLACE INTO {name} ({', '.join(columns)}) " \
+                     f"VALUES ({', '.join('?' * len(columns))})"
+            if len(path) == 1:
+                statements.append((f'DELETE FROM {name} WHERE terminal_id = ?', [terminal_id]))
+                statements.extend((insert, self.__row(terminal_id, item, columns)) for item in value.values())
+            elif value is REMOVED:
+                item_id = int(path[1]) if name != 'series' else path[1]
+                statements.append((f'DELETE FROM {name} WHERE terminal_id = ? AND id = ?', [terminal_id, item_id]))
+            else:
+                statements.append((insert, self.__row(terminal_id, value, columns)))
+        if not statements:
+            return
+        with self.__lock, self.__connection:
+            for sql, params in statements:
+                self.__connection.execute(sql, params)
+
+    @staticmethod
+    def __row(terminal_id: str, item: dict, columns: List[str]) -> list:
+        return [terminal_id if column == 'terminal_id' else item.get(column) for column in columns]
+
+    def remove_box(self, terminal_id: str):
+        """
+        Remove everything stored for a box.
+        """
+        with self.__lock, self.__connection:
+            for name, _ in _TABLES.values():
+                self.__connection.execute(f'DELETE FROM {name} WHERE terminal_id = ?', [terminal_id])
+
+    def recordings(self, terminal_ids: Optional[Iterable[str]] = None, series_id: Optional[str] = None,
+                   watched: Optional[bool] = None, pending_delete: Optional[bool] = None,
+                   order_by: str = 'created', descending: bool = False, limit: Optional[int] = None,
+                   offset: int = 0) -> List[dict]:
+        """
+        Query the recordings, filters left as None match everything.
+        :param terminal_ids: The boxes to include
+        :param series_id: Only recordings of this series, '' for recordings not in a series
+        :param watched: Only recordings viewed at least once, or never viewed
+        :param pending_delete: Only recordings pending delete, or not pending delete
+        :param order_by: One of ORDER_COLUMNS
+        :param descending: Order largest, newest or most recent first
+        :param limit: The maximum number of rows
+        :param offset: Rows to skip, for paging
+        :return: The recordings as dicts with the same keys as Recording.to_dict()
+        """
+        return self.__query('recordings', terminal_ids, series_id, watched, pending_delete, order_by, descending,
+                            limit, offset)
+
+    def future(self, terminal_ids: Optional[Iterable[str]] = None, series_id: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """
+        Query the future recordings, soonest first.
+        """
+        return self.__query('future_recordings', terminal_ids, series_id, None, None, 'record_start', False, limit,
+                            offset)
+
+    def series(self, terminal_ids: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        :return: The series tags, ordered by priority
+        """
+        where, params = self.__where(terminal_ids)
+        return self.__select(f'SELECT * FROM series{where} ORDER BY priority, terminal_id, id', params)
+
+    def space_by_series(self, terminal_ids: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Total the recordings of each series, largest first.
+        :return: Dicts with 'terminal_id', 'series_id', 'name' of the series tag if still set, 'count', 'size' and
+            'unwatched' counts. Recordings not in a series are totalled with series_id ''
+        """
+        where, params = self.__where(terminal_ids, 'r.')
+        return self.__select(
+            'SELECT r.terminal_id, r.series_id, s.name, COUNT(*) AS count, SUM(r.size) AS size, '
+            'SUM(r.view_count = 0) AS unwatched FROM recordings r '
+            'LEFT JOIN series s ON s.terminal_id = r.terminal_id AND s.id = r.series_id'
+            f'{where} GROUP BY r.terminal_id, r.series_id ORDER BY size DESC', params)
+
+    def __query(self, table: str, terminal_ids, series_id, watched, pending_delete, order_by: str,
+                descending: bool, limit, offset: int) -> List[dict]:
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f'Recordings can not be ordered by {order_by}, use one of {ORDER_COLUMNS}')
+        where, params = self.__where(terminal_ids)
+        conditions = [where[len(' WHERE '):]] if where else []
+        if series_id is not None:
+            conditions.append('series_id = ?')
+            params.append(series_id)
+        if watched is not None:
+            conditions.append('view_count > 0' if watched else 'view_count = 0')
+        if pending_delete is not None:
+            conditions.append('pending_delete = ?')
+            params.append(int(pending_delete))
+        sql = f'SELECT * FROM {table}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}, terminal_id, id"
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params.extend([limit if limit is not None else -1, offset])
+        rows = self.__select(sql, params)
+        for row in rows:
+            row['pending_delete'] = bool(row['pending_delete'])
+        return rows
+
+    @staticmethod
+    def __where(terminal_ids: Optional[Iterable[str]], prefix: str = '') -> Tuple[str, list]:
+        if terminal_ids is None:
+            return '', []
+        terminal_ids = list(terminal_ids)
+        return f" WHERE {prefix}terminal_id IN ({', '.join('?' * len(terminal_ids))})", terminal_ids
+
+    def __select(self, sql: str, params: list) -> List[dict]:
+        with self.__lock:
+            return [dict(row) for row in self.__connection.execute(sql, params)]
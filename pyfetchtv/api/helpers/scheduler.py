@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTask:
+    """
+    A task registered with a Scheduler, runs once or every `interval_sec` until cancelled.
+    """
+
+    def __init__(self, name: str, action: Callable[[], None], interval_sec: Optional[float]):
+        self.name = name
+        self.action = action
+        self.interval_sec = interval_sec
+        self.due = 0.0
+        self.runs = 0
+        self.__cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled
+
+    def cancel(self):
+        self.__cancelled = True
+
+
+class Scheduler:
+    """
+    Runs one-off and periodic tasks from a single timer thread.
+    Tasks are kept in a heap ordered by due time, the timer thread sleeps until the next task is due (or a new
+    earlier task is added) and hands due tasks to a small worker pool so a slow task does not delay the others.
+    A periodic task is rescheduled when its run finishes, so it never overlaps itself.
+    """
+
+    def __init__(self, name: str = 'Scheduler', workers: int = 4):
+        self.__name = name
+        self.__heap = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+        self.__closed = threading.Event()
+        self.__thread = None  # type: Optional[Thread]
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-task')
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def is_closed(self) -> bool:
+        return self.__closed.is_set()
+
+    def __len__(self):
+        with self.__condition:
+            return len([t for _, _, t in self.__heap if not t.cancelled])
+
+    def schedule(self, delay_sec: float, action: Callable[[], None], interval_sec: Optional[float] = None,
+                 name: str = '') -> ScheduledTask:
+        """
+        Schedule a task.
+        :param delay_sec: Seconds until the first run
+        :param action: The function to run
+        :param interval_sec: Seconds between the end of one run and the start of the next, None to run once
+        :param name: Name used when logging failures
+        :return: The task, which can be cancelled
+        """
+        task = ScheduledTask(name or getattr(action, '__name__', 'task'), action, interval_sec)
+        self.__push(task, delay_sec)
+        return task
+
+    def every(self, interval_sec: float, action: Callable[[], None], name: str = '',
+              delay_sec: float = 0) -> ScheduledTask:
+        return self.schedule(delay_sec, action, interval_sec, name)
+
+    def __push(self, task: ScheduledTask, delay_sec: float):
+        with self.__condition:
+            if self.is_closed:
+                task.cancel()
+                return
+            task.due = time.monotonic() + max(0.0, delay_sec)
+            heapq.heappush(self.__heap, (task.due, next(self.__sequence), task))
+            if not self.__thread:
+                self.__thread = Thread(target=self.__run, name=self.__name, daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def __run(self):
+        while not self.is_closed:
+            with self.__condition:
+                while not self.is_closed:
+                    while self.__heap and self.__heap[0][2].cancelled:
+                        heapq.heappop(self.__heap)
+                    wait = self.__heap[0][0] - time.monotonic() if self.__heap else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self.__condition.wait(wait)
+                if self.is_closed:
+                    return
+                _, _, task = heapq.heappop(self.__heap)
+            try:
+                self.__executor.submit(self.__execute, task)
+            except RuntimeError:
+                # Executor shut down while closing
+                return
+
+    def __execute(self, task: ScheduledTask):
+        if task.cancelled or self.is_closed:
+            return
+        try:
+            task.action()
+        except Exception:
+            logger.error(f'{self.__name} --> Task {task.name} failed', exc_info=True)
+        task.runs += 1
+        if task.interval_sec is not None and not task.cancelled:
+            self.__push(task, task.interval_sec)
+
+    def close(self):
+        """
+        Stop immediately, tasks already running are left to finish in the background.
+        """
+        with self.__condition:
+            self.__closed.set()
+            for _, _, task in self.__heap:
+                task.cancel()
+            self.__heap = []
+            self.__condition.notify_all()
+        self.__executor.shutdown(wait=False)
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(1)
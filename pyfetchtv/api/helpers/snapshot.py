@@ -0,0 +1,85 @@
+import copy
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from pyfetchtv.api.helpers import json_patch
+
+# A value for update() removing the path from the snapshot
+REMOVED = object()
+
+
+class VersionedSnapshot:
+    """
+    A JSON document with a version which increases each time it changes, keeping the patches between the recent
+    versions so a consumer holding an older version can catch up without the whole document.
+    """
+
+    def __init__(self, history_size: int = 100):
+        """
+        :param history_size: The number of versions whose patches are kept
+        """
+        self.__lock = threading.Lock()
+        self.__data = {}  # type: dict
+        self.__version = 0
+        # (base version, patch) for each recent version, oldest first
+        self.__patches = deque(maxlen=history_size)  # type: Deque[Tuple[int, List[dict]]]
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    def update(self, values: Dict[Tuple, object]) -> Optional[dict]:
+        """
+        Set values in the document, creating a new version if any changed.
+        :param values: Values by their path from the document root, REMOVED removes the path. The parent of each
+            path must exist
+        :return: The change as {'version', 'base_version', 'patch'}, or None if nothing changed
+        """
+        with self.__lock:
+            patch = []
+            for path, value in values.items():
+                parent = self.__data
+                for key in path[:-1]:
+                    # Copied rather than changed, earlier patches may hold the object
+                    parent[key] = dict(parent[key])
+                    parent = parent[key]
+                key = path[-1]
+                if value is REMOVED:
+                    if key in parent:
+                        del parent[key]
+                        patch.append({'op': 'remove', 'path': json_patch.pointer(path)})
+                    continue
+                if key in parent:
+                    patch.extend(json_patch.diff(parent[key], value, json_patch.pointer(path)))
+                else:
+                    patch.append({'op': 'add', 'path': json_patch.pointer(path), 'value': value})
+                parent[key] = value
+            if not patch:
+                return None
+            base_version = self.__version
+            self.__version += 1
+            self.__patches.append((base_version, patch))
+            return {'version': self.__version, 'base_version': base_version, 'patch': patch}
+
+    def snapshot(self) -> dict:
+        """
+        :return: A copy of the document as {'version', 'data'}
+        """
+        with self.__lock:
+            return {'version': self.__version, 'data': copy.deepcopy(self.__data)}
+
+    def patches_since(self, version: int) -> Optional[dict]:
+        """
+        Get the change from a version to the current one.
+        :param version: The version the consumer holds
+        :return: {'version', 'base_version', 'patch'} with the patches combined, or None if the version is too old
+            or unknown and the consumer needs the whole snapshot
+        """
+        with self.__lock:
+            if version == self.__version:
+                return {'version': version, 'base_version': version, 'patch': []}
+            if version > self.__version or not self.__patches or version < self.__patches[0][0]:
+                return None
+            patch = [operation for base, operations in self.__patches if base >= version for operation in operations]
+            return {'version': self.__version, 'base_version': version, 'patch': patch}
@@ -0,0 +1,81 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.fetchtv_interface import SubscriberMessage
+
+_GROUP = 0
+_COMMAND = 1
+_TERMINAL = 2
+
+
+class SubscriptionTable:
+    """
+    Routing table of subscriber callbacks, indexed by message group, command and terminal id.
+    A subscriber with no filter for a dimension matches every value of that dimension.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__callbacks = {}  # type: Dict[str, Callable[[SubscriberMessage], None]]
+        self.__index = ({}, {}, {})  # type: Tuple[Dict[object, Set[str]], ...]
+        self.__wildcards = (set(), set(), set())  # type: Tuple[Set[str], ...]
+        self.__routes = {}  # type: Dict[tuple, List[Callable[[SubscriberMessage], None]]]
+
+    def __len__(self):
+        return len(self.__callbacks)
+
+    def add(self,
+            subscriber_id: str,
+            callback: Callable[[SubscriberMessage], None],
+            groups: Optional[Iterable[MessageType]] = None,
+            commands: Optional[Iterable[MessageTypeIn]] = None,
+            terminal_ids: Optional[Iterable[str]] = None):
+        with self.__lock:
+            self.__remove(subscriber_id)
+            self.__callbacks[subscriber_id] = callback
+            for dimension, values in enumerate([groups, commands, terminal_ids]):
+                if values is None:
+                    self.__wildcards[dimension].add(subscriber_id)
+                    continue
+                for value in values:
+                    self.__index[dimension].setdefault(value, set()).add(subscriber_id)
+            self.__routes = {}
+
+    def remove(self, subscriber_id: str):
+        with self.__lock:
+            self.__remove(subscriber_id)
+            self.__routes = {}
+
+    def __remove(self, subscriber_id: str):
+        if subscriber_id not in self.__callbacks:
+            return
+        del self.__callbacks[subscriber_id]
+        for dimension in range(3):
+            self.__wildcards[dimension].discard(subscriber_id)
+            index = self.__index[dimension]
+            for value in [k for k, v in index.items() if subscriber_id in v]:
+                index[value].discard(subscriber_id)
+                if not index[value]:
+                    del index[value]
+
+    def match(self, group: MessageType, command: MessageTypeIn, terminal_id: str) \
+            -> List[Callable[[SubscriberMessage], None]]:
+        """
+        :return: The callbacks interested in a message with the provided group, command and terminal id
+        """
+        key = (group, command, terminal_id)
+        routes = self.__routes
+        if key in routes:
+            return routes[key]
+        with self.__lock:
+            subscriber_ids = None
+            for dimension, value in enumerate(key):
+                ids = self.__index[dimension].get(value, set()) | self.__wildcards[dimension]
+                subscriber_ids = ids if subscriber_ids is None else subscriber_ids & ids
+                if not subscriber_ids:
+                    break
+            # Keep registration order so delivery order is predictable
+            callbacks = [v for k, v in self.__callbacks.items() if k in subscriber_ids]
+            self.__routes[key] = callbacks
+            return callbacks
@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    A timed operation, e.g. an HTTP request or a websocket command waiting for its response.
+    Commands use the websocket messageId as the context id, so the command and its response are one span.
+    """
+
+    def __init__(self, tracer: 'Tracer', name: str, context_id: Optional[str], attributes: dict):
+        self.name = name
+        self.context_id = context_id
+        self.attributes = attributes
+        self.events = []  # type: List[tuple]
+        self.start_time = time.time()
+        self.end_time = None  # type: Optional[float]
+        self.error = None  # type: Optional[BaseException]
+        # Storage for hooks, e.g. the OpenTelemetry span
+        self.data = {}
+        self.__tracer = tracer
+        self.__lock = threading.Lock()
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add_event(self, name: str):
+        self.events.append((name, time.time()))
+
+    def finish(self, error: BaseException = None):
+        """
+        End the span, only the first call has an effect.
+        """
+        with self.__lock:
+            if self.end_time is not None:
+                return
+            self.end_time = time.time()
+        self.error = error
+        self.__tracer._on_end(self)
+
+
+class _DisabledSpan:
+    """
+    Returned when no hooks are registered, each call does nothing.
+    """
+    context_id = None
+    attributes = {}
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def add_event(self, name: str):
+        pass
+
+    def finish(self, error: BaseException = None):
+        pass
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class TraceHook:
+    """
+    Receives spans as they start and end, override either method.
+    """
+
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        pass
+
+
+class Tracer:
+    """
+    Creates spans and passes them to the registered hooks. With no hooks tracing is disabled and spans cost a
+    method call.
+    """
+
+    def __init__(self, hooks: List[TraceHook] = None):
+        self.__hooks = list(hooks or [])
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.__hooks) > 0
+
+    def add_hook(self, hook: TraceHook):
+        self.__hooks = self.__hooks + [hook]
+
+    def remove_hook(self, hook: TraceHook):
+        self.__hooks = [h for h in self.__hooks if h is not hook]
+
+    def start_span(self, name: str, context_id: str = None, **attributes):
+        """
+        :param name: The operation, e.g. http or command
+        :param context_id: Correlates the span with other records, e.g. a websocket messageId
+        :param attributes: Details of the operation
+        :return: The span, call finish() when the operation ends
+        """
+        if not self.__hooks:
+            return _DISABLED_SPAN
+        span = Span(self, name, context_id, attributes)
+        for hook in self.__hooks:
+            try:
+                hook.on_start(span)
+            except Exception:
+                logger.error(f'Tracing hook failed starting {name}', exc_info=True)
+        return span
+
+    def _on_end(self, span: Span):
+        for hook in self.__hooks:
+            try:
+                hook.on_end(span)
+            except Exception:
+                logger.error(f'Tracing hook failed ending {span.name}', exc_info=True)
+
+
+class RecordingHook(TraceHook):
+    """
+    Keeps the most recent finished spans in memory, e.g. for tests or debugging.
+    """
+
+    def __init__(self, max_spans: int = 1000):
+        self.__max_spans = max_spans
+        self.__lock = threading.Lock()
+        self.__spans = []  # type: List[Span]
+
+    @property
+    def spans(self) -> List[Span]:
+        with self.__lock:
+            return list(self.__spans)
+
+    def find(self, name: str = None, context_id: str = None) -> List[Span]:
+        return [s for s in self.spans if (name is None or s.name == name) and
+                (context_id is None or s.context_id == context_id)]
+
+    def on_end(self, span: Span):
+        with self.__lock:
+            self.__spans.append(span)
+            del self.__spans[:-self.__max_spans]
+
+
+class OpenTelemetryHook(TraceHook):
+    """
+    Reports spans to OpenTelemetry, does nothing when opentelemetry-api is not installed.
+    """
+
+    def __init__(self, tracer_name: str = 'pyfetchtv'):
+        # Imported when the hook is created, tracing without OpenTelemetry doesn't load it
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError:  # pragma: no cover - optional dependency
+            otel_trace = None
+        self.__tracer = otel_trace.get_tracer(tracer_name) if otel_trace else None
+
+    @property
+    def available(self) -> bool:
+        return self.__tracer is not None
+
+    def on_start(self, span: Span):
+        if not self.__tracer:
+            return
+        attributes = _otel_attributes(span)
+        span.data['otel'] = self.__tracer.start_span(f'fetchtv.{span.name}', attributes=attributes,
+                                                     start_time=int(span.start_time * 1e9))
+
+    def on_end(self, span: Span):
+        otel_span = span.data.get('otel')
+        if not otel_span:
+            return
+        for key, value in _otel_attributes(span).items():
+            otel_span.set_attribute(key, value)
+        for name, timestamp in span.events:
+            otel_span.add_event(name, timestamp=int(timestamp * 1e9))
+        if span.error is not None:
+            from opentelemetry.trace import Status, StatusCode
+            otel_span.record_exception(span.error)
+            otel_span.set_status(Status(StatusCode.ERROR, str(span.error)))
+        otel_span.end(end_time=int(span.end_time * 1e9))
+
+
+def _otel_attributes(span: Span) -> Dict[str, object]:
+    # OpenTelemetry only accepts primitive attribute values
+    attributes = {f'fetchtv.{k}': v if isinstance(v, (str, bool, int, float)) else str(v)
+                  for k, v in span.attributes.items() if v is not None}
+    if span.context_id:
+        attributes['fetchtv.context_id'] = span.context_id
+    return attributes
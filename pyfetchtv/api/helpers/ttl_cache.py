@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class TtlCache:
+    """
+    A bounded cache, entries expire after ttl_sec and the least recently used entry is evicted when full.
+    """
+
+    def __init__(self, max_entries: int = 200, ttl_sec: float = 900):
+        """
+        :param max_entries: Entries kept, 0 disables the cache
+        :param ttl_sec: Seconds an entry is used for
+        """
+        self.__max_entries = max_entries
+        self.__ttl_sec = ttl_sec
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()  # type: OrderedDict[Hashable, tuple]
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    @property
+    def metrics(self) -> dict:
+        with self.__lock:
+            return {'entries': len(self.__entries), 'hits': self.__hits, 'misses': self.__misses,
+                    'evictions': self.__evictions}
+
+    def get(self, key: Hashable) -> Optional[object]:
+        """
+        :return: The cached value, or None if missing or expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                if entry is not None:
+                    del self.__entries[key]
+                self.__misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        if self.__max_entries <= 0:
+            return
+        with self.__lock:
+            self.__entries[key] = (value, time.monotonic() + self.__ttl_sec)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+
+    def remove(self, key: Hashable):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
@@ -1,27 +1,50 @@
 import json
 import logging
-import time
+import threading
 from abc import ABC, abstractmethod
 from threading import Thread
-from typing import Optional
-import websocket
-from websocket import WebSocketConnectionClosedException
+from typing import Optional, TYPE_CHECKING
+
+from pyfetchtv.api.helpers.backoff import Backoff
+from pyfetchtv.api.helpers.metrics import MetricsRegistry
+from pyfetchtv.api.helpers.scheduler import Scheduler, ScheduledTask
+
+if TYPE_CHECKING:
+    import websocket
 
 logger = logging.getLogger(__name__)
 
 
 class WsMessageHandler(ABC):
 
-    def __init__(self, name: str, ping_sec: int = 60):
+    def __init__(self, name: str, ping_sec: int = 60, backoff: Backoff = None, scheduler: Scheduler = None,
+                 metrics: MetricsRegistry = None, instance: str = None):
         self.__connected = False
+        # True from connect() until close(), while True a dropped connection is re-established
+        self.__running = False
+        self.__has_connected = False
+        self.__reconnects = 0
         self.__name = name
-        self.__keep_alive = Thread(target=self._keep_alive)
+        self.__owns_scheduler = scheduler is None
+        self.__scheduler = scheduler if scheduler is not None else Scheduler(f'{name}-scheduler')
+        self.__keep_alive = None  # type: Optional[ScheduledTask]
         self.__message_socket_thread = Thread(target=self.__start)
-        self.__message_socket = None  # type: Optional[websocket.WebSocketApp]
+        self.__message_socket = None  # type: Optional['websocket.WebSocketApp']
+        # Set when websocket is imported on the first connect, until then nothing is caught
+        self.__closed_exception = ()
         self.__ping_sec = ping_sec
+        self.__backoff = backoff if backoff else Backoff()
+        self.__stop_event = threading.Event()
         self.__url = ''
         self.__headers = {}
         self.__cookie = ''
+        self.__metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self.__sent_counter = self.__metrics.counter('ws_messages_sent', 'Websocket messages sent', ('type',))
+        self.__reconnect_counter = self.__metrics.counter('ws_reconnects', 'Websocket reconnects')
+        # Labels the gauges, so handlers sharing a registry report their own values
+        self.__instance = instance if instance is not None else name
+        self.__connected_gauge = self.__metrics.gauge('ws_connected', '1 while the websocket is connected',
+                                                      ('instance',))
 
     @property
     def name(self):
@@ -31,6 +54,25 @@ class WsMessageHandler(ABC):
     def is_connected(self):
         return self.__connected
 
+    @property
+    def metrics(self) -> MetricsRegistry:
+        return self.__metrics
+
+    @property
+    def instance(self) -> str:
+        return self.__instance
+
+    @property
+    def scheduler(self) -> Scheduler:
+        return self.__scheduler
+
+    @property
+    def reconnects(self) -> int:
+        """
+        :return: The number of times the websocket has reconnected
+        """
+        return self.__reconnects
+
     @abstractmethod
     def on_message(self, message: str):
         pass
@@ -47,14 +89,16 @@ class WsMessageHandler(ABC):
     def keep_alive(self):
         pass
 
+    def on_reconnect(self):
+        """
+        Called after the websocket reconnects, override to restore state.
+        """
+        pass
+
     def _keep_alive(self):
-        # Ping every ping_sec
-        while self.__connected:
+        # Runs every ping_sec on the scheduler
+        if self.__connected:
             self.keep_alive()
-            for _ in range(self.__ping_sec):
-                if not self.__connected:
-                    break
-                time.sleep(1)
 
     def connect(self,
                 url: str,
@@ -64,16 +108,24 @@ class WsMessageHandler(ABC):
         self.__url = url
         self.__headers = headers
         self.__cookie = cookie
-        self.__message_socket = websocket.WebSocketApp(
-            url=url,
-            header=headers,
-            cookie=cookie,
+        self.__running = True
+        self.__stop_event.clear()
+        if not self.__message_socket_thread.is_alive():
+            self.__message_socket_thread.start()
+
+    def __create_socket(self) -> 'websocket.WebSocketApp':
+        # Imported when first connecting, processes which never connect don't pay for it
+        import websocket
+        self.__closed_exception = websocket.WebSocketConnectionClosedException
+        return websocket.WebSocketApp(
+            url=self.__url,
+            header=self.__headers,
+            cookie=self.__cookie,
             on_message=self.__on_message,
             on_open=self.__on_open,
-            on_error=self.__on_error
+            on_error=self.__on_error,
+            on_close=self.__on_close
         )
-        if not self.__message_socket_thread.is_alive():
-            self.__message_socket_thread.start()
 
     def __on_message(self, ws, message):
         try:
@@ -83,15 +135,37 @@ class WsMessageHandler(ABC):
             raise
 
     def __start(self):
-        self.__message_socket.run_forever()
+        # Supervise the connection, reconnecting with backoff until closed
+        while self.__running:
+            self.__message_socket = self.__create_socket()
+            try:
+                self.__message_socket.run_forever()
+            except Exception:
+                logger.error(f'{self.name} --> Websocket failed.', exc_info=True)
+            self.__connected = False
+            self.__connected_gauge.set(0, self.__instance)
+            if not self.__running:
+                break
+            delay = self.__backoff.next()
+            logger.info(f'{self.name} --> Connection lost, reconnecting in {delay:.1f} seconds...')
+            if self.__stop_event.wait(delay):
+                break
 
     def __on_open(self, ws):
         self.__connected = True
-        if not self.__keep_alive.is_alive():
-            self.__keep_alive.start()
+        self.__connected_gauge.set(1, self.__instance)
+        self.__backoff.reset()
+        reconnected = self.__has_connected
+        self.__has_connected = True
+        if not self.__keep_alive:
+            self.__keep_alive = self.__scheduler.every(self.__ping_sec, self._keep_alive, f'{self.name}-keep-alive')
         logger.info(f"{self.name} --> Ready to receive messages...")
         try:
             self.on_open()
+            if reconnected:
+                self.__reconnects += 1
+                self.__reconnect_counter.inc()
+                self.on_reconnect()
         except Exception:
             logger.error('Unexpected error calling on_open', exc_info=True)
             raise
@@ -103,54 +177,56 @@ class WsMessageHandler(ABC):
             logger.error('Unexpected error calling on_error', exc_info=True)
             raise
 
-    def __reconnect(self):
-        logger.info('Trying to reconnect websocket....')
-        if not self.is_connected:
+    def __on_close(self, ws, close_status_code=None, close_msg=None):
+        self.__connected = False
+        logger.info(f"{self.name} --> Websocket closed. {close_status_code or ''} {close_msg or ''}".rstrip())
+
+    def _reconnect(self):
+        """
+        Drop the current connection, the supervisor re-establishes it.
+        """
+        if not self.__running:
             return
-        # try and reconnect
-        try:
-            # cleanup old connection
-            self.__message_socket.close()
-        except WebSocketConnectionClosedException:
-            logger.info('*** DEBUG... closing closed socket...', exc_info=True)
+        logger.info(f'{self.name} --> Trying to reconnect websocket....')
+        self.__connected = False
+        self.__close_socket()
 
-        self.__message_socket = websocket.WebSocketApp(
-            url=self.__url,
-            header=self.__headers,
-            cookie=self.__cookie,
-            on_message=self.__on_message,
-            on_open=self.__on_open,
-            on_error=self.__on_error
-        )
-        try:
-            self.__message_socket_thread.join(5)
-        except TimeoutError:
-            logger.info('*** DEBUG... joining runforever thread...')
-        self.__message_socket_thread = Thread(target=self.__start)
-        self.__message_socket_thread.start()
+    def __close_socket(self):
+        # Shut the socket down and let the socket thread tear the connection down. Closing it from this thread can
+        # close the file descriptor under the socket thread's selector, leaving it waiting forever.
+        message_socket = self.__message_socket
+        if not message_socket:
+            return
+        message_socket.keep_running = False
+        sock = message_socket.sock
+        if sock:
+            sock.abort()
 
     def send_message(self, message: dict):
+        if not self.__connected:
+            # The supervisor is already reconnecting, on_reconnect resyncs state once connected
+            logger.warning(f"{self.name} --> Not connected, dropped {message['message']['type']} message.")
+            return
         try:
             self.__message_socket.send(json.dumps(message))
-        except WebSocketConnectionClosedException:
+            self.__sent_counter.inc(message['message']['type'])
+        except self.__closed_exception:
             logger.error(f"{self.name} --> Send message failed.", exc_info=True)
-            self.__reconnect()
+            self._reconnect()
 
     def close(self):
         logger.info(f"{self.name} --> Stopped receiving messages.")
+        self.__running = False
         self.__connected = False
-        try:
-            if self.__message_socket:
-                self.__message_socket.close()
-        except WebSocketConnectionClosedException:
-            pass
+        self.__stop_event.set()
+        self.__close_socket()
+        if self.__keep_alive:
+            self.__keep_alive.cancel()
+        if self.__owns_scheduler:
+            self.__scheduler.close()
         try:
             if self.__message_socket_thread.is_alive():
                 self.__message_socket_thread.join(10)
         except TimeoutError:
             pass
-        try:
-            if self.__keep_alive.is_alive():
-                self.__keep_alive.join(10)
-        except TimeoutError:
-            pass
+        self.__connected_gauge.remove(self.__instance)
@@ -0,0 +1,80 @@
+from typing import List
+
+from pyfetchtv.api.json_objects.json_object import JsonObject, json_property
+
+
+class CatalogueTab(JsonObject):
+
+    @json_property(name='id')
+    def id(self) -> str:
+        return ''
+
+    @json_property(name='name')
+    def name(self) -> str:
+        return ''
+
+    @json_property(name='count')
+    def count(self) -> int:
+        return 0
+
+
+class CatalogueItem(JsonObject):
+    """
+    A VOD title, only these fields are kept from the catalogue response.
+    """
+
+    @json_property(name='id')
+    def id(self) -> str:
+        return ''
+
+    @json_property(name='title')
+    def title(self) -> str:
+        return ''
+
+    @json_property(name='type')
+    def type(self) -> str:
+        return ''
+
+    @json_property(name='synopsis')
+    def synopsis(self) -> str:
+        return ''
+
+    @json_property(name='genres')
+    def genres(self) -> List[str]:
+        return []
+
+    @json_property(name='rating')
+    def rating(self) -> str:
+        return ''
+
+    @json_property(name='year')
+    def year(self) -> int:
+        return 0
+
+    @json_property(name='duration')
+    def duration(self) -> int:
+        return 0
+
+    @json_property(name='price')
+    def price(self) -> float:
+        return 0.0
+
+    @json_property(name='image')
+    def image(self) -> str:
+        return ''
+
+
+class CataloguePage:
+    """
+    One page of a catalogue tab.
+    """
+
+    def __init__(self, tab_id: str, page: int, pages: int, items: List[CatalogueItem]):
+        self.tab_id = tab_id
+        self.page = page
+        self.pages = pages
+        self.items = items
+
+    @property
+    def has_next(self) -> bool:
+        return self.page + 1 < self.pages
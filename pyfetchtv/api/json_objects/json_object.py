@@ -1,8 +1,13 @@
 from abc import ABC
 from enum import Enum
+from typing import Callable, Dict, Hashable, List
 
 from pyfetchtv.api.helpers import json_utils
 
+# JSON properties and to_dict attribute names by class, found once per class rather than for every object
+_JSON_PROPERTIES = {}
+_DICT_KEYS = {}
+
 
 class JsonObject(ABC):
 
@@ -17,12 +22,29 @@ class JsonObject(ABC):
         self.__map = {}
         props = self.__get_json_properties()
         for key, val in props.items():
-            result = None
-            if val.name:
-                result = json_utils.json_get_value(json, val.name, val.fget(self))
-            elif val.path:
-                result = json_utils.json_get_path_value(json, val.path, val.fget(self))
-            self.__map[val.name or val.path] = result
+            self.__map[val.name or val.path] = self.__read(json, val)
+
+    def __read(self, json: dict, val: 'JsonProperty'):
+        if val.name:
+            return json_utils.json_get_value(json, val.name, val.fget(self))
+        if val.path:
+            return json_utils.json_get_path_value(json, val.path, val.fget(self))
+        return None
+
+    def _update(self, json: dict) -> List[str]:
+        """
+        Read the JSON properties again, updating this object in place.
+        :return: The names of the properties which changed
+        """
+        changed = []
+        for key, val in self.__get_json_properties().items():
+            map_key = val.name or val.path
+            result = self.__read(json, val)
+            if self.__map.get(map_key) != result:
+                self.__map[map_key] = result
+                # Private properties are reported by their unmangled name
+                changed.append(key.rsplit('__', 1)[-1] if key.startswith('_') else key)
+        return changed
 
     @staticmethod
     def __convert_list(value: list, full: bool):
@@ -54,11 +76,18 @@ class JsonObject(ABC):
                 break
         return new_vals if replace else value
 
+    @classmethod
+    def __get_dict_keys(cls):
+        keys = _DICT_KEYS.get(cls)
+        if keys is None:
+            ignored = cls._to_dict_ignored()
+            keys = [key for key in dir(cls) if not key.startswith('_') and key not in ignored]
+            _DICT_KEYS[cls] = keys
+        return keys
+
     def to_dict(self, full=False):
         result = {}
-        for key in dir(self):
-            if key.startswith('_') or key in self._to_dict_ignored():
-                continue
+        for key in self.__get_dict_keys():
             value = getattr(self, key)
             typ = type(value)
             if isinstance(value, JsonObject):
@@ -92,15 +121,46 @@ class JsonObject(ABC):
 
     @classmethod
     def __get_json_properties(cls):
+        props = _JSON_PROPERTIES.get(cls)
+        if props is not None:
+            return props
         props = {}
         for k in dir(cls):
             attr = getattr(cls, k)
             # Check that it is a property with a getter
             if isinstance(attr, JsonProperty) and attr.fget:
                 props[k] = attr
+        _JSON_PROPERTIES[cls] = props
         return props
 
 
+def update_objects(objects: Dict[Hashable, JsonObject], items: List[dict], id_name: str,
+                   create: Callable[[dict], JsonObject]) -> Dict[str, list]:
+    """
+    Update objects keyed by id in place from a new list of JSON items, keeping the objects which still exist.
+    :param objects: The objects by id, updated
+    :param items: The JSON items
+    :param id_name: The JSON property holding the id
+    :param create: Creates the object for a new item
+    :return: Ids 'added', 'removed' and 'changed', only lists which aren't empty are included
+    """
+    added, changed = [], []
+    seen = set()
+    for item in items:
+        item_id = item.get(id_name)
+        seen.add(item_id)
+        existing = objects.get(item_id)
+        if existing is None:
+            objects[item_id] = create(item)
+            added.append(item_id)
+        elif existing._update(item):
+            changed.append(item_id)
+    removed = [item_id for item_id in objects if item_id not in seen]
+    for item_id in removed:
+        del objects[item_id]
+    return {k: v for k, v in (('added', added), ('removed', removed), ('changed', changed)) if v}
+
+
 class JsonProperty(property):
     def __init__(self, fget=None, fset=None, fdel=None, doc=None, name='', path=''):
         super().__init__(fget, fset, fdel, doc)
@@ -1,6 +1,7 @@
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Set, Iterable, Tuple
 
-from pyfetchtv.api.json_objects.json_object import JsonObject, json_property
+from pyfetchtv.api.json_objects.json_object import JsonObject, json_property, update_objects
 from pyfetchtv.api.json_objects.series import Series
 
 
@@ -10,6 +11,8 @@ class Recording(JsonObject):
         super().__init__(json)
         self.__terminal_id = box.terminal_id
         self.__dlna_url = box.dlna_url
+        # The Recordings indexing this recording, kept current when it is deleted
+        self._owner = None  # type: Optional[Recordings]
 
     @property
     def terminal_id(self) -> str:
@@ -105,41 +108,193 @@ class Recording(JsonObject):
 
     def delete(self):
         self.set_value('pendingDelete', True)
+        if self._owner is not None:
+            self._owner.mark_pending_delete([self.id])
 
 
 class Recordings(JsonObject):
+    """
+    Recordings on a box, indexed by id, series link, pending delete and active state so updates and lookups do
+    not scan every recording.
+    """
 
     def __init__(self, box, json: dict):
         super().__init__(json)
         self.__box = box
-        self.__series = [Series(item) for item in self._get_json_value(json, 'seriesTagList', [])]
+        self.__series = {item.series_link: item for item in
+                         [Series(itm) for itm in self._get_json_value(json, 'seriesTagList', [])]}
         self.__future = {}
-        self.__active = json['activeRecordings']
+        self.__active = set(json['activeRecordings'])
         self.set_future(json, 'currentFutureRecordings')
-        self.__items = {itm['id']: Recording(self.__box, itm) for itm in self._get_json_value(json, 'recordings', [])}
+        self.__items = {}  # type: Dict[int, Recording]
+        self.__by_series = {}  # type: Dict[str, Set[int]]
+        self.__pending_delete = set()  # type: Set[int]
+        for itm in self._get_json_value(json, 'recordings', []):
+            self.update(Recording(self.__box, itm))
+
+    def update_from(self, json: dict) -> Dict[str, dict]:
+        """
+        Update in place from a box's full state, keeping the recordings and series which still exist.
+        :return: Ids added, removed and changed by 'recordings', 'future' and 'series', only parts which changed
+        """
+        changes = {}
+        recordings = self.__update_recordings(self._get_json_value(json, 'recordings', []))
+        if recordings:
+            changes['recordings'] = recordings
+        future = update_objects(self.__future, self._get_json_value(json, 'currentFutureRecordings', []), 'id',
+                                lambda item: Recording(self.__box, item))
+        if future:
+            changes['future'] = future
+        series = update_objects(self.__series, self._get_json_value(json, 'seriesTagList', []), 'id', Series)
+        if series:
+            changes['series'] = series
+        active = set(json['activeRecordings'])
+        if active != self.__active:
+            changes['active'] = {'added': sorted(active - self.__active), 'removed': sorted(self.__active - active)}
+            self.__active = active
+        return changes
+
+    def __update_recordings(self, items: List[dict]) -> Dict[str, list]:
+        added, changed = [], []
+        seen = set()
+        for item in items:
+            recording = self.__items.get(item['id'])
+            seen.add(item['id'])
+            if recording is None:
+                recording = Recording(self.__box, item)
+                self.update(recording)
+                added.append(recording.id)
+                continue
+            series_id = recording.series_id
+            if recording._update(item):
+                self.__reindex(recording, series_id)
+                changed.append(recording.id)
+        removed = [i for i in self.__items if i not in seen]
+        for recording_id in removed:
+            self.remove(recording_id)
+        return {k: v for k, v in (('added', added), ('removed', removed), ('changed', changed)) if v}
+
+    def __reindex(self, recording: Recording, previous_series_id: str):
+        if previous_series_id != recording.series_id:
+            ids = self.__by_series.get(previous_series_id)
+            if ids is not None:
+                ids.discard(recording.id)
+                if not ids:
+                    del self.__by_series[previous_series_id]
+            if recording.series_id:
+                self.__by_series.setdefault(recording.series_id, set()).add(recording.id)
+        if recording.pending_delete:
+            self.__pending_delete.add(recording.id)
+        else:
+            self.__pending_delete.discard(recording.id)
 
     def set_future(self, json, tag):
         self.__future = {item['id']: Recording(self.__box, item) for item in self._get_json_value(json, tag, [])}
 
+    def update_future(self, json, tag) -> Dict[str, list]:
+        """
+        Update the future recordings in place from a full list, keeping the recordings which still exist.
+        :return: Ids 'added', 'removed' and 'changed', only lists which aren't empty are included
+        """
+        return update_objects(self.__future, self._get_json_value(json, tag, []), 'id',
+                              lambda item: Recording(self.__box, item))
+
+    def add_future(self, recording: Recording):
+        self.__future[recording.id] = recording
+
+    def remove_future(self, recording_id: int) -> Optional[Recording]:
+        return self.__future.pop(recording_id, None)
+
     def set_active(self, recordings_ids: List[int]):
-        self.__active = recordings_ids
+        self.__active = set(recordings_ids)
+
+    def is_active(self, recording_id: int) -> bool:
+        return recording_id in self.__active
+
+    def update(self, recording: Recording):
+        """
+        Add or replace a recording, keeping the indexes current.
+        """
+        self.remove(recording.id)
+        self.__items[recording.id] = recording
+        recording._owner = self
+        if recording.series_id:
+            self.__by_series.setdefault(recording.series_id, set()).add(recording.id)
+        if recording.pending_delete:
+            self.__pending_delete.add(recording.id)
+
+    def remove(self, recording_id: int) -> Optional[Recording]:
+        recording = self.__items.pop(recording_id, None)
+        if not recording:
+            return None
+        recording._owner = None
+        ids = self.__by_series.get(recording.series_id)
+        if ids is not None:
+            ids.discard(recording_id)
+            if not ids:
+                del self.__by_series[recording.series_id]
+        self.__pending_delete.discard(recording_id)
+        return recording
+
+    def get(self, recording_id: int) -> Optional[Recording]:
+        return self.__items.get(recording_id)
+
+    def mark_pending_delete(self, recording_ids: Iterable[int]) -> List[Recording]:
+        """
+        Flag recordings as pending delete.
+        :param recording_ids: The recordings deleted
+        :return: The known recordings flagged
+        """
+        result = []
+        for recording_id in recording_ids:
+            recording = self.__items.get(recording_id)
+            if recording:
+                recording.set_value('pendingDelete', True)
+                self.__pending_delete.add(recording_id)
+                result.append(recording)
+        return result
+
+    def for_series(self, series_link: str) -> List[Recording]:
+        """
+        :return: Recordings of the series
+        """
+        return [self.__items[i] for i in self.__by_series.get(series_link, ())]
+
+    def get_series(self, series_link: str) -> Optional[Series]:
+        return self.__series.get(series_link)
+
+    def add_series(self, series: Series):
+        self.__series[series.series_link] = series
+
+    def remove_series(self, series_link: str) -> Optional[Series]:
+        return self.__series.pop(series_link, None)
 
     @property
-    def series(self) -> List[Series]:
-        return self.__series
+    def series(self) -> Tuple[Series, ...]:
+        """
+        :return: The series tags, read-only so changing them fails rather than being lost, use add_series() and
+            remove_series()
+        """
+        return tuple(self.__series.values())
 
     @property
     def future(self) -> Dict[int, Recording]:
         return self.__future
 
     @property
-    def active(self) -> List[int]:
-        return self.__active
+    def active(self) -> Tuple[int, ...]:
+        """
+        :return: Ids of the recordings in progress, read-only, use set_active() to change them
+        """
+        return tuple(self.__active)
 
     @property
-    def items(self) -> Dict[int, Recording]:
-        return self.__items
+    def items(self) -> Mapping[int, Recording]:
+        """
+        :return: A read-only view of the recordings by id, use update() and remove() to change them
+        """
+        return MappingProxyType(self.__items)
 
     @property
     def pending_delete(self) -> List[Recording]:
-        return [item for item in self.__items.values() if item.pending_delete]
+        return [self.__items[i] for i in self.__pending_delete]
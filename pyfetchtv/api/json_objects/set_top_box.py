@@ -2,7 +2,7 @@ from enum import Enum
 from typing import Dict
 
 from pyfetchtv.api.json_objects.channel import Channel
-from pyfetchtv.api.json_objects.json_object import JsonObject, json_property
+from pyfetchtv.api.json_objects.json_object import JsonObject, json_property, update_objects
 from pyfetchtv.api.json_objects.recording import Recordings
 
 
@@ -76,16 +76,45 @@ class SetTopBox(JsonObject):
 
     def __init__(self, json):
         super().__init__(json)
-        hardware_json = self._get_json_path_value(json, '$.sysInfo.hardwareCapabilities')
-        hardware_json['hardwareName'] = self._get_json_path_value(json, '$.sysInfo.hardwareName')
-        hardware_json['hardwareType'] = self._get_json_path_value(json, '$.sysInfo.hardwareType')
-        self._hardware = Hardware(hardware_json)
+        self._hardware = Hardware(self.__hardware_json(json))
         self._storage = Storage(self._get_json_value(json, 'storageInfo'))
         self._state = State(self._get_json_value(json, 'state'))
         self._recordings = Recordings(self, json)
         channels = [Channel(channel) for channel in self._get_json_value(json, 'dvbChannels')]
         self._dvb_channels = {v.id: v for v in channels}
 
+    def __hardware_json(self, json: dict) -> dict:
+        hardware_json = dict(self._get_json_path_value(json, '$.sysInfo.hardwareCapabilities'))
+        hardware_json['hardwareName'] = self._get_json_path_value(json, '$.sysInfo.hardwareName')
+        hardware_json['hardwareType'] = self._get_json_path_value(json, '$.sysInfo.hardwareType')
+        return hardware_json
+
+    def update(self, json: dict) -> Dict[str, object]:
+        """
+        Update this box in place from its full state, e.g. a new I_AM_ALIVE, keeping the channel, recording and
+        series objects which still exist.
+        :return: What changed by part: property names for 'box', 'hardware', 'storage' and 'state', ids added,
+            removed and changed for 'channels', 'recordings', 'future', 'series' and 'active'. Empty if nothing changed
+        """
+        changes = {}
+        for name, obj, part_json in (('box', self, json),
+                                     ('hardware', self._hardware, self.__hardware_json(json)),
+                                     ('storage', self._storage, self._get_json_value(json, 'storageInfo')),
+                                     ('state', self._state, self._get_json_value(json, 'state'))):
+            changed = obj._update(part_json)
+            if changed:
+                changes[name] = changed
+        channels = update_objects(self._dvb_channels, self._get_json_value(json, 'dvbChannels'), 'id', Channel)
+        if channels:
+            changes['channels'] = channels
+        if {'terminal_id', 'dlna_url'} & set(changes.get('box', [])):
+            # Recordings hold the box's DLNA URL
+            self._recordings = Recordings(self, json)
+            changes['recordings'] = {'added': list(self._recordings.items.keys())}
+        else:
+            changes.update(self._recordings.update_from(json))
+        return changes
+
     @property
     def hardware(self) -> Hardware:
         return self._hardware
@@ -26,3 +26,10 @@ class Terminal(JsonObject):
     @json_property(name='activation_status')
     def activation_status(self):
         return ''
+
+    @property
+    def is_active(self) -> bool:
+        """
+        :return: False if the account reports the box inactive, e.g. deactivated, it is not expected to connect
+        """
+        return not self.status or self.status.upper() == 'ACTIVE'
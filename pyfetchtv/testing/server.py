@@ -0,0 +1,613 @@
+"""
+Local stand-in for the FetchTV service, for offline end-to-end and load tests.
+
+Implements the authenticate, EPG channels and programslist HTTP endpoints and the messages websocket, backed by
+synthetic data. The boxes' DLNA servers are served on the same port, with range requests. Run standalone with:
+    python -m pyfetchtv.testing.server [--port N] [--boxes N] [--channels N] [--rate N]
+"""
+import argparse
+import base64
+import copy
+import hashlib
+import json
+import logging
+import re
+import socket
+import struct
+import threading
+import uuid
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+from pyfetchtv.api.const.urls import PATH_AUTHENTICATE, PATH_CATALOGUE, PATH_EPG, PATH_EPG_CHANNELS
+from pyfetchtv.api.fetchtv_dlna import CONTENT_DIRECTORY_SERVICE
+from pyfetchtv.testing import synthetic
+from pyfetchtv.testing.synthetic import SyntheticConfig
+
+logger = logging.getLogger(__name__)
+
+PATH_MESSAGES = '/v2/message/ws/messages'
+# A box's DLNA media, followed by the recording's disk id
+PATH_DLNA = '/web/'
+PATH_CONTENT_DIRECTORY = '/ContentDirectory/control'
+# Each box's DLNA server is served under its terminal id, the first box's without one
+_DLNA_PATTERN = re.compile(r'^(?:/(?P<box>[^/]+))?(?P<path>/web/.*|/ContentDirectory/control)$')
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+_MEDIA_WRITE_BYTES = 64 * 1024
+# Reported by Browse for every container
+_CONTAINER_UPDATE_ID = 1
+
+_WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_OP_CONTINUATION = 0x0
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+class _WebSocket:
+    """
+    Minimal server side of an RFC 6455 websocket over an accepted connection.
+    """
+
+    def __init__(self, connection: socket.socket, reader):
+        self.__connection = connection
+        self.__reader = reader
+        self.__send_lock = threading.Lock()
+        self.closed = False
+
+    def __read_exact(self, size: int) -> bytes:
+        data = self.__reader.read(size)
+        if data is None or len(data) < size:
+            raise ConnectionError('Websocket closed')
+        return data
+
+    def receive(self) -> Optional[str]:
+        """
+        :return: The next text message, None once the connection closes
+        """
+        fragments = []
+        while not self.closed:
+            try:
+                header = self.__read_exact(2)
+                opcode = header[0] & 0x0F
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack('!H', self.__read_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', self.__read_exact(8))[0]
+                mask = self.__read_exact(4) if header[1] & 0x80 else None
+                payload = self.__read_exact(length)
+            except (ConnectionError, OSError):
+                self.closed = True
+                return None
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            if opcode == _OP_CLOSE:
+                self.close()
+                return None
+            if opcode == _OP_PING:
+                self.__send_frame(_OP_PONG, payload)
+                continue
+            if opcode in (_OP_TEXT, _OP_CONTINUATION):
+                fragments.append(payload)
+                if header[0] & 0x80:
+                    return b''.join(fragments).decode()
+        return None
+
+    def send(self, message: str):
+        self.__send_frame(_OP_TEXT, message.encode())
+
+    def __send_frame(self, opcode: int, payload: bytes):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        with self.__send_lock:
+            if self.closed and opcode != _OP_CLOSE:
+                return
+            try:
+                self.__connection.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def close(self):
+        if self.closed:
+            return
+        self.__send_frame(_OP_CLOSE, b'')
+        self.closed = True
+        try:
+            self.__connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _StandInBox:
+    """
+    Server side state of a synthetic FetchTV box, answering the commands sent to it.
+    """
+
+    def __init__(self, config: SyntheticConfig, terminal_id: str):
+        self.terminal_id = terminal_id
+        self.json = synthetic.synthetic_box_json(config, terminal_id)
+        self.recordings = {r['id']: r for r in self.json['recordings']}
+        self.max_delete_ids = config.max_delete_ids
+        self.channel_ids = [c['id'] for c in self.json['dvbChannels']]
+        self.future = {}  # type: Dict[str, dict]
+        self.next_recording_id = 100000
+        # The DLNA system update id, changed when the recordings listed change
+        self.dlna_update_id = 100
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> dict:
+        return self.json['state']
+
+    def handle(self, msg_type: str, message: dict) -> List[tuple]:
+        """
+        :return: The responses as (type, data) tuples
+        """
+        with self.lock:
+            handler = getattr(self, f'_on_{msg_type.lower()}', None)
+            return handler(message) if handler else []
+
+    def _on_ping(self, message: dict):
+        return [('PONG', {})]
+
+    def _on_are_you_alive(self, message: dict):
+        return [('I_AM_ALIVE', copy.deepcopy(self.json))]
+
+    def _on_media_state(self, message: dict):
+        return [('MEDIA_STATE', {'currentPlaybackMedia': dict(self.state)})]
+
+    def _on_future_recordings_list(self, message: dict):
+        return [('FUTURE_RECORDINGS_LIST', list(self.future.values()))]
+
+    def _on_play_channel(self, message: dict):
+        self.state.update({'channelId': str(message.get('channelId')), 'playBackState': 'PLAYING'})
+        return [('NOW_PLAYING', {'currentPlaybackMedia': dict(self.state)})]
+
+    def _on_record_program(self, message: dict):
+        self.next_recording_id += 1
+        recording = synthetic.recording_json(self.next_recording_id)
+        recording.update({'programId': message.get('programId'), 'channelId': str(message.get('channelId'))})
+        self.future[str(message.get('programId'))] = recording
+        return [('RECORDINGS_UPDATE', {'activeRecordings': [], 'recordingUpdates': [
+            {'eventName': 'RECORD_PROGRAM_SUCCESS', 'recording': recording}]})]
+
+    def _on_record_program_cancel(self, message: dict):
+        recording = self.future.pop(str(message.get('programId')), None)
+        if not recording:
+            return [('COMMAND_ERROR', {'reason': 'Unknown program'})]
+        return [('RECORDINGS_UPDATE', {'activeRecordings': [], 'recordingUpdates': [
+            {'eventName': 'RECORD_PROGRAM_CANCEL', 'recording': recording}]})]
+
+    def _on_enable_series_tag(self, message: dict):
+        series = synthetic.series_json(message.get('seriesLink'))
+        self.json['seriesTagList'].append(series)
+        return [('RECORDINGS_UPDATE', {'recordingUpdates': [{'eventName': 'SERIES_TAG_SET', 'seriesTag': series}]})]
+
+    def _on_disable_series_tag(self, message: dict):
+        series_link = message.get('seriesLinkId')
+        self.json['seriesTagList'] = [s for s in self.json['seriesTagList'] if s['id'] != series_link]
+        return [('RECORDINGS_UPDATE', {'recordingUpdates': [
+            {'eventName': 'SERIES_TAG_CANCELLED', 'seriesTag': {'id': series_link}}]})]
+
+    def _on_pending_delete_recordings_by_id(self, message: dict):
+        ids = set(message.get('recordingIds') or [])
+        if len(ids) > self.max_delete_ids:
+            return [('COMMAND_ERROR', {'reason': 'Too many recordings'})]
+        for recording_id in ids:
+            recording = self.recordings.get(recording_id)
+            if recording:
+                recording['pendingDelete'] = True
+                self.dlna_update_id += 1
+        return [('PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS', {'recordingsIds': sorted(ids)})]
+
+    def next_media_state(self, count: int) -> tuple:
+        # Unsolicited channel change, used to generate load
+        with self.lock:
+            self.state.update({'channelId': self.channel_ids[count % len(self.channel_ids)],
+                               'playBackState': 'PLAYING'})
+            return 'MEDIA_STATE', {'currentPlaybackMedia': dict(self.state)}
+
+
+class FetchTvStandIn:
+    """
+    Serves synthetic FetchTV data over HTTP and a websocket on one local port.
+    Pass `fetchtv_options` to FetchTV, or FetchTvManager, to connect to it.
+    """
+
+    def __init__(self, config: SyntheticConfig = None, host: str = '127.0.0.1', port: int = 0):
+        self.__config = config if config else SyntheticConfig()
+        self.__token = uuid.uuid4().hex
+        self.__boxes = {t: _StandInBox(self.__config, t) for t in self.__config.terminal_ids}
+        self.__sockets = []  # type: List[_WebSocket]
+        # Websockets whose messages are read but not answered
+        self.__silent = set()  # type: Set[_WebSocket]
+        # Websocket messages received by type
+        self.__received = {}  # type: Dict[str, int]
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__stats = {'http_requests': 0, 'epg_requests': 0, 'epg_channels_requested': 0, 'connections': 0,
+                        'messages_received': 0, 'messages_sent': 0, 'dlna_requests': 0, 'dlna_bytes': 0,
+                        'dlna_max_concurrent': 0, 'dlna_soap_requests': 0}
+        self.__dlna_active = 0
+        self.__epg_channels = json.dumps(synthetic.epg_channels_json(self.__config))
+        # (status, delay) by path and method, None lets a request through
+        self.__faults = {}  # type: Dict[tuple, List[Optional[tuple]]]
+        self.__server = ThreadingHTTPServer((host, port), self.__handler_class())
+        self.__server.daemon_threads = True
+        self.__thread = None  # type: Optional[Thread]
+        for terminal_id, box in self.__boxes.items():
+            box.json['sysInfo']['dlnaURL'] = f'{self.api_url}/{terminal_id}{PATH_DLNA}'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def config(self) -> SyntheticConfig:
+        return self.__config
+
+    @property
+    def api_url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def messages_url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'ws://{host}:{port}{PATH_MESSAGES}'
+
+    @property
+    def fetchtv_options(self) -> dict:
+        return {'api_url': self.api_url, 'messages_url': self.messages_url}
+
+    @property
+    def stats(self) -> dict:
+        with self.__lock:
+            return dict(self.__stats, open_connections=len([s for s in self.__sockets if not s.closed]))
+
+    def __count(self, key: str, value: int = 1):
+        with self.__lock:
+            self.__stats[key] += value
+
+    def start(self):
+        self.__thread = Thread(target=self.__server.serve_forever, name='FetchTvStandIn', daemon=True)
+        self.__thread.start()
+        logger.info(f'FetchTvStandIn --> Serving on {self.api_url}')
+
+    def close(self):
+        self.__stop_event.set()
+        with self.__lock:
+            sockets = list(self.__sockets)
+        for ws in sockets:
+            ws.close()
+        if self.__thread:
+            self.__server.shutdown()
+        self.__server.server_close()
+
+    def drop_connections(self):
+        """
+        Close every websocket, e.g. to test reconnects.
+        """
+        with self.__lock:
+            sockets, self.__sockets = self.__sockets, []
+        for ws in sockets:
+            ws.close()
+
+    def silence(self):
+        """
+        Stop answering on the open websockets, as a connection lost without being closed would.
+        Connections made afterwards are answered.
+        """
+        with self.__lock:
+            self.__silent.update(self.__sockets)
+
+    def received(self, msg_type: str) -> int:
+        """
+        :return: The number of websocket messages of a type received
+        """
+        with self.__lock:
+            return self.__received.get(msg_type, 0)
+
+    def add_fault(self, path: str, status: int = 503, delay_sec: float = 0, count: int = 1, method: str = None,
+                  after: int = 0):
+        """
+        Fail the next requests to a path, e.g. to test retries and timeouts.
+        :param path: The request path, e.g. PATH_EPG
+        :param status: The status returned, or 0 to respond normally after the delay
+        :param delay_sec: Seconds to wait before responding
+        :param count: The number of requests to fail
+        :param method: Only fail requests with this method, e.g. 'GET'
+        :param after: The number of requests to respond to normally first
+        """
+        with self.__lock:
+            self.__faults.setdefault((path, method), []).extend([None] * after + [(status, delay_sec)] * count)
+
+    def __next_fault(self, path: str, method: str) -> Optional[tuple]:
+        with self.__lock:
+            for key in ((path, method), (path, None)):
+                faults = self.__faults.get(key)
+                if faults:
+                    return faults.pop(0)
+            return None
+
+    def __handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                logger.debug(f'FetchTvStandIn --> {format % args}')
+
+            def do_POST(self):
+                stand_in._handle_http(self, 'POST')
+
+            def do_HEAD(self):
+                stand_in._handle_http(self, 'HEAD')
+
+            def do_GET(self):
+                if self.headers.get('Upgrade', '').lower() == 'websocket':
+                    stand_in._handle_websocket(self)
+                else:
+                    stand_in._handle_http(self, 'GET')
+
+        return Handler
+
+    def __authorised(self, request: BaseHTTPRequestHandler) -> bool:
+        return f'auth={self.__token}' in (request.headers.get('Cookie') or '')
+
+    def _handle_http(self, request: BaseHTTPRequestHandler, method: str):
+        self.__count('http_requests')
+        url = urlparse(request.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length).decode() if length else ''
+        headers = {}
+        fault = self.__next_fault(url.path, method)
+        if fault:
+            status, delay_sec = fault
+            if delay_sec and self.__stop_event.wait(delay_sec):
+                return
+            if status:
+                return self.__respond(request, status, self.__error('UNAVAILABLE', 'Injected fault'))
+        dlna = _DLNA_PATTERN.match(url.path)
+        box = self.__boxes.get(dlna.group('box')) if dlna and dlna.group('box') else \
+            next(iter(self.__boxes.values()), None)
+        if dlna and box and method in ('GET', 'HEAD') and dlna.group('path').startswith(PATH_DLNA):
+            return self.__respond_media(request, method, dlna.group('path')[len(PATH_DLNA):])
+        if dlna and box and method == 'POST' and dlna.group('path') == PATH_CONTENT_DIRECTORY:
+            return self.__respond_content_directory(request, box, body)
+        if method == 'POST' and url.path == PATH_AUTHENTICATE:
+            form = {k: v[0] for k, v in parse_qs(body).items()}
+            if form.get('activation_code') != self.__config.activation_code or form.get('pin') != self.__config.pin:
+                return self.__respond(request, 401, self.__error('INVALID_CREDENTIALS', 'Invalid code or PIN'))
+            headers['Set-Cookie'] = f'auth={self.__token}; Path=/'
+            return self.__respond(request, 200, synthetic.account_json(self.__config), headers)
+        if method == 'GET' and url.path == PATH_EPG_CHANNELS:
+            return self.__respond(request, 200, self.__epg_channels)
+        if method == 'GET' and url.path == PATH_EPG:
+            if not self.__authorised(request):
+                return self.__respond(request, 401, self.__error('UNAUTHORISED', 'Login required'))
+            channel_ids = query['channel_ids'].split(',') if query.get('channel_ids') else None
+            self.__count('epg_requests')
+            self.__count('epg_channels_requested', len(channel_ids) if channel_ids else self.__config.channels)
+            return self.__respond(request, 200, synthetic.programs_json(self.__config, channel_ids))
+        if method == 'GET' and url.path == PATH_CATALOGUE:
+            if not self.__authorised(request):
+                return self.__respond(request, 401, self.__error('UNAUTHORISED', 'Login required'))
+            if 'tab' not in query:
+                return self.__respond(request, 200, synthetic.catalogue_tabs_json(self.__config))
+            return self.__respond(request, 200, synthetic.catalogue_page_json(
+                self.__config, query['tab'], int(query.get('page', 0)), int(query.get('count', 50))))
+        self.__respond(request, 404, self.__error('NOT_FOUND', url.path))
+
+    def __respond_media(self, request: BaseHTTPRequestHandler, method: str, disk_id: str):
+        size = self.__config.recording_bytes
+        if not disk_id.isdigit():
+            return self.__respond(request, 404, self.__error('NOT_FOUND', disk_id))
+        self.__count('dlna_requests')
+        start, end = 0, size
+        streamed = self.__config.streamed_media
+        match = None if streamed else _RANGE_PATTERN.match(request.headers.get('Range') or '')
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start >= end:
+                return self.__respond(request, 416, '', {'Content-Range': f'bytes */{size}'})
+        with self.__lock:
+            self.__dlna_active += 1
+            self.__stats['dlna_max_concurrent'] = max(self.__stats['dlna_max_concurrent'], self.__dlna_active)
+        try:
+            request.send_response(206 if match else 200)
+            request.send_header('Content-Type', 'video/mpeg')
+            if streamed:
+                # The body ends when the connection closes
+                request.send_header('Connection', 'close')
+                request.close_connection = True
+            else:
+                request.send_header('Accept-Ranges', 'bytes')
+                request.send_header('Content-Length', str(end - start))
+            if match:
+                request.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+            request.end_headers()
+            if method == 'HEAD':
+                return
+            # Written in blocks, as a box streams a recording
+            for position in range(start, end, _MEDIA_WRITE_BYTES):
+                if self.__stop_event.is_set():
+                    request.close_connection = True
+                    return
+                data = synthetic.media_bytes(int(disk_id), position, min(end, position + _MEDIA_WRITE_BYTES))
+                request.wfile.write(data)
+                self.__count('dlna_bytes', len(data))
+        except (BrokenPipeError, ConnectionResetError):
+            request.close_connection = True
+        finally:
+            with self.__lock:
+                self.__dlna_active -= 1
+
+    def __respond_content_directory(self, request: BaseHTTPRequestHandler, box: _StandInBox, body: str):
+        self.__count('dlna_soap_requests')
+        action = (request.headers.get('SOAPAction') or '').strip('"').rsplit('#', 1)[-1]
+        arguments = {}
+        for element in ElementTree.fromstring(body).iter():
+            arguments[element.tag.rsplit('}', 1)[-1]] = element.text or ''
+        with box.lock:
+            update_id = box.dlna_update_id
+            directory = synthetic.content_directory(box.json, self.__config.recording_bytes)
+        if action == 'GetSystemUpdateID':
+            values = {'Id': update_id}
+        elif action == 'Browse':
+            entries = directory.get(arguments.get('ObjectID'))
+            if entries is None:
+                return self.__respond(request, 500, '')
+            start = int(arguments.get('StartingIndex') or 0)
+            count = int(arguments.get('RequestedCount') or 0) or len(entries)
+            if start == 0 and self.__config.browse_first_page:
+                count = min(count, self.__config.browse_first_page)
+            page = entries[start:start + count]
+            # A container update id, as servers which track them report, not the system update id
+            values = {'Result': synthetic.didl_lite(page), 'NumberReturned': len(page), 'TotalMatches': len(entries),
+                      'UpdateID': _CONTAINER_UPDATE_ID}
+        else:
+            return self.__respond(request, 500, '')
+        result = ''.join(f'<{k}>{escape(str(v))}</{k}>' for k, v in values.items())
+        self.__respond(request, 200, '<?xml version="1.0"?><s:Envelope '
+                                     'xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"><s:Body>'
+                                     f'<u:{action}Response xmlns:u="{CONTENT_DIRECTORY_SERVICE}">{result}'
+                                     f'</u:{action}Response></s:Body></s:Envelope>')
+
+    @staticmethod
+    def __error(error: str, message: str) -> dict:
+        return {'__meta__': synthetic.meta(error, message)}
+
+    @staticmethod
+    def __respond(request: BaseHTTPRequestHandler, status: int, body, headers: dict = None):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+        try:
+            request.send_response(status)
+            request.send_header('Content-Type', 'application/json')
+            request.send_header('Content-Length', str(len(data)))
+            for key, value in (headers or {}).items():
+                request.send_header(key, value)
+            request.end_headers()
+            request.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting, e.g. a read timeout
+            request.close_connection = True
+
+    def _handle_websocket(self, request: BaseHTTPRequestHandler):
+        if request.path.split('?')[0] != PATH_MESSAGES or not self.__authorised(request):
+            request.send_response(401)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        key = request.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        request.send_response(101, 'Switching Protocols')
+        request.send_header('Upgrade', 'websocket')
+        request.send_header('Connection', 'Upgrade')
+        request.send_header('Sec-WebSocket-Accept', accept)
+        request.end_headers()
+        request.wfile.flush()
+        request.close_connection = True
+
+        ws = _WebSocket(request.connection, request.rfile)
+        with self.__lock:
+            self.__sockets.append(ws)
+            self.__stats['connections'] += 1
+        self.__send(ws, 'server', None, {'frag': 'SUBSCRIPTIONS_INITIALISED'})
+        if self.__config.message_rate > 0:
+            Thread(target=self.__generate_load, args=(ws,), name='FetchTvStandIn-load', daemon=True).start()
+        try:
+            while True:
+                message = ws.receive()
+                if message is None:
+                    break
+                self.__count('messages_received')
+                self.__on_message(ws, message)
+        finally:
+            with self.__lock:
+                if ws in self.__sockets:
+                    self.__sockets.remove(ws)
+                self.__silent.discard(ws)
+
+    def __on_message(self, ws: _WebSocket, message: str):
+        try:
+            message = json.loads(message)
+            box = self.__boxes.get(message.get('to'))
+            msg_type = message['message']['type']
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f'FetchTvStandIn --> Invalid message: {message}')
+            return
+        with self.__lock:
+            self.__received[msg_type] = self.__received.get(msg_type, 0) + 1
+            silent = ws in self.__silent
+        if not box or silent:
+            return
+        body = dict(message['message'].get('data') or {}, **{k: v for k, v in message['message'].items()
+                                                             if k not in ('data', 'type')})
+        for response_type, data in box.handle(msg_type, body):
+            self.__send(ws, box.terminal_id, response_type, data)
+
+    def __send(self, ws: _WebSocket, sender: str, msg_type: Optional[str], data):
+        message = {'type': msg_type, 'data': data} if msg_type else data
+        ws.send(json.dumps({'sender': sender, 'message': message}))
+        self.__count('messages_sent')
+
+    def __generate_load(self, ws: _WebSocket):
+        interval = 1 / self.__config.message_rate
+        boxes = list(self.__boxes.values())
+        count = 0
+        while not ws.closed and not self.__stop_event.wait(interval):
+            box = boxes[count % len(boxes)]
+            msg_type, data = box.next_media_state(count)
+            self.__send(ws, box.terminal_id, msg_type, data)
+            count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local FetchTV stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--boxes', type=int, default=1)
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--days', type=int, default=2, help='Days of EPG')
+    parser.add_argument('--recordings', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=0.0, help='MEDIA_STATE messages per second per connection')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = SyntheticConfig(boxes=args.boxes, channels=args.channels, epg_days=args.days,
+                             recordings=args.recordings, message_rate=args.rate)
+    stand_in = FetchTvStandIn(config, args.host, args.port)
+    stand_in.start()
+    print(f'api_url={stand_in.api_url} messages_url={stand_in.messages_url} '
+          f'activation_code={config.activation_code} pin={config.pin}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in.close()
+
+
+if __name__ == '__main__':
+    main()
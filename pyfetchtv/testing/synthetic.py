@@ -0,0 +1,319 @@
+"""
+Synthetic FetchTV data for offline tests and load tests.
+"""
+import json
+from datetime import datetime
+from typing import Dict, List
+from xml.sax.saxutils import escape, quoteattr
+
+PROGRAM_FIELDS = ['program_id', 'title', 'start', 'end', 'synopsis_id', 'rating', 'warnings', 'flags', 'genre',
+                  'series_link', 'episode_title', 'series_no', 'episode_no', 'series_id', 'epg_program_id']
+
+
+def channel_json(channel_id: int) -> dict:
+    return {
+        'id': str(channel_id),
+        'epg_id': 1000 + channel_id,
+        'name': f'Channel {channel_id} HD',
+        'isRecordable': True,
+        'image': f'/images/{channel_id}.png',
+        'description': '',
+        'is_4k': False,
+        'isAudio': True,
+        'isVideo': True,
+        'high_definition': False
+    }
+
+
+def recording_json(recording_id: int, series_id: str = '', size: int = 1000, pending_delete: bool = False) -> dict:
+    return {
+        'id': recording_id,
+        'diskId': 5000 + recording_id,
+        'name': f'Recording {recording_id}',
+        'channelId': '1',
+        'programId': 9000 + recording_id,
+        'description': '',
+        'episodeTitle': '',
+        'seriesNumber': '',
+        'episodeNumber': '',
+        'programStartDate': 1000 * recording_id,
+        'programEndDate': 1000 * recording_id + 500,
+        'startDate': 1000 * recording_id,
+        'endDate': 1000 * recording_id + 500,
+        'creationDate': 1000 * recording_id,
+        'seriesLinkId': series_id,
+        'episodeId': 0,
+        'currentPosition': 0,
+        'viewCount': 0,
+        'lastViewed': 0,
+        'size': size,
+        'pendingDelete': pending_delete
+    }
+
+
+def series_json(series_id: str) -> dict:
+    return {
+        'id': series_id,
+        'name': f'Series {series_id}',
+        'channelId': '1',
+        'priority': 1,
+        'leadTime': 3,
+        'lagTime': 5,
+        'latestSeason': '',
+        'latestEpisode': '',
+        'modifiedDate': 0
+    }
+
+
+def box_json(terminal_id: str, channels: int = 3, recordings: List[dict] = None, series: List[dict] = None) -> dict:
+    return {
+        'sysInfo': {
+            'hardwareCapabilities': {'pvr': True, 'tuner': {'tunersAvailable': 4, 'maximumRecordingCount': 4}},
+            'hardwareName': 'Mighty',
+            'hardwareType': 'MIGHTY',
+            'label': f'Box {terminal_id}',
+            'terminalId': terminal_id,
+            'macAddress': '00:00:00:00:00:00',
+            'dlnaPort': '49152',
+            'dlnaURL': 'http://127.0.0.1:49152/web/',
+            'uptime': 0
+        },
+        'storageInfo': {'freeSize': 1000000, 'recordingsAllocation': 500000},
+        'state': {'playbackType': 'LIVE', 'channelId': '1', 'mediaTitle': 'News', 'playBackState': 'LIVE'},
+        'dvbChannels': [channel_json(i) for i in range(1, channels + 1)],
+        'seriesTagList': series or [],
+        'activeRecordings': [],
+        'currentFutureRecordings': [],
+        'recordings': recordings or [],
+        'ipAddress': '127.0.0.1',
+        'standby': False,
+        'idle': False
+    }
+
+
+def frame(terminal_id: str, msg_type: str, data: dict = None) -> str:
+    return json.dumps({'sender': terminal_id, 'message': {'type': msg_type, 'data': data or {}}})
+
+
+def media_state_frame(terminal_id: str, channel_id: str = '2', play_state: str = 'PLAYING') -> str:
+    return frame(terminal_id, 'MEDIA_STATE', {'currentPlaybackMedia': {
+        'playbackType': 'LIVE', 'channelId': channel_id, 'mediaTitle': 'Movie', 'playBackState': play_state}})
+
+
+def meta(error: str = None, message: str = '') -> dict:
+    return {'error': error, 'message': message}
+
+
+class SyntheticConfig:
+    """
+    The scale of a synthetic FetchTV account.
+    """
+
+    def __init__(self, boxes: int = 1, channels: int = 10, epg_days: int = 2, program_minutes: int = 30,
+                 recordings: int = 20, series: int = 2, message_rate: float = 0.0,
+                 activation_code: str = 'ACTIVATION', pin: str = '1234', catalogue_tabs: int = 2,
+                 catalogue_items: int = 120, recording_bytes: int = 256 * 1024, max_delete_ids: int = 100,
+                 streamed_media: bool = False, offline_boxes: int = 0, inactive_boxes: int = 0,
+                 browse_first_page: int = 0):
+        """
+        :param boxes: Number of FetchTV boxes on the account
+        :param channels: Channels on each box
+        :param epg_days: Days of programs in the EPG, starting today
+        :param program_minutes: Length of each program
+        :param recordings: Recordings on each box
+        :param series: Series tags on each box
+        :param message_rate: Unsolicited MEDIA_STATE messages sent per second on each connection, 0 for none
+        :param activation_code: Activation code accepted by the stand-in
+        :param pin: PIN accepted by the stand-in
+        :param catalogue_tabs: Tabs in the VOD catalogue
+        :param catalogue_items: Titles in each catalogue tab
+        :param recording_bytes: Size of each recording's media served over DLNA
+        :param max_delete_ids: Recordings accepted in one delete message, larger ones are refused
+        :param streamed_media: Serve media without a Content-Length or range requests, as some DLNA servers do
+        :param offline_boxes: Active boxes on the account which never respond, as when switched off
+        :param inactive_boxes: Deactivated boxes on the account, which never respond
+        :param browse_first_page: Children returned by the first DLNA Browse page of a container when fewer than
+            requested, as some servers do, 0 to return as many as requested
+        """
+        self.boxes = boxes
+        self.channels = channels
+        self.epg_days = epg_days
+        self.program_minutes = program_minutes
+        self.recordings = recordings
+        self.series = series
+        self.message_rate = message_rate
+        self.activation_code = activation_code
+        self.pin = pin
+        self.catalogue_tabs = catalogue_tabs
+        self.catalogue_items = catalogue_items
+        self.recording_bytes = recording_bytes
+        self.max_delete_ids = max_delete_ids
+        self.streamed_media = streamed_media
+        self.offline_boxes = offline_boxes
+        self.inactive_boxes = inactive_boxes
+        self.browse_first_page = browse_first_page
+
+    @property
+    def terminal_ids(self) -> List[str]:
+        return [f'box{i}' for i in range(1, self.boxes + 1)]
+
+
+def account_json(config: SyntheticConfig) -> dict:
+    terminals = [(t, 'ACTIVE', 'ACTIVATED') for t in config.terminal_ids]
+    terminals += [(f'offline{i}', 'ACTIVE', 'ACTIVATED') for i in range(1, config.offline_boxes + 1)]
+    terminals += [(f'inactive{i}', 'INACTIVE', 'DEACTIVATED') for i in range(1, config.inactive_boxes + 1)]
+    return {
+        'terminals': [{
+            'id': terminal_id,
+            'friendly_name': f'Box {terminal_id}',
+            'type': 'MIGHTY',
+            'pvr': True,
+            'status': status,
+            'activation_status': activation_status
+        } for terminal_id, status, activation_status in terminals],
+        '__meta__': meta()
+    }
+
+
+def synthetic_box_json(config: SyntheticConfig, terminal_id: str) -> dict:
+    series_ids = [f's{i}' for i in range(1, config.series + 1)]
+    recordings = [recording_json(i, series_id=series_ids[i % len(series_ids)] if series_ids else '')
+                  for i in range(1, config.recordings + 1)]
+    return box_json(terminal_id, config.channels, recordings, [series_json(s) for s in series_ids])
+
+
+def epg_channels_json(config: SyntheticConfig) -> dict:
+    channels = {}
+    for i in range(1, config.channels + 1):
+        channel = channel_json(i)
+        channels[str(channel['epg_id'])] = {
+            'epg_id': channel['epg_id'],
+            'regions': [1],
+            'name': channel['name'],
+            'description': '',
+            'flags': 0,
+            'image': channel['image'],
+            'high_definition': True
+        }
+    return {'channels': channels, 'region_details': {'1': ['NSW', 'Sydney']}, '__meta__': meta()}
+
+
+def programs_json(config: SyntheticConfig, channel_ids: List[str] = None) -> dict:
+    """
+    :param config: The account scale
+    :param channel_ids: EPG channel ids to include, all channels if None
+    :return: A programslist response covering epg_days from midnight today
+    """
+    start = int(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp() * 1000)
+    length = config.program_minutes * 60 * 1000
+    count = config.epg_days * 24 * 60 // config.program_minutes
+    all_ids = [str(channel_json(i)['epg_id']) for i in range(1, config.channels + 1)]
+    channels = {}  # type: Dict[str, list]
+    synopses = {}
+    for epg_id in all_ids:
+        if channel_ids is not None and epg_id not in channel_ids:
+            continue
+        programs = []
+        for n in range(count):
+            program_id = f'{epg_id}-{n}'
+            synopsis_id = int(epg_id) * 10000 + n
+            synopses[str(synopsis_id)] = f'Synopsis of program {program_id}'
+            series = f'series-{epg_id}-{n % 5}'
+            programs.append([program_id, f'Program {n % 50}', start + n * length, start + (n + 1) * length,
+                             synopsis_id, 'PG', '', 0, 'Drama', series, f'Episode {n}', str(n // 50 + 1),
+                             str(n % 50 + 1), series, f'epg-{program_id}'])
+        channels[epg_id] = programs
+    return {'channels': channels, 'synopses': synopses, '__meta__': dict(meta(), program_fields=PROGRAM_FIELDS)}
+
+
+def catalogue_tabs_json(config: SyntheticConfig) -> dict:
+    return {
+        'tabs': [{'id': f'tab{i}', 'name': f'Tab {i}', 'count': config.catalogue_items}
+                 for i in range(1, config.catalogue_tabs + 1)],
+        '__meta__': meta()
+    }
+
+
+def catalogue_page_json(config: SyntheticConfig, tab_id: str, page: int, count: int) -> dict:
+    """
+    :return: A page of a catalogue tab, pages are numbered from 0
+    """
+    first = page * count
+    items = [{
+        'id': f'{tab_id}-{n}',
+        'title': f'Title {n}',
+        'type': 'movie' if n % 3 else 'series',
+        'synopsis': f'Synopsis of title {n}',
+        'genres': ['Drama'],
+        'rating': 'M',
+        'year': 2000 + n % 20,
+        'duration': 5400,
+        'price': 4.99,
+        'image': f'/vod/{tab_id}/{n}.jpg',
+        'trailers': [{'url': f'/vod/{tab_id}/{n}/trailer.mp4'}]
+    } for n in range(first, min(first + count, config.catalogue_items))]
+    return {'items': items, 'page': page, 'pages': max(1, -(-config.catalogue_items // count)),
+            'total': config.catalogue_items, '__meta__': meta()}
+
+
+_MEDIA_PATTERN = bytes(range(256))
+
+
+def media_bytes(disk_id: int, start: int, end: int) -> bytes:
+    """
+    :return: Bytes start to end, exclusive, of a recording's synthetic media. Each byte depends on the disk id and
+        position, so misplaced chunks are detected
+    """
+    offset = (disk_id + start) % 256
+    repeats = (end - start) // 256 + 2
+    return (_MEDIA_PATTERN[offset:] + _MEDIA_PATTERN * repeats)[:end - start]
+
+
+def content_directory(box: dict, recording_bytes: int) -> Dict[str, List[dict]]:
+    """
+    The DLNA ContentDirectory of a box: a 'recordings' container under the root holding a container for each series
+    and the recordings not in a series. Recordings pending delete are not listed.
+    :param box: The box's full state
+    :param recording_bytes: The size of each recording
+    :return: The entries of each container by id, containers have 'child_count'
+    """
+    dlna_url = box['sysInfo']['dlnaURL']
+    recordings = [r for r in box['recordings'] if not r['pendingDelete']]
+    series_ids = sorted({r['seriesLinkId'] for r in recordings if r['seriesLinkId']})
+    directory = {'0': [], 'recordings': []}  # type: Dict[str, List[dict]]
+    for series_id in series_ids:
+        directory[f'recordings/{series_id}'] = []
+    for recording in recordings:
+        parent_id = f"recordings/{recording['seriesLinkId']}" if recording['seriesLinkId'] else 'recordings'
+        directory[parent_id].append({
+            'id': f"recording-{recording['id']}", 'parent_id': parent_id, 'title': recording['name'],
+            'date': datetime.fromtimestamp(recording['creationDate'] / 1000).strftime('%Y-%m-%dT%H:%M:%S'),
+            'url': f"{dlna_url}{recording['diskId']}", 'size': recording_bytes,
+            'duration_ms': recording['endDate'] - recording['startDate']})
+    directory['recordings'][:0] = [{'id': f'recordings/{s}', 'parent_id': 'recordings', 'title': f'Series {s}',
+                                    'child_count': len(directory[f'recordings/{s}'])} for s in series_ids]
+    directory['0'].append({'id': 'recordings', 'parent_id': '0', 'title': 'Recordings',
+                           'child_count': len(directory['recordings'])})
+    return directory
+
+
+def didl_lite(entries: List[dict]) -> str:
+    """
+    :return: The entries from content_directory() as a DIDL-Lite document
+    """
+    parts = ['<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" '
+             'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/">']
+    for entry in entries:
+        ids = f'id={quoteattr(entry["id"])} parentID={quoteattr(entry["parent_id"])} restricted="1"'
+        if 'child_count' in entry:
+            parts.append(f'<container {ids} childCount="{entry["child_count"]}"><dc:title>{escape(entry["title"])}'
+                         '</dc:title><upnp:class>object.container.storageFolder</upnp:class></container>')
+            continue
+        seconds = entry['duration_ms'] / 1000
+        duration = f'{int(seconds // 3600)}:{int(seconds % 3600 // 60):02}:{seconds % 60:06.3f}'
+        parts.append(f'<item {ids}><dc:title>{escape(entry["title"])}</dc:title><dc:date>{entry["date"]}</dc:date>'
+                     '<upnp:class>object.item.videoItem</upnp:class>'
+                     f'<res protocolInfo="http-get:*:video/mpeg:*" size="{entry["size"]}" duration="{duration}">'
+                     f'{escape(entry["url"])}</res></item>')
+    parts.append('</DIDL-Lite>')
+    return ''.join(parts)
@@ -1,19 +1,21 @@
 import os
 import pprint
 import sys
+import threading
 import time
 import logging
 from os.path import join, dirname
 
 from dotenv import load_dotenv
 
+from pyfetchtv.api.const.message_types import MessageType
 from pyfetchtv.api.const.remote_keys import RemoteKey
 from pyfetchtv.api.fetchtv import FetchTV
-from pyfetchtv.api.fetchtv_box_interface import RecordProgramParameters
+from pyfetchtv.api.fetchtv_box_interface import FetchTvBoxInterface, RecordProgramParameters
 from pyfetchtv.api.fetchtv_interface import SubscriberMessage
 from pyfetchtv.api.json_objects.set_top_box import PlayState
 
-CMD_DELAY = 5
+CMD_TIMEOUT = 10
 
 pp = pprint.PrettyPrinter(indent=2)
 
@@ -31,6 +33,19 @@ def callback(msg: SubscriberMessage):
     print('-->' + str(msg.message))
 
 
+def press_key(fetchtv: FetchTV, box: FetchTvBoxInterface, key: RemoteKey) -> bool:
+    # A key has no response of its own, and asking for the state straight away can be answered before the box acts
+    # on the key. Wait for the state message the box sends once it has.
+    changed = threading.Event()
+    fetchtv.add_subscriber('press_key', lambda msg: changed.set(), groups=[MessageType.STATE],
+                           terminal_ids=[box.terminal_id])
+    try:
+        box.send_key(key)
+        return changed.wait(CMD_TIMEOUT)
+    finally:
+        fetchtv.remove_subscriber('press_key')
+
+
 if __name__ == "__main__":
 
     fetchtv = FetchTV(ping_sec=60)
@@ -65,23 +80,19 @@ if __name__ == "__main__":
         box = fetchtv.get_box(terminal_id)
         if box.state.play_state == PlayState.IDLE:
             print(f'\n--> Turning {box.label} on.')
-            box.send_key(RemoteKey.Power)
-            time.sleep(CMD_DELAY)
+            press_key(fetchtv, box, RemoteKey.Power)
 
         # Pause
         print(f'\n--> Pause')
-        box.send_key(RemoteKey.PlayPause)
-        time.sleep(CMD_DELAY)
+        press_key(fetchtv, box, RemoteKey.PlayPause)
 
         # Play
         print(f'\n--> Play')
-        box.send_key(RemoteKey.PlayPause)
-        time.sleep(CMD_DELAY)
+        press_key(fetchtv, box, RemoteKey.PlayPause)
 
         # Stop (goes back to live TV)
         print(f'\n--> Stop')
-        box.send_key(RemoteKey.Stop)
-        time.sleep(CMD_DELAY)
+        press_key(fetchtv, box, RemoteKey.Stop)
 
         # Retrieve current program
         program = box.get_current_program()
@@ -97,8 +108,7 @@ if __name__ == "__main__":
         box.record_program(RecordProgramParameters(
             channel_id=box.state.channel_id,
             program_id=program.program_id,
-            epg_program_id=program.epg_program_id))
-        time.sleep(CMD_DELAY)
+            epg_program_id=program.epg_program_id)).result(CMD_TIMEOUT)
 
         # List recordings for today
         print(f'\n--> Recordings...')
@@ -106,8 +116,7 @@ if __name__ == "__main__":
 
         # Cancel recording
         print(f'\n--> Cancel recording')
-        box.cancel_recording(program.program_id)
-        time.sleep(CMD_DELAY)
+        box.cancel_recording(program.program_id).result(CMD_TIMEOUT)
 
         # List stored recording
         print(f'\n--> Stored recording')
@@ -118,8 +127,7 @@ if __name__ == "__main__":
         print(f'\n--> Delete recording')
         recording_ids = [rec.id for rec in box.recordings.items.values()
                          if rec.program_id == program.program_id and not rec.pending_delete]
-        box.delete_recordings(recording_ids)
-        time.sleep(CMD_DELAY)
+        box.delete_recordings(recording_ids).result(CMD_TIMEOUT)
 
     finally:
         fetchtv.close()
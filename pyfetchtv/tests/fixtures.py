@@ -0,0 +1,3 @@
+# The generators live with the stand-in server so load tests can use them without the test package
+from pyfetchtv.testing.synthetic import channel_json, recording_json, series_json, box_json, frame, \
+    media_state_frame  # noqa: F401
@@ -0,0 +1,25 @@
+import unittest
+
+from pyfetchtv.api.helpers.backoff import Backoff
+
+
+class TestBackoff(unittest.TestCase):
+
+    def test_exponential_with_jitter(self):
+        backoff = Backoff(initial_sec=1, maximum_sec=10, multiplier=2, jitter=0.5)
+        for expected in [1, 2, 4, 8, 10, 10]:
+            delay = backoff.next()
+            self.assertLessEqual(delay, expected)
+            self.assertGreaterEqual(delay, expected * 0.5)
+        self.assertEqual(6, backoff.attempt)
+
+    def test_reset(self):
+        backoff = Backoff(initial_sec=1, jitter=0)
+        backoff.next()
+        backoff.next()
+        backoff.reset()
+        self.assertEqual(1, backoff.next())
+
+
+if __name__ == '__main__':
+    unittest.main()
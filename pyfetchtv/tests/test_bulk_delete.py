@@ -0,0 +1,113 @@
+import unittest
+from concurrent.futures import Future
+
+from pyfetchtv.api.const.message_types import MessageTypeOut
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.helpers.bulk_delete import BulkDelete, delete_in_batches
+from pyfetchtv.api.helpers.correlation import CommandFailedError
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.testing.synthetic import SyntheticConfig
+from pyfetchtv.tests.test_stand_in import TIMEOUT, wait_for
+
+
+class _Box:
+    """
+    Records each batch sent, the test decides how and when it is answered.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.pending = []
+
+    def send(self, recording_ids):
+        future = Future()
+        self.sent.append(list(recording_ids))
+        self.pending.append((list(recording_ids), future))
+        return future
+
+    def confirm(self, drop=()):
+        recording_ids, future = self.pending.pop(0)
+        future.set_result({'data': {'recordingsIds': [i for i in recording_ids if i not in drop]}})
+
+    def fail(self):
+        self.pending.pop(0)[1].set_exception(CommandFailedError(
+            MessageTypeOut.PENDING_DELETE_RECORDINGS_BY_ID, {'type': 'COMMAND_ERROR'}))
+
+
+class TestBulkDelete(unittest.TestCase):
+
+    def test_batches_within_window(self):
+        box = _Box()
+        result = delete_in_batches(box.send, range(10), batch_size=3, in_flight=2)
+        self.assertEqual([[0, 1, 2], [3, 4, 5]], box.sent)
+        box.confirm()
+        self.assertEqual([6, 7, 8], box.sent[-1])
+        while box.pending:
+            self.assertLessEqual(len(box.pending), 2)
+            box.confirm()
+        outcome = result.result(TIMEOUT)
+        self.assertTrue(outcome.ok)
+        self.assertEqual(set(range(10)), outcome.confirmed)
+        self.assertEqual(4, outcome.batches)
+
+    def test_retries_unconfirmed(self):
+        box = _Box()
+        result = delete_in_batches(box.send, [1, 2, 3, 1], batch_size=3, in_flight=1, retries=1)
+        box.confirm(drop={2})
+        self.assertEqual([2], box.sent[-1])
+        box.confirm()
+        outcome = result.result(TIMEOUT)
+        self.assertEqual({1, 2, 3}, outcome.confirmed)
+        self.assertEqual(1, outcome.retried)
+        self.assertEqual([1, 2, 3], outcome.requested)
+
+    def test_failed_after_retries(self):
+        box = _Box()
+        result = delete_in_batches(box.send, [1, 2], batch_size=2, retries=1)
+        box.fail()
+        box.fail()
+        outcome = result.result(TIMEOUT)
+        self.assertFalse(outcome.ok)
+        self.assertEqual({1, 2}, set(outcome.failed))
+        self.assertIn('CommandFailedError', outcome.failed[1])
+
+    def test_already_done_futures(self):
+        def send(recording_ids):
+            future = Future()
+            future.set_result({'data': {'recordingsIds': recording_ids}})
+            return future
+        outcome = delete_in_batches(send, range(5000), batch_size=1).result(TIMEOUT)
+        self.assertEqual(5000, len(outcome.confirmed))
+
+    def test_not_sent(self):
+        outcome = delete_in_batches(lambda ids: None, [1], retries=0).result(TIMEOUT)
+        self.assertIn(1, outcome.failed)
+
+    def test_empty(self):
+        self.assertEqual(0, delete_in_batches(_Box().send, []).result(TIMEOUT).batches)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            BulkDelete(_Box().send, [1], batch_size=0)
+
+
+class TestBulkDeleteStandIn(unittest.TestCase):
+
+    def test_large_purge(self):
+        config = SyntheticConfig(boxes=1, channels=2, recordings=300, max_delete_ids=40)
+        with FetchTvStandIn(config) as stand_in:
+            fetchtv = FetchTV(**stand_in.fetchtv_options)
+            try:
+                self.assertTrue(fetchtv.login(config.activation_code, config.pin))
+                box = fetchtv.boxes_ready.result(TIMEOUT)['box1']
+                recording_ids = list(box.recordings.items.keys())
+                # Too many for one message
+                with self.assertRaises(CommandFailedError):
+                    box.delete_recordings(recording_ids).result(TIMEOUT)
+                outcome = box.delete_recordings_bulk(recording_ids, batch_size=40, in_flight=3).result(TIMEOUT)
+                self.assertTrue(outcome.ok, outcome.failed)
+                self.assertEqual(set(recording_ids), outcome.confirmed)
+                self.assertEqual(8, outcome.batches)
+                self.assertTrue(wait_for(lambda: all(r.pending_delete for r in box.recordings.items.values())))
+            finally:
+                fetchtv.close()
@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_catalogue import FetchTvCatalogue
+from pyfetchtv.api.helpers.ttl_cache import TtlCache
+from pyfetchtv.testing import synthetic
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.testing.synthetic import SyntheticConfig
+
+
+class TestTtlCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TtlCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(1, cache.metrics['evictions'])
+
+    def test_expiry(self):
+        cache = TtlCache(ttl_sec=0.05)
+        cache.put('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+
+class TestCatalogue(unittest.TestCase):
+    """
+    Reads synthetic catalogue pages from a request function, counting the requests.
+    """
+
+    def setUp(self) -> None:
+        self.config = SyntheticConfig(catalogue_items=95)
+        self.requested = []
+        self.lock = threading.Lock()
+        self.fail_page = None
+
+    def request(self, action: str, url: str, params: dict):
+        with self.lock:
+            self.requested.append(params.get('page'))
+        if 'tab' not in params:
+            return synthetic.catalogue_tabs_json(self.config)
+        if params['page'] == self.fail_page:
+            return None
+        return synthetic.catalogue_page_json(self.config, params['tab'], params['page'], params['count'])
+
+    def test_pages(self):
+        catalogue = FetchTvCatalogue(self.request, '', page_size=10, prefetch_pages=3)
+        try:
+            items = list(catalogue.items('tab1'))
+            self.assertEqual(95, len(items))
+            self.assertEqual('tab1-94', items[-1].id)
+            self.assertEqual(2005, items[5].year)
+            # Each page is requested once, prefetched pages are used rather than requested again
+            self.assertEqual(list(range(10)), sorted(self.requested))
+        finally:
+            catalogue.close()
+
+    def test_prefetches_while_consuming(self):
+        catalogue = FetchTvCatalogue(self.request, '', page_size=10, prefetch_pages=2)
+        try:
+            pages = catalogue.pages('tab1')
+            first = next(pages)
+            self.assertEqual(0, first.page)
+            deadline = time.monotonic() + 5
+            while len(self.requested) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual([0, 1, 2], sorted(self.requested))
+            pages.close()
+        finally:
+            catalogue.close()
+
+    def test_cached(self):
+        catalogue = FetchTvCatalogue(self.request, '', page_size=50, prefetch_pages=0)
+        self.assertEqual(2, len(catalogue.tabs()))
+        self.assertEqual(95, len(list(catalogue.items('tab1'))))
+        self.assertEqual(95, len(list(catalogue.items('tab1'))))
+        self.assertEqual(2, len(catalogue.tabs()))
+        self.assertEqual([None, 0, 1], self.requested)
+        catalogue.clear()
+        catalogue.get_page('tab1', 1)
+        self.assertEqual([None, 0, 1, 1], self.requested)
+
+    def test_stops_on_failure(self):
+        self.fail_page = 2
+        catalogue = FetchTvCatalogue(self.request, '', page_size=10, prefetch_pages=0)
+        self.assertEqual([0, 1], [page.page for page in catalogue.pages('tab1')])
+        # Failures are not cached
+        self.fail_page = None
+        self.assertEqual(10, len(list(catalogue.pages('tab1'))))
+
+    def test_stand_in(self):
+        config = SyntheticConfig(catalogue_items=120)
+        with FetchTvStandIn(config) as stand_in:
+            with FetchTV(**stand_in.fetchtv_options) as fetchtv:
+                self.assertEqual([], fetchtv.catalogue.tabs())
+                self.assertTrue(fetchtv.login(config.activation_code, config.pin))
+                self.assertEqual(['tab1', 'tab2'], [tab.id for tab in fetchtv.catalogue.tabs()])
+                titles = [item.title for item in fetchtv.catalogue.items('tab2')]
+                self.assertEqual(120, len(titles))
+                self.assertEqual('Title 119', titles[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
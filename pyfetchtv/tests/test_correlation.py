@@ -0,0 +1,59 @@
+import time
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageTypeOut
+from pyfetchtv.api.helpers.correlation import ResponseCorrelator, CommandFailedError, recording_update_matcher
+
+
+def _recording_update(program_id: int) -> dict:
+    return {'type': 'RECORDINGS_UPDATE',
+            'data': {'recordingUpdates': [{'eventName': 'RECORD_PROGRAM_SUCCESS',
+                                           'recording': {'id': 1, 'programId': program_id}}]}}
+
+
+class TestResponseCorrelator(unittest.TestCase):
+
+    def test_resolves_by_type(self):
+        correlator = ResponseCorrelator()
+        ping = correlator.register('box1', 'box1_1', MessageTypeOut.PING)
+        state = correlator.register('box1', 'box1_2', MessageTypeOut.MEDIA_STATE)
+        self.assertEqual(0, correlator.resolve('box2', 'PONG', {}))
+        self.assertEqual(1, correlator.resolve('box1', 'PONG', {'type': 'PONG'}))
+        self.assertEqual({'type': 'PONG'}, ping.result(0))
+        self.assertFalse(state.done())
+
+    def test_shared_response_completes_all_waiting(self):
+        correlator = ResponseCorrelator()
+        futures = [correlator.register('box1', f'box1_{i}', MessageTypeOut.MEDIA_STATE) for i in range(3)]
+        self.assertEqual(3, correlator.resolve('box1', 'MEDIA_STATE', {'type': 'MEDIA_STATE'}))
+        self.assertTrue(all(f.done() for f in futures))
+
+    def test_resolves_by_message_id(self):
+        correlator = ResponseCorrelator()
+        first = correlator.register('box1', 'box1_1', MessageTypeOut.RECORD_PROGRAM)
+        second = correlator.register('box1', 'box1_2', MessageTypeOut.RECORD_PROGRAM)
+        correlator.resolve('box1', 'RECORDINGS_UPDATE', {'data': {'messageId': 'box1_2'}})
+        self.assertFalse(first.done())
+        self.assertTrue(second.done())
+
+    def test_matcher_and_failure(self):
+        correlator = ResponseCorrelator()
+        first = correlator.register('box1', 'box1_1', MessageTypeOut.RECORD_PROGRAM, recording_update_matcher('10'))
+        second = correlator.register('box1', 'box1_2', MessageTypeOut.RECORD_PROGRAM, recording_update_matcher('20'))
+        correlator.resolve('box1', 'RECORDINGS_UPDATE', _recording_update(20))
+        self.assertFalse(first.done())
+        self.assertTrue(second.done())
+        correlator.resolve('box1', 'RECORD_PROGRAM_FAILURE', {'type': 'RECORD_PROGRAM_FAILURE'})
+        self.assertRaises(CommandFailedError, first.result, 0)
+
+    def test_timeout(self):
+        correlator = ResponseCorrelator(timeout_sec=0.05)
+        future = correlator.register('box1', 'box1_1', MessageTypeOut.PING)
+        time.sleep(0.1)
+        correlator.expire()
+        self.assertRaises(TimeoutError, future.result, 0)
+        self.assertEqual(0, correlator.pending_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.const.overflow_policy import OverflowPolicy
+from pyfetchtv.api.fetchtv_interface import SubscriberMessage
+from pyfetchtv.api.helpers.dispatcher import SubscriberDispatcher
+
+
+def _message(terminal_id: str, seq: int, command=MessageTypeIn.PAUSED) -> SubscriberMessage:
+    return SubscriberMessage(time=seq, message={'seq': seq}, msg_group=MessageType.STATE, msg_command=command,
+                             terminal_id=terminal_id)
+
+
+class TestSubscriberDispatcher(unittest.TestCase):
+
+    def test_per_terminal_ordering(self):
+        received = {}
+        lock = threading.Lock()
+
+        def deliver(msg: SubscriberMessage):
+            with lock:
+                received.setdefault(msg.terminal_id, []).append(msg.message['seq'])
+
+        dispatcher = SubscriberDispatcher('test', deliver, workers=3)
+        for seq in range(200):
+            for terminal_id in ['box1', 'box2', 'box3', 'box4']:
+                dispatcher.publish(_message(terminal_id, seq))
+        dispatcher.close()
+
+        self.assertEqual(4, len(received))
+        for values in received.values():
+            self.assertEqual(list(range(200)), values)
+        self.assertEqual(800, dispatcher.metrics['delivered'])
+
+    def test_no_thread_per_message(self):
+        before = threading.active_count()
+        dispatcher = SubscriberDispatcher('test', lambda msg: None, workers=2)
+        for seq in range(500):
+            dispatcher.publish(_message('box1', seq))
+        self.assertLessEqual(threading.active_count(), before + 2)
+        dispatcher.close()
+
+    def test_drop_oldest(self):
+        gate = threading.Event()
+        received = []
+
+        def deliver(msg: SubscriberMessage):
+            gate.wait()
+            received.append(msg.message['seq'])
+
+        dispatcher = SubscriberDispatcher('test', deliver, workers=1, queue_size=5,
+                                          overflow_policy=OverflowPolicy.DROP_OLDEST)
+        dispatcher.publish(_message('box1', 0))
+        time.sleep(0.1)  # worker now holds message 0
+        for seq in range(1, 11):
+            dispatcher.publish(_message('box1', seq))
+        self.assertEqual(5, dispatcher.metrics['total_depth'])
+        gate.set()
+        dispatcher.close()
+        self.assertEqual([0, 6, 7, 8, 9, 10], received)
+        self.assertEqual(5, dispatcher.metrics['dropped'])
+
+    def test_coalesce(self):
+        gate = threading.Event()
+        received = []
+
+        def deliver(msg: SubscriberMessage):
+            gate.wait()
+            received.append((msg.command, msg.message['seq']))
+
+        dispatcher = SubscriberDispatcher('test', deliver, workers=1, queue_size=2,
+                                          overflow_policy=OverflowPolicy.COALESCE)
+        dispatcher.publish(_message('box1', 0))
+        time.sleep(0.1)
+        dispatcher.publish(_message('box1', 1, MessageTypeIn.PAUSED))
+        dispatcher.publish(_message('box1', 2, MessageTypeIn.MEDIA_STATE))
+        dispatcher.publish(_message('box1', 3, MessageTypeIn.PAUSED))
+        gate.set()
+        dispatcher.close()
+        self.assertEqual([(MessageTypeIn.PAUSED, 0), (MessageTypeIn.MEDIA_STATE, 2), (MessageTypeIn.PAUSED, 3)],
+                         received)
+        self.assertEqual(1, dispatcher.metrics['coalesced'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_dlna import DlnaContentDirectory, DlnaContainer, DlnaItem, parse_didl
+from pyfetchtv.api.json_objects.set_top_box import SetTopBox
+from pyfetchtv.testing import synthetic
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.testing.synthetic import SyntheticConfig
+from pyfetchtv.tests.test_stand_in import TIMEOUT
+
+
+class TestDlnaContentDirectory(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.stand_in = FetchTvStandIn(SyntheticConfig(boxes=2, recordings=25, series=2, recording_bytes=1000))
+        self.stand_in.start()
+        self.box = self.__box_state('box2')
+        self.directory = DlnaContentDirectory(self.box.dlna_url, page_size=4)
+
+    def tearDown(self) -> None:
+        self.directory.close()
+        self.stand_in.close()
+
+    def __box_state(self, terminal_id: str) -> SetTopBox:
+        # The box's full state, as sent in I_AM_ALIVE
+        box_json = synthetic.synthetic_box_json(self.stand_in.config, terminal_id)
+        box_json['sysInfo']['dlnaURL'] = f'{self.stand_in.api_url}/{terminal_id}/web/'
+        return SetTopBox(box_json)
+
+    def test_parse_didl(self):
+        box_json = synthetic.box_json('box1', recordings=[synthetic.recording_json(1, 's1')])
+        directory = synthetic.content_directory(box_json, 1000)
+        entries = list(parse_didl(synthetic.didl_lite(directory['recordings'] + directory['recordings/s1'])))
+        self.assertIsInstance(entries[0], DlnaContainer)
+        self.assertEqual(('recordings/s1', 'Series s1', 1), (entries[0].id, entries[0].title, entries[0].child_count))
+        item = entries[1]
+        self.assertIsInstance(item, DlnaItem)
+        self.assertEqual(('Recording 1', 1000, 5001, '0:00:00.500'), (item.title, item.size, item.disk_id,
+                                                                      item.duration))
+
+    def test_browse_and_reconcile(self):
+        items = self.directory.items()
+        self.assertEqual(25, len(items))
+        self.assertEqual(len({i.id for i in items}), len(items))
+        # The update id, root, recordings, the series of 12 and 13 recordings paged by four, then the update id again
+        stats = self.stand_in.stats
+        self.assertEqual(1 + 1 + 1 + 3 + 4 + 1, stats['dlna_soap_requests'])
+
+        result = self.directory.reconcile(self.box.recordings)
+        self.assertEqual(sorted(self.box.recordings.items), sorted(result.matched))
+        recording, item = result.matched[3]
+        self.assertEqual(recording.dlna_url, item.url)
+        self.assertEqual([], result.missing)
+        self.assertEqual([], result.unmatched)
+        # Unchanged, only the update id is requested
+        self.assertEqual(stats['dlna_soap_requests'] + 1, self.stand_in.stats['dlna_soap_requests'])
+
+    def test_short_first_page(self):
+        # The first page of each container returns 3 of the 4 asked for, the rest are read 3 at a time, no overlap
+        self.stand_in.close()
+        self.stand_in = FetchTvStandIn(SyntheticConfig(boxes=2, recordings=25, series=2, recording_bytes=1000,
+                                                       browse_first_page=3))
+        self.stand_in.start()
+        self.directory.close()
+        self.directory = DlnaContentDirectory(self.__box_state('box2').dlna_url, page_size=4)
+        items = self.directory.items()
+        self.assertEqual(25, len(items))
+        self.assertEqual(len({i.id for i in items}), len(items))
+
+    def test_changed_library_is_browsed_again(self):
+        self.directory.items()
+        update_id = self.directory.system_update_id()
+        fetchtv = FetchTV(**self.stand_in.fetchtv_options)
+        try:
+            self.assertTrue(fetchtv.login(self.stand_in.config.activation_code, self.stand_in.config.pin))
+            fetchtv.boxes_ready.result(TIMEOUT)['box2'].delete_recordings([4, 5]).result(TIMEOUT)
+        finally:
+            fetchtv.close()
+        result = self.directory.reconcile(self.box.recordings)
+        self.assertGreater(result.update_id, update_id)
+        self.assertEqual([4, 5], sorted(r.id for r in result.missing))
+        self.assertEqual(23, len(result.matched))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+import unittest
+
+from pyfetchtv.api.fetchtv_downloads import RecordingDownloader, DownloadError, PART_SUFFIX, STATE_SUFFIX
+from pyfetchtv.api.helpers.metrics import MetricsRegistry
+from pyfetchtv.api.json_objects.set_top_box import SetTopBox
+from pyfetchtv.testing import synthetic
+from pyfetchtv.testing.server import FetchTvStandIn, PATH_DLNA
+from pyfetchtv.testing.synthetic import SyntheticConfig
+from pyfetchtv.tests.test_stand_in import TIMEOUT, wait_for
+
+SIZE = 300000
+CHUNK = 64 * 1024
+
+
+class TestRecordingDownloader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.start_stand_in(SyntheticConfig(recording_bytes=SIZE))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def start_stand_in(self, config: SyntheticConfig):
+        self.stand_in = FetchTvStandIn(config)
+        self.stand_in.start()
+        box_json = synthetic.box_json('box1', recordings=[synthetic.recording_json(i) for i in range(1, 4)])
+        box_json['sysInfo']['dlnaURL'] = self.stand_in.api_url + PATH_DLNA
+        self.recordings = list(SetTopBox(box_json).recordings.items.values())
+
+    def tearDown(self) -> None:
+        self.stand_in.close()
+        self.directory.cleanup()
+
+    def assertMedia(self, recording, path: str):
+        with open(path, 'rb') as file:
+            self.assertEqual(synthetic.media_bytes(recording.disk_id, 0, SIZE), file.read())
+
+    def test_parallel_chunks(self):
+        metrics = MetricsRegistry()
+        with RecordingDownloader(workers=8, connections_per_box=3, chunk_bytes=CHUNK, metrics=metrics) as downloader:
+            futures = downloader.download_all(self.recordings, self.directory.name)
+            results = {i: f.result(TIMEOUT) for i, f in futures.items()}
+            self.assertEqual({'active': 0, 'completed': 3, 'failed': 0, 'bytes': 3 * SIZE},
+                             {k: v for k, v in downloader.metrics.items() if k != 'bytes_per_sec'})
+            self.assertGreater(downloader.throughput, 0)
+        for recording in self.recordings:
+            result = results[recording.id]
+            self.assertEqual((SIZE, SIZE, 0, 5), (result.size, result.downloaded, result.resumed, result.chunks))
+            self.assertGreater(result.throughput, 0)
+            self.assertMedia(recording, result.path)
+        self.assertEqual(['box1-1.ts', 'box1-2.ts', 'box1-3.ts'], sorted(os.listdir(self.directory.name)))
+        # A HEAD and a request per chunk, never more than the box's limit at once
+        stats = self.stand_in.stats
+        self.assertEqual(3 * 6, stats['dlna_requests'])
+        self.assertLessEqual(stats['dlna_max_concurrent'], 3)
+        self.assertEqual(3 * SIZE, metrics.get('dlna_download_bytes').value('box1'))
+
+    def test_busy_box_does_not_hold_up_others(self):
+        self.stand_in.close()
+        self.stand_in = FetchTvStandIn(SyntheticConfig(boxes=2, recording_bytes=SIZE))
+        self.stand_in.start()
+        recordings = {}
+        for terminal_id in ['box1', 'box2']:
+            box_json = synthetic.box_json(terminal_id, recordings=[synthetic.recording_json(1)])
+            box_json['sysInfo']['dlnaURL'] = f'{self.stand_in.api_url}/{terminal_id}{PATH_DLNA}'
+            recordings[terminal_id] = SetTopBox(box_json).recordings.get(1)
+        # Each of box1's ten chunks is slow, and box1 allows one connection at a time
+        self.stand_in.add_fault(f'/box1{PATH_DLNA}{recordings["box1"].disk_id}', status=0, delay_sec=0.2, count=20,
+                                method='GET')
+        with RecordingDownloader(workers=2, connections_per_box=1, chunk_bytes=CHUNK // 2) as downloader:
+            slow = downloader.download(recordings['box1'], os.path.join(self.directory.name, 'box1.ts'))
+            # Once its chunks are waiting
+            self.assertTrue(wait_for(lambda: self.stand_in.stats['dlna_requests'] >= 2))
+            start = time.monotonic()
+            downloader.download(recordings['box2'], os.path.join(self.directory.name, 'box2.ts')).result(TIMEOUT)
+            # box2 doesn't wait behind box1's chunks
+            self.assertLess(time.monotonic() - start, 1.0)
+            self.assertFalse(slow.done())
+            self.assertEqual(SIZE, slow.result(TIMEOUT).size)
+        self.assertLessEqual(self.stand_in.stats['dlna_max_concurrent'], 2)
+
+    def test_unknown_size(self):
+        self.stand_in.close()
+        self.start_stand_in(SyntheticConfig(recording_bytes=SIZE, streamed_media=True))
+        recording = self.recordings[0]
+        path = os.path.join(self.directory.name, 'recording.ts')
+        with RecordingDownloader(chunk_bytes=CHUNK) as downloader:
+            result = downloader.download(recording, path).result(TIMEOUT)
+        # Read in one response to its end
+        self.assertEqual((SIZE, SIZE, 1), (result.size, result.downloaded, result.chunks))
+        self.assertMedia(recording, path)
+        self.assertEqual(2, self.stand_in.stats['dlna_requests'])
+
+    def test_resumes(self):
+        recording = self.recordings[0]
+        path = os.path.join(self.directory.name, 'recording.ts')
+        # The second chunk fails, the chunks after it are not started
+        self.stand_in.add_fault(PATH_DLNA + str(recording.disk_id), status=404, method='GET', after=1)
+        with RecordingDownloader(workers=1, chunk_bytes=CHUNK) as downloader:
+            with self.assertRaises(DownloadError):
+                downloader.download(recording, path).result(TIMEOUT)
+            self.assertTrue(os.path.exists(path + PART_SUFFIX))
+            self.assertTrue(os.path.exists(path + STATE_SUFFIX))
+            self.assertEqual(1, downloader.metrics['failed'])
+
+            result = downloader.download(recording, path).result(TIMEOUT)
+        self.assertEqual((CHUNK, SIZE - CHUNK), (result.resumed, result.downloaded))
+        self.assertMedia(recording, path)
+        self.assertFalse(os.path.exists(path + PART_SUFFIX))
+        self.assertFalse(os.path.exists(path + STATE_SUFFIX))
+
+    def test_retries_chunk(self):
+        recording = self.recordings[0]
+        path = os.path.join(self.directory.name, 'recording.ts')
+        self.stand_in.add_fault(PATH_DLNA + str(recording.disk_id), status=503, method='GET', count=2)
+        with RecordingDownloader(chunk_bytes=CHUNK, retries=2) as downloader:
+            result = downloader.download(recording, path).result(TIMEOUT)
+        self.assertEqual(SIZE, result.downloaded)
+        self.assertMedia(recording, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
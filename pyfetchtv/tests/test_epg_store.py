@@ -0,0 +1,135 @@
+import threading
+import time
+import unittest
+from typing import List
+
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_manager import FetchTvManager
+from pyfetchtv.api.helpers.epg_store import EpgStore
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.testing.synthetic import PROGRAM_FIELDS, SyntheticConfig, programs_json
+from pyfetchtv.tests.test_stand_in import TIMEOUT, wait_for
+
+
+class TestEpgStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = EpgStore()
+        self.config = SyntheticConfig(channels=5, epg_days=1, program_minutes=120)
+        self.fetches = []  # type: List[List[str]]
+
+    def fetch(self, channel_ids: List[str]):
+        self.fetches.append(channel_ids)
+        return programs_json(self.config, channel_ids)
+
+    def test_same_channels_share_one_copy(self):
+        first = self.store.get('a', ['1001', '1002'], 'b1', self.fetch, 3600)
+        second = self.store.get('b', ['1002', '1001'], 'b1', self.fetch, 3600)
+        self.assertIs(first['channels']['1001'], second['channels']['1001'])
+        self.assertEqual([['1001', '1002']], self.fetches)
+        self.assertEqual(2, len(self.store))
+
+    def test_only_missing_channels_fetched(self):
+        self.store.get('a', ['1001', '1002'], 'b1', self.fetch, 3600)
+        epg = self.store.get('a', ['1001', '1002', '1003'], 'b1', self.fetch, 3600)
+        self.assertEqual([['1001', '1002'], ['1003']], self.fetches)
+        self.assertEqual(['1001', '1002', '1003'], sorted(epg['channels']))
+        self.assertEqual(36, len(epg['synopses']))
+        self.assertEqual(PROGRAM_FIELDS, epg['__meta__']['program_fields'])
+        # Another account with a subset of the channels needs nothing new
+        self.store.get('b', ['1003'], 'b1', self.fetch, 3600)
+        self.assertEqual(2, len(self.fetches))
+
+    def test_concurrent_requests_share_one_fetch(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch(channel_ids):
+            started.set()
+            release.wait(5)
+            return self.fetch(channel_ids)
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.store.get('a', ['1001'], 'b1', slow_fetch, 3600)))
+        thread.start()
+        started.wait(5)
+        waiter = threading.Thread(target=lambda: results.append(self.store.get('b', ['1001'], 'b1', self.fetch, 3600)))
+        waiter.start()
+        release.set()
+        thread.join(5)
+        waiter.join(5)
+        self.assertEqual(1, len(self.fetches))
+        self.assertEqual(2, len([r for r in results if '1001' in r['channels']]))
+
+    def test_released_when_unused(self):
+        self.store.get('a', ['1001'], 'b1', self.fetch, 3600)
+        self.store.get('b', ['1001'], 'b1', self.fetch, 3600)
+        # Moving to a new block releases the old one once nobody uses it
+        self.store.get('a', ['1001'], 'b2', self.fetch, 3600)
+        self.assertEqual(2, len(self.store))
+        self.store.release('b')
+        self.assertEqual(1, len(self.store))
+        self.store.release('a')
+        self.assertEqual(0, len(self.store))
+
+    def test_refetch_when_stale_keeps_copy_on_failure(self):
+        first = self.store.get('a', ['1001'], 'b1', self.fetch, 3600)
+        result = self.store.get('a', ['1001'], 'b1', lambda ids: None, 0)
+        self.assertIs(first['channels']['1001'], result['channels']['1001'])
+        self.assertEqual(2, self.store.requests)
+        self.assertIsNone(self.store.get('a', ['1002'], 'b1', lambda ids: None, 3600))
+
+    def test_channels_fetched_once(self):
+        self.assertEqual({'result': 'epg'}, self.store.channels(lambda: {'result': 'epg'}))
+        self.store.channels(lambda: self.fail('fetched again'))
+
+
+class TestFetchTvManager(unittest.TestCase):
+
+    def test_accounts_share_resources(self):
+        with FetchTvManager(ping_sec=30) as manager:
+            first = manager.create_account('first')
+            second = manager.create_account('second', history_size=5)
+            self.assertEqual(['first', 'second'], sorted(manager.accounts))
+            self.assertIs(first, manager.get_account('first'))
+            self.assertIs(manager.scheduler, first._FetchTV__scheduler)
+            self.assertIs(manager.epg_store, second._FetchTV__epg_store)
+            manager.remove_account('first')
+            self.assertIsNone(manager.get_account('first'))
+            self.assertIs(second, manager.get_account('second'))
+        self.assertTrue(manager.scheduler.is_closed)
+        self.assertEqual({}, manager.accounts)
+
+    def test_empty_shared_resources_are_used(self):
+        # An empty Scheduler or EpgStore has a length of 0, it must still be shared rather than replaced
+        with FetchTvManager() as manager:
+            self.assertEqual(0, len(manager.epg_store))
+            first = manager.create_account('first')
+            second = manager.create_account('second')
+            self.assertIs(first._FetchTV__scheduler, second._FetchTV__scheduler)
+            self.assertIs(first._FetchTV__epg_store, second._FetchTV__epg_store)
+        store = EpgStore()
+        with FetchTV(epg_store=store) as fetchtv:
+            self.assertIs(store, fetchtv._FetchTV__epg_store)
+
+
+class TestEpgRefresh(unittest.TestCase):
+
+    def test_boxes_reporting_together_share_one_request(self):
+        config = SyntheticConfig(boxes=3, channels=5)
+        with FetchTvStandIn(config) as stand_in:
+            with FetchTV(**stand_in.fetchtv_options) as fetchtv:
+                self.assertTrue(fetchtv.login(config.activation_code, config.pin))
+                fetchtv.boxes_ready.result(TIMEOUT)
+                self.assertEqual(5, len(fetchtv.epg_ready.result(TIMEOUT)['channels']))
+                self.assertEqual(1, stand_in.stats['epg_requests'])
+                # Boxes reporting again after a reconnect don't refetch the EPG
+                stand_in.drop_connections()
+                self.assertTrue(wait_for(lambda: stand_in.stats['connections'] == 2))
+                self.assertTrue(wait_for(lambda: fetchtv.is_connected and len(fetchtv.get_boxes()) == 3))
+                time.sleep(1)
+                self.assertEqual(1, stand_in.stats['epg_requests'])
+
+
+if __name__ == '__main__':
+    unittest.main()
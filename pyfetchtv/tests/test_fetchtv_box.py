@@ -0,0 +1,250 @@
+import json
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.fetchtv_box import FetchTvBox
+from pyfetchtv.api.helpers import json_patch
+from pyfetchtv.api.json_objects.recording import Recording
+from pyfetchtv.api.json_objects.set_top_box import PlayState
+from pyfetchtv.tests import fixtures
+
+
+class _MessageHandler:
+    """
+    Stands in for FetchTvMessageHandler, the box only needs to know if payloads are wanted.
+    """
+
+    def __init__(self, wanted=True):
+        self.wanted = wanted
+
+    def wants_message(self, group, command, terminal_id):
+        return self.wanted
+
+
+def _message(frame: str) -> dict:
+    return json.loads(frame)
+
+
+class TestFetchTvBox(unittest.TestCase):
+
+    def setUp(self) -> None:
+        recordings = [fixtures.recording_json(i, series_id='s1' if i % 2 else '') for i in range(1, 7)]
+        self.box = FetchTvBox(_MessageHandler(), fixtures.box_json('box1', recordings=recordings,
+                                                                   series=[fixtures.series_json('s1')]))
+
+    def test_media_state(self):
+        msg = self.box.process_message(_message(fixtures.media_state_frame('box1', '2', 'PAUSED')))
+        self.assertEqual(MessageType.STATE, msg.group)
+        self.assertEqual(MessageTypeIn.MEDIA_STATE, msg.command)
+        self.assertEqual('2', msg.message['channel_id'])
+        self.assertEqual(PlayState.PAUSED, self.box.state.play_state)
+
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'UNPAUSED')))
+        self.assertEqual(MessageTypeIn.PLAYING, msg.command)
+        self.assertEqual(PlayState.PLAYING, self.box.state.play_state)
+
+    def test_unknown_message_skipped(self):
+        self.assertIsNone(self.box.process_message(_message(fixtures.frame('box1', 'NOT_A_MESSAGE'))))
+
+    def test_payload_only_built_when_wanted(self):
+        box = FetchTvBox(_MessageHandler(wanted=False), fixtures.box_json('box1'))
+        msg = box.process_message(_message(fixtures.media_state_frame('box1', '3')))
+        self.assertEqual({}, msg.message)
+        self.assertEqual('3', box.state.channel_id)
+
+    def test_series_tags(self):
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'RECORDINGS_UPDATE', {
+            'recordingUpdates': [{'eventName': 'SERIES_TAG_SET', 'seriesTag': fixtures.series_json('s2')}]})))
+        self.assertEqual(MessageTypeIn.SERIES_ADDED, msg.command)
+        self.assertEqual(['s1', 's2'], [s.series_link for s in self.box.recordings.series])
+
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'RECORDINGS_UPDATE', {
+            'recordingUpdates': [{'eventName': 'SERIES_TAG_CANCELLED', 'seriesTag': {'id': 's1'}}]})))
+        self.assertEqual(MessageTypeIn.SERIES_CANCELLED, msg.command)
+        self.assertEqual('s1', msg.message['id'])
+        self.assertEqual(['s2'], [s.series_link for s in self.box.recordings.series])
+
+    def test_recording_lifecycle(self):
+        recording = fixtures.recording_json(10)
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'RECORDINGS_UPDATE', {
+            'activeRecordings': [],
+            'recordingUpdates': [{'eventName': 'RECORD_PROGRAM_SUCCESS', 'recording': recording}]})))
+        self.assertEqual(MessageTypeIn.RECORD_PROGRAM_SUCCESS, msg.command)
+        self.assertIn(10, self.box.recordings.future)
+
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'RECORDINGS_UPDATE', {
+            'activeRecordings': [],
+            'recordingUpdates': [{'eventName': 'RECORD_PROGRAM_CANCEL', 'recording': recording}]})))
+        self.assertEqual(MessageTypeIn.RECORD_PROGRAM_CANCEL, msg.command)
+        self.assertNotIn(10, self.box.recordings.future)
+        self.assertIn(10, self.box.recordings.items)
+
+    def test_pending_delete(self):
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS', {
+            'recordingsIds': [2, 4]})))
+        self.assertEqual(MessageTypeIn.RECORDINGS_DELETE, msg.command)
+        self.assertEqual([2, 4], sorted(rec['id'] for rec in msg.message))
+        self.assertEqual([2, 4], sorted(rec.id for rec in self.box.recordings.pending_delete))
+        self.assertTrue(self.box.recordings.get(2).pending_delete)
+
+    def test_recording_indexes(self):
+        recordings = self.box.recordings
+        self.assertEqual([1, 3, 5], sorted(rec.id for rec in recordings.for_series('s1')))
+        self.assertEqual('s1', recordings.get_series('s1').id)
+
+        # Replacing a recording moves it between series
+        recordings.update(Recording(self.box, fixtures.recording_json(3, series_id='s2', pending_delete=True)))
+        self.assertEqual([1, 5], sorted(rec.id for rec in recordings.for_series('s1')))
+        self.assertEqual([3], [rec.id for rec in recordings.for_series('s2')])
+        self.assertEqual([3], [rec.id for rec in recordings.pending_delete])
+
+        recordings.remove(3)
+        self.assertEqual([], recordings.for_series('s2'))
+        self.assertEqual([], recordings.pending_delete)
+        self.assertIsNone(recordings.get(3))
+
+    def test_recording_delete(self):
+        recording = self.box.recordings.get(2)
+        recording.delete()
+        self.assertTrue(recording.pending_delete)
+        self.assertEqual([2], [rec.id for rec in self.box.recordings.pending_delete])
+
+    def test_items_read_only(self):
+        with self.assertRaises(TypeError):
+            self.box.recordings.items[99] = self.box.recordings.get(1)
+        # Changes to the series or active recordings fail rather than being lost
+        with self.assertRaises(AttributeError):
+            self.box.recordings.series.append(self.box.recordings.series[0])
+        with self.assertRaises(TypeError):
+            del self.box.recordings.series[0]
+        with self.assertRaises(AttributeError):
+            self.box.recordings.active.append(1)
+
+
+class TestBoxUpdate(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.recordings = [fixtures.recording_json(i, series_id='s1' if i % 2 else '') for i in range(1, 5)]
+        self.json = fixtures.box_json('box1', recordings=self.recordings, series=[fixtures.series_json('s1')])
+        self.box = FetchTvBox(_MessageHandler(), self.json)
+
+    def alive(self, json: dict):
+        return self.box.process_message({'sender': 'box1', 'message': {'type': 'I_AM_ALIVE', 'data': json}})
+
+    def test_unchanged_keeps_objects(self):
+        channel = self.box.dvb_channels['1']
+        recording = self.box.recordings.get(1)
+        self.assertEqual({}, self.box.update(json.loads(json.dumps(self.json))))
+        self.assertIsNone(self.alive(self.json))
+        self.assertIs(channel, self.box.dvb_channels['1'])
+        self.assertIs(recording, self.box.recordings.get(1))
+
+    def test_reports_what_changed(self):
+        changed = json.loads(json.dumps(self.json))
+        changed['storageInfo']['freeSize'] = 10
+        changed['dvbChannels'] = changed['dvbChannels'][:2] + [fixtures.channel_json(9)]
+        changed['dvbChannels'][0]['name'] = 'Renamed'
+        changed['recordings'][0]['seriesLinkId'] = 's2'
+        changed['recordings'][1]['pendingDelete'] = True
+        del changed['recordings'][2]
+        changed['recordings'].append(fixtures.recording_json(10))
+        changed['activeRecordings'] = [10]
+        changed['standby'] = True
+        recording = self.box.recordings.get(1)
+
+        changes = self.box.update(changed)
+        self.assertEqual(['is_in_standby'], changes['box'])
+        self.assertEqual(['free_space'], changes['storage'])
+        self.assertEqual({'added': ['9'], 'removed': ['3'], 'changed': ['1']}, changes['channels'])
+        self.assertEqual({'added': [10], 'removed': [3], 'changed': [1, 2]}, changes['recordings'])
+        self.assertEqual({'added': [10], 'removed': []}, changes['active'])
+        self.assertNotIn('hardware', changes)
+        self.assertNotIn('series', changes)
+
+        self.assertIs(recording, self.box.recordings.get(1))
+        self.assertEqual('Renamed', self.box.dvb_channels['1'].name)
+        self.assertEqual([1], [r.id for r in self.box.recordings.for_series('s2')])
+        self.assertEqual([], [r.id for r in self.box.recordings.for_series('s1')])
+        self.assertEqual([2], [r.id for r in self.box.recordings.pending_delete])
+        self.assertTrue(self.box.recordings.is_active(10))
+
+    def test_change_event(self):
+        self.assertEqual(MessageTypeIn.BOX_FOUND, self.box.process_message(
+            {'sender': 'box1', 'message': {'type': 'I_AM_ALIVE', 'data': self.json}}).command)
+        changed = json.loads(json.dumps(self.json))
+        changed['state']['channelId'] = '2'
+        self.box.update(changed)
+        msg = self.alive(changed)
+        self.assertEqual(MessageType.BOX, msg.group)
+        self.assertEqual(MessageTypeIn.BOX_CHANGED, msg.command)
+        self.assertEqual({'state': ['channel_id']}, msg.message)
+
+
+class TestBoxSnapshot(unittest.TestCase):
+
+    def setUp(self) -> None:
+        recordings = [fixtures.recording_json(i) for i in range(1, 4)]
+        self.json = fixtures.box_json('box1', recordings=recordings, series=[fixtures.series_json('s1')])
+        self.box = FetchTvBox(_MessageHandler(), self.json, snapshot_diffs=True)
+
+    def test_patches_follow_messages(self):
+        held = self.box.snapshot()
+        self.assertEqual(1, held['version'])
+        self.assertEqual(['1', '2', '3'], sorted(held['data']['recordings']))
+
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'I_AM_ALIVE', self.json)))
+        self.assertEqual(MessageTypeIn.BOX_FOUND, msg.command)
+        self.assertEqual(0, msg.message['base_version'])
+        self.assertEqual(held['data'], json_patch.apply({}, msg.message['patch']))
+
+        msg = self.box.process_message(_message(fixtures.media_state_frame('box1', '2', 'PAUSED')))
+        self.assertEqual(MessageTypeIn.MEDIA_STATE, msg.command)
+        self.assertEqual({'version': 2, 'base_version': 1, 'patch': [
+            {'op': 'replace', 'path': '/state/channel_id', 'value': '2'},
+            {'op': 'replace', 'path': '/state/media_title', 'value': 'Movie'},
+            {'op': 'replace', 'path': '/state/play_state', 'value': 'PAUSED'}]}, msg.message)
+        # Nothing changed, nothing published
+        self.assertIsNone(self.box.process_message(_message(fixtures.media_state_frame('box1', '2', 'PAUSED'))))
+
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS', {
+            'recordingsIds': [2]})))
+        self.assertEqual(['/recordings/2/pending_delete'], [op['path'] for op in msg.message['patch']])
+
+        changed = json.loads(json.dumps(self.json))
+        del changed['recordings'][0]
+        self.box.update(changed)
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'I_AM_ALIVE', changed)))
+        self.assertEqual(MessageTypeIn.BOX_CHANGED, msg.command)
+        self.assertIn({'op': 'remove', 'path': '/recordings/1'}, msg.message['patch'])
+
+        # A consumer holding the first version catches up from the patches
+        change = self.box.patches_since(held['version'])
+        self.assertEqual(self.box.snapshot()['data'], json_patch.apply(held['data'], change['patch']))
+
+    def test_full_payloads_by_default(self):
+        box = FetchTvBox(_MessageHandler(), self.json)
+        msg = box.process_message(_message(fixtures.media_state_frame('box1', '2')))
+        self.assertEqual('2', msg.message['channel_id'])
+        # Started by the first call, from the current state
+        held = box.snapshot()
+        self.assertEqual(1, held['version'])
+        self.assertEqual('2', held['data']['state']['channel_id'])
+        box.process_message(_message(fixtures.media_state_frame('box1', '3')))
+        self.assertEqual([{'op': 'replace', 'path': '/state/channel_id', 'value': '3'}],
+                         box.patches_since(held['version'])['patch'])
+
+    def test_future_recordings_by_id(self):
+        future = [fixtures.recording_json(i) for i in (10, 11)]
+        self.box.process_message(_message(fixtures.frame('box1', 'FUTURE_RECORDINGS_LIST', future)))
+        kept = self.box.recordings.future[11]
+        future[1]['name'] = 'Renamed'
+        msg = self.box.process_message(_message(fixtures.frame('box1', 'FUTURE_RECORDINGS_LIST', future[1:])))
+        self.assertEqual([{'op': 'remove', 'path': '/future/10'},
+                          {'op': 'replace', 'path': '/future/11/name', 'value': 'Renamed'}],
+                         sorted(msg.message['patch'], key=lambda op: op['path']))
+        self.assertNotIn(10, self.box.recordings.future)
+        self.assertIs(kept, self.box.recordings.future.get(11))
+
+
+if __name__ == '__main__':
+    unittest.main()
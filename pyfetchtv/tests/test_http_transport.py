@@ -0,0 +1,108 @@
+import threading
+import unittest
+
+import requests
+
+from pyfetchtv.api.const.urls import PATH_EPG, PATH_EPG_CHANNELS
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.helpers.backoff import Backoff
+from pyfetchtv.api.helpers.http_transport import HttpTransport
+from pyfetchtv.api.helpers.metrics import MetricsRegistry
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.testing.synthetic import SyntheticConfig
+from pyfetchtv.tests.test_stand_in import wait_for
+
+
+class TestHttpTransport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.config = SyntheticConfig(boxes=1, channels=3)
+        self.stand_in = FetchTvStandIn(self.config)
+        self.stand_in.start()
+        self.url = self.stand_in.api_url + PATH_EPG_CHANNELS
+        self.transport = HttpTransport(read_timeout_sec=0.5, retries=2,
+                                       backoff=Backoff(initial_sec=0.01, maximum_sec=0.01))
+
+    def tearDown(self) -> None:
+        self.transport.close()
+        self.stand_in.close()
+
+    def test_retries_server_errors(self):
+        self.stand_in.add_fault(PATH_EPG_CHANNELS, status=503, count=2)
+        self.assertEqual(200, self.transport.get(self.url).status_code)
+        self.assertEqual(2, self.transport.metrics['retries'])
+        self.assertEqual(3, self.stand_in.stats['http_requests'])
+
+    def test_gives_up_after_retries(self):
+        self.stand_in.add_fault(PATH_EPG_CHANNELS, status=500, count=3)
+        self.assertEqual(500, self.transport.get(self.url).status_code)
+        self.assertEqual(200, self.transport.get(self.url).status_code)
+
+    def test_not_found_is_not_retried(self):
+        self.assertEqual(404, self.transport.get(self.stand_in.api_url + '/missing').status_code)
+        self.assertEqual(0, self.transport.metrics['retries'])
+
+    def test_read_timeout(self):
+        self.stand_in.add_fault(PATH_EPG_CHANNELS, status=0, delay_sec=2, count=3)
+        with self.assertRaises(requests.Timeout):
+            self.transport.get(self.url)
+        self.assertEqual(1, self.transport.metrics['failures'])
+
+    def test_connection_reuse(self):
+        for _ in range(5):
+            self.transport.get(self.url)
+        metrics = self.transport.metrics
+        self.assertEqual(1, metrics['connections_opened'])
+        self.assertEqual(4, metrics['connections_reused'])
+
+    def test_close_interrupts_backoff(self):
+        transport = HttpTransport(retries=5, backoff=Backoff(initial_sec=30, maximum_sec=30, jitter=0))
+        self.stand_in.add_fault(PATH_EPG_CHANNELS, status=503)
+        errors = []
+
+        def get():
+            try:
+                transport.get(self.url)
+            except requests.ConnectionError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=get)
+        thread.start()
+        self.assertTrue(wait_for(lambda: transport.metrics['retries'] == 1))
+        transport.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(errors))
+
+
+class TestFetchTvTransport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.config = SyntheticConfig(boxes=1, channels=3)
+        self.stand_in = FetchTvStandIn(self.config)
+        self.stand_in.start()
+
+    def tearDown(self) -> None:
+        self.stand_in.close()
+
+    def test_epg_fetch_times_out(self):
+        metrics = MetricsRegistry()
+        with FetchTV(read_timeout_sec=0.3, http_retries=0, metrics=metrics,
+                     **self.stand_in.fetchtv_options) as fetchtv:
+            self.stand_in.add_fault(PATH_EPG, status=0, delay_sec=2)
+            self.assertTrue(fetchtv.login(self.config.activation_code, self.config.pin))
+            # The first fetch times out instead of hanging, the box is still set up
+            self.assertTrue(wait_for(lambda: fetchtv.http_metrics['failures'] == 1))
+            self.assertTrue(wait_for(lambda: fetchtv.get_box('box1') is not None))
+            self.assertEqual(1, metrics.get('http_requests').value('update epg', 'error'))
+
+    def test_epg_fetch_retried(self):
+        with FetchTV(http_retries=2, **self.stand_in.fetchtv_options) as fetchtv:
+            self.stand_in.add_fault(PATH_EPG, status=502)
+            self.assertTrue(fetchtv.login(self.config.activation_code, self.config.pin))
+            self.assertTrue(wait_for(lambda: 'channels' in fetchtv.epg))
+            self.assertEqual(1, fetchtv.http_metrics['retries'])
+
+
+if __name__ == '__main__':
+    unittest.main()
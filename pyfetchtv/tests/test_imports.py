@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from pyfetchtv.api.helpers import json_utils
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+
+class TestImports(unittest.TestCase):
+
+    def test_heavy_dependencies_are_lazy(self):
+        script = ('import sys, pyfetchtv.api.fetchtv, pyfetchtv.api.fetchtv_manager; '
+                  'print(*[m for m in ("fuzzy_match", "jsonpath_ng", "websocket", "requests", "http.server") '
+                  'if m in sys.modules])')
+        output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        self.assertEqual('', output.strip())
+
+    def test_simple_paths_match_jsonpath(self):
+        data = {'sysInfo': {'terminalId': 'box1', 'label': None}, 'freeSize': 0, 'tuner': [1]}
+        paths = ['$.sysInfo.terminalId', '$.sysInfo.label', '$.freeSize', '$.sysInfo.missing', '$.tuner.count',
+                 '$.missing.value']
+        for path in paths:
+            expected = next(iter(json_utils._parse(path).find(data)), None)
+            expected = expected.value if expected else 'default'
+            self.assertEqual(expected, json_utils.json_get_path_value(data, path, 'default'), path)
+        # Other paths still use jsonpath
+        self.assertEqual('box1', json_utils.json_get_path_value({'a': [{'b': 'box1'}]}, '$.a[0].b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import time
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_interface import SubscriberMessage
+from pyfetchtv.api.helpers.journal import MessageJournal
+from pyfetchtv.tests import fixtures
+
+
+class TestMessageJournal(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_rotates_segments(self):
+        journal = MessageJournal(self.directory.name, segment_bytes=200, max_segments=3)
+        for i in range(20):
+            journal.append('sub', {'seq': i, 'padding': 'x' * 50}, time_msec=1000 + i)
+        self.assertEqual(3, len(journal.segments()))
+        entries = list(journal.replay())
+        self.assertEqual(list(range(entries[0].data['seq'], 20)), [e.data['seq'] for e in entries])
+        self.assertEqual([17, 18, 19], [e.data['seq'] for e in journal.replay(since_msec=1017)])
+        journal.close()
+
+    def test_raw_messages_are_compact(self):
+        journal = MessageJournal(self.directory.name)
+        journal.append_raw('{\n  "sender": "box1",\n  "message": {}\n}', time_msec=5)
+        journal.close()
+        with open(journal.segments()[0]) as file:
+            self.assertEqual('{"t":5,"k":"raw","d":{"sender":"box1","message":{}}}\n', file.read())
+
+
+class TestFetchTvReplay(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_history_and_replay(self):
+        fetchtv = FetchTV(journal=MessageJournal(self.directory.name), history_size=2)
+        handler = fetchtv._FetchTV__message_handler
+        start = int(time.time() * 1000)
+        handler.on_message(fixtures.frame('box1', 'I_AM_ALIVE', fixtures.box_json('box1')))
+        handler.on_message(fixtures.media_state_frame('box1', '2', 'PLAYING'))
+        handler.on_message(fixtures.media_state_frame('box1', '3', 'PAUSED'))
+        self.assertEqual(2, len(fetchtv.messages))
+        self.assertEqual('3', fetchtv.messages[-1].message['channel_id'])
+
+        replayed = []
+        self.assertEqual(3, fetchtv.replay_messages(replayed.append, start))
+        self.assertTrue(all(isinstance(m, SubscriberMessage) for m in replayed))
+        self.assertEqual('2', replayed[1].message['channel_id'])
+        fetchtv.close()
+
+        # A new instance rebuilds box state from the journal
+        rebuilt = FetchTV(journal=MessageJournal(self.directory.name))
+        self.assertEqual(3, rebuilt.rebuild_state(start))
+        self.assertEqual('3', rebuilt.get_box('box1').state.channel_id)
+        self.assertEqual(0, len(rebuilt.messages))
+        rebuilt.close()
+
+    def test_history_without_subscribers(self):
+        # Late consumers read the history, its payloads are built even with no subscriber or journal
+        fetchtv = FetchTV(history_size=2)
+        handler = fetchtv._FetchTV__message_handler
+        handler.on_message(fixtures.frame('box1', 'I_AM_ALIVE', fixtures.box_json('box1')))
+        handler.on_message(fixtures.media_state_frame('box1', '2', 'PLAYING'))
+        self.assertEqual('2', fetchtv.messages[-1].message['channel_id'])
+        fetchtv.close()
+        fetchtv = FetchTV(history_size=0)
+        handler = fetchtv._FetchTV__message_handler
+        self.assertFalse(handler.wants_message(MessageType.STATE, MessageTypeIn.MEDIA_STATE, 'box1'))
+        fetchtv.close()
+
+    def test_replay_requires_journal(self):
+        fetchtv = FetchTV()
+        with self.assertRaises(RuntimeError):
+            fetchtv.replay_messages(print)
+        with self.assertRaises(RuntimeError):
+            fetchtv.rebuild_state()
+        fetchtv.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
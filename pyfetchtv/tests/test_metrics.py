@@ -0,0 +1,101 @@
+import unittest
+import urllib.request
+
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_manager import FetchTvManager
+from pyfetchtv.api.helpers.metrics import MetricsRegistry, PrometheusExporter
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.tests.test_stand_in import wait_for, TIMEOUT
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter('messages', 'Messages', ('type',)).inc('PONG', amount=2)
+        registry.gauge('depth', 'Depth').set_function(lambda: 3)
+        histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 5]:
+            histogram.observe(value)
+
+        self.assertEqual(4, histogram.count())
+        self.assertEqual(5.65, histogram.sum())
+        self.assertEqual(
+            '# HELP fetchtv_depth Depth\n'
+            '# TYPE fetchtv_depth gauge\n'
+            'fetchtv_depth 3\n'
+            '# HELP fetchtv_latency_seconds Latency\n'
+            '# TYPE fetchtv_latency_seconds histogram\n'
+            'fetchtv_latency_seconds_bucket{le="0.1"} 2\n'
+            'fetchtv_latency_seconds_bucket{le="1.0"} 3\n'
+            'fetchtv_latency_seconds_bucket{le="+Inf"} 4\n'
+            'fetchtv_latency_seconds_count 4\n'
+            'fetchtv_latency_seconds_sum 5.65\n'
+            '# HELP fetchtv_messages Messages\n'
+            '# TYPE fetchtv_messages counter\n'
+            'fetchtv_messages_total{type="PONG"} 2\n',
+            registry.to_prometheus())
+
+    def test_disabled(self):
+        registry = MetricsRegistry(enabled=False)
+        registry.counter('messages', 'Messages').inc()
+        registry.histogram('latency_seconds', 'Latency').observe(1)
+        self.assertIsNone(registry.get('messages'))
+        self.assertEqual({}, registry.collect())
+
+    def test_type_conflict(self):
+        registry = MetricsRegistry()
+        registry.counter('messages', 'Messages')
+        with self.assertRaises(ValueError):
+            registry.gauge('messages', 'Messages')
+
+
+class TestFetchTvMetrics(unittest.TestCase):
+
+    def test_instrumented(self):
+        registry = MetricsRegistry()
+        with FetchTvStandIn() as stand_in:
+            fetchtv = FetchTV(metrics=registry, **stand_in.fetchtv_options)
+            exporter = PrometheusExporter(registry, port=0)
+            try:
+                fetchtv.login(stand_in.config.activation_code, stand_in.config.pin)
+                self.assertTrue(wait_for(lambda: fetchtv.get_boxes()))
+                fetchtv.get_box('box1').ping().result(TIMEOUT)
+                self.assertTrue(wait_for(lambda: registry.get('ping_rtt_seconds').count('box1') > 0))
+
+                self.assertEqual(1, registry.get('http_requests').value('login', '200'))
+                self.assertEqual(1, registry.get('http_request_seconds').count('login'))
+                self.assertGreaterEqual(registry.get('ws_messages_received').value('PONG'), 1)
+                self.assertGreaterEqual(registry.get('ws_messages_sent').value('PING'), 1)
+                self.assertEqual(1, registry.get('ws_connected').value(fetchtv.instance))
+
+                self.assertEqual('127.0.0.1', exporter._PrometheusExporter__server.server_address[0])
+                exporter.start()
+                with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics') as response:
+                    text = response.read().decode()
+                self.assertIn('fetchtv_ws_messages_received_total{type="PONG"}', text)
+            finally:
+                exporter.close()
+                fetchtv.close()
+        self.assertEqual([], registry.get('ws_connected').samples())
+
+    def test_accounts_share_registry(self):
+        registry = MetricsRegistry()
+        with FetchTvStandIn() as stand_in:
+            with FetchTvManager(metrics=registry, **stand_in.fetchtv_options) as manager:
+                first = manager.add_account('first', stand_in.config.activation_code, stand_in.config.pin)
+                manager.create_account('second')
+                self.assertTrue(wait_for(lambda: first.get_boxes()))
+                first.get_box('box1').ping().result(TIMEOUT)
+                connected = registry.get('ws_connected')
+                self.assertTrue(wait_for(lambda: connected.value('first') == 1))
+                self.assertEqual(0, connected.value('second'))
+                depths = registry.get('dispatch_queue_depth').samples()
+                self.assertEqual({'first', 'second'}, {labels['instance'] for _, labels, _ in depths})
+                manager.remove_account('second')
+                depths = registry.get('dispatch_queue_depth').samples()
+                self.assertEqual([{'instance': 'first'}], [labels for _, labels, _ in depths])
+
+
+if __name__ == '__main__':
+    unittest.main()
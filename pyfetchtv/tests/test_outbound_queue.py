@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageTypeOut
+from pyfetchtv.api.const.queue_result import QueueResult
+from pyfetchtv.api.helpers.outbound_queue import OutboundQueue
+
+
+class TestOutboundQueue(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, msg: dict):
+        with self.lock:
+            self.sent.append((time.monotonic(), msg))
+
+    def wait_for(self, count: int, timeout: float = 5):
+        end = time.monotonic() + timeout
+        while len(self.sent) < count and time.monotonic() < end:
+            time.sleep(0.01)
+
+    def test_coalesces_idempotent_messages(self):
+        queue = OutboundQueue('test', self.send, rate_per_sec=10, burst=1)
+        queue.put('box1', MessageTypeOut.KEYEVENT, {'seq': 1})
+        queue.put('box1', MessageTypeOut.KEYEVENT, {'seq': 2})
+        self.assertEqual(QueueResult.QUEUED, queue.put('box1', MessageTypeOut.MEDIA_STATE, {'seq': 3}))
+        self.assertEqual(QueueResult.COALESCED, queue.put('box1', MessageTypeOut.MEDIA_STATE, {'seq': 4}))
+        self.assertEqual(QueueResult.QUEUED, queue.put('box2', MessageTypeOut.MEDIA_STATE, {'seq': 5}))
+        self.wait_for(4)
+        queue.close()
+        self.assertEqual([1, 5, 2, 3], [msg['seq'] for _, msg in self.sent])
+        metrics = queue.metrics
+        self.assertEqual(5, metrics['queued'])
+        self.assertEqual(1, metrics['coalesced'])
+        self.assertEqual(4, metrics['sent'])
+
+    def test_rate_limit(self):
+        queue = OutboundQueue('test', self.send, rate_per_sec=20, burst=5)
+        for seq in range(15):
+            queue.put('box1', MessageTypeOut.KEYEVENT, {'seq': seq})
+        self.wait_for(15)
+        queue.close()
+        self.assertEqual(list(range(15)), [msg['seq'] for _, msg in self.sent])
+        # 5 sent as a burst, the remaining 10 at 20 per second
+        elapsed = self.sent[-1][0] - self.sent[0][0]
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    def test_disabled_sends_immediately(self):
+        queue = OutboundQueue('test', self.send, rate_per_sec=0)
+        queue.put('box1', MessageTypeOut.PING, {'seq': 1})
+        queue.put('box1', MessageTypeOut.PING, {'seq': 2})
+        self.assertEqual(2, len(self.sent))
+        queue.close()
+
+    def test_closed(self):
+        queue = OutboundQueue('test', self.send, rate_per_sec=10)
+        queue.close()
+        self.assertEqual(QueueResult.CLOSED, queue.put('box1', MessageTypeOut.MEDIA_STATE, {'seq': 1}))
+        self.assertEqual([], self.sent)
+
+
+if __name__ == '__main__':
+    unittest.main()
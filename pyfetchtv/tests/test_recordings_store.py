@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+
+from pyfetchtv.api.fetchtv_box import FetchTvBox
+from pyfetchtv.api.helpers.recordings_store import RecordingsStore
+from pyfetchtv.tests import fixtures
+from pyfetchtv.tests.test_fetchtv_box import _MessageHandler
+
+
+def _recording(recording_id: int, series_id: str = '', size: int = 1000, view_count: int = 0) -> dict:
+    recording = fixtures.recording_json(recording_id, series_id, size)
+    recording['viewCount'] = view_count
+    return recording
+
+
+class TestRecordingsStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.store = RecordingsStore()
+        self.box1 = FetchTvBox(_MessageHandler(), fixtures.box_json('box1', recordings=[
+            _recording(1, 's1', 500), _recording(2, 's1', 3000, view_count=1), _recording(3, '', 2000)],
+            series=[fixtures.series_json('s1')]), recordings_store=self.store)
+        self.box2 = FetchTvBox(_MessageHandler(), fixtures.box_json('box2', recordings=[
+            _recording(1, 's2', 4000)]), recordings_store=self.store)
+
+    def tearDown(self) -> None:
+        self.store.close()
+
+    def test_queries(self):
+        largest = self.store.recordings(order_by='size', descending=True, limit=2)
+        self.assertEqual([('box2', 1), ('box1', 2)], [(r['terminal_id'], r['id']) for r in largest])
+        self.assertEqual([1], [r['id'] for r in self.store.recordings(['box1'], series_id='s1', watched=False)])
+        self.assertEqual([1, 2, 3], [r['id'] for r in self.store.recordings(['box1'], order_by='created')])
+        self.assertEqual([3], [r['id'] for r in self.store.recordings(['box1'], order_by='created', offset=2)])
+        with self.assertRaises(ValueError):
+            self.store.recordings(order_by='size; DROP TABLE recordings')
+
+        by_series = self.store.space_by_series()
+        self.assertEqual([('box2', 's2', None, 4000, 1), ('box1', 's1', 'Series s1', 3500, 1),
+                          ('box1', '', None, 2000, 1)],
+                         [(r['terminal_id'], r['series_id'], r['name'], r['size'], r['unwatched']) for r in by_series])
+        self.assertEqual(['s1'], [s['id'] for s in self.store.series()])
+
+    def test_kept_in_sync_by_messages(self):
+        self.box1.process_message(json.loads(fixtures.frame('box1', 'PENDING_DELETE_RECORDINGS_BY_ID_SUCCESS', {
+            'recordingsIds': [2]})))
+        self.assertEqual([2], [r['id'] for r in self.store.recordings(['box1'], pending_delete=True)])
+
+        self.box1.process_message(json.loads(fixtures.frame('box1', 'RECORDINGS_UPDATE', {
+            'activeRecordings': [10],
+            'recordingUpdates': [{'eventName': 'RECORD_PROGRAM_SUCCESS', 'recording': _recording(10, 's1')}]})))
+        self.assertEqual([10], [r['id'] for r in self.store.future(['box1'])])
+        self.assertIn(10, [r['id'] for r in self.store.recordings(['box1'], series_id='s1')])
+
+        self.box1.process_message(json.loads(fixtures.frame('box1', 'RECORDINGS_UPDATE', {
+            'recordingUpdates': [{'eventName': 'SERIES_TAG_CANCELLED', 'seriesTag': {'id': 's1'}}]})))
+        self.assertEqual([], self.store.series(['box1']))
+
+        # A box reporting its full state replaces its rows
+        json_box = fixtures.box_json('box1', recordings=[_recording(3, '', 2000)])
+        self.box1.update(json_box)
+        self.assertEqual([3], [r['id'] for r in self.store.recordings(['box1'])])
+        self.assertEqual([], self.store.future(['box1']))
+        self.assertEqual([1], [r['id'] for r in self.store.recordings(['box2'])])
+
+        self.store.remove_box('box2')
+        self.assertEqual(['box1'], sorted({r['terminal_id'] for r in self.store.recordings()}))
+
+    def test_persists(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recordings.db')
+            with RecordingsStore(path) as store:
+                FetchTvBox(_MessageHandler(), fixtures.box_json('box1', recordings=[_recording(1)]),
+                           recordings_store=store)
+            with RecordingsStore(path) as store:
+                self.assertEqual([1], [r['id'] for r in store.recordings()])
+
+
+if __name__ == '__main__':
+    unittest.main()
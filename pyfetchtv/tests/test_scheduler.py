@@ -0,0 +1,64 @@
+import threading
+import time
+import unittest
+
+from pyfetchtv.api.helpers.scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler('test')
+
+    def tearDown(self):
+        self.scheduler.close()
+
+    def test_runs_in_due_order(self):
+        order = []
+        done = threading.Event()
+        self.scheduler.schedule(0.1, lambda: (order.append('late'), done.set()))
+        self.scheduler.schedule(0.02, lambda: order.append('early'))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(['early', 'late'], order)
+
+    def test_periodic_until_cancelled(self):
+        runs = []
+        task = self.scheduler.every(0.01, lambda: runs.append(1))
+        deadline = time.monotonic() + 2
+        while len(runs) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        task.cancel()
+        time.sleep(0.05)
+        count = len(runs)
+        time.sleep(0.05)
+        self.assertGreaterEqual(count, 3)
+        self.assertEqual(count, len(runs))
+        self.assertEqual(0, len(self.scheduler))
+
+    def test_failing_task_keeps_running(self):
+        runs = []
+
+        def fail():
+            runs.append(1)
+            raise ValueError('boom')
+
+        self.scheduler.every(0.01, fail)
+        deadline = time.monotonic() + 2
+        while len(runs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(len(runs), 2)
+
+    def test_close_is_immediate(self):
+        runs = []
+        self.scheduler.schedule(60, lambda: runs.append(1))
+        start = time.monotonic()
+        self.scheduler.close()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertTrue(self.scheduler.is_closed)
+        task = self.scheduler.schedule(0, lambda: runs.append(1))
+        self.assertTrue(task.cancelled)
+        self.assertEqual([], runs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from pyfetchtv.api.helpers import json_patch
+from pyfetchtv.api.helpers.snapshot import VersionedSnapshot, REMOVED
+
+
+class TestJsonPatch(unittest.TestCase):
+
+    def test_diff_and_apply(self):
+        old = {'state': {'channel_id': '1', 'title': 'A'}, 'recordings': {'1': {'id': 1}, '2': {'id': 2}},
+               'active': [1], 'a/b': 1}
+        new = {'state': {'channel_id': '2', 'title': 'A'}, 'recordings': {'1': {'id': 1}, '3': {'id': 3}},
+               'active': [1, 3], 'a/b': 2}
+        patch = json_patch.diff(old, new)
+        self.assertEqual([
+            {'op': 'replace', 'path': '/state/channel_id', 'value': '2'},
+            {'op': 'remove', 'path': '/recordings/2'},
+            {'op': 'add', 'path': '/recordings/3', 'value': {'id': 3}},
+            {'op': 'replace', 'path': '/active', 'value': [1, 3]},
+            {'op': 'replace', 'path': '/a~1b', 'value': 2}], patch)
+        self.assertEqual(new, json_patch.apply(old, patch))
+        self.assertEqual([], json_patch.diff(new, new))
+        # Equal values of different types still change
+        self.assertEqual([{'op': 'replace', 'path': '', 'value': True}], json_patch.diff(1, True))
+
+
+class TestVersionedSnapshot(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.snapshot = VersionedSnapshot(history_size=3)
+        self.snapshot.update({('state',): {'channel_id': '1'}, ('recordings',): {'1': {'id': 1}}})
+
+    def test_versions(self):
+        self.assertEqual(1, self.snapshot.version)
+        self.assertIsNone(self.snapshot.update({('state',): {'channel_id': '1'}, ('recordings', '2'): REMOVED}))
+        change = self.snapshot.update({('recordings', '2'): {'id': 2}})
+        self.assertEqual({'version': 2, 'base_version': 1,
+                          'patch': [{'op': 'add', 'path': '/recordings/2', 'value': {'id': 2}}]}, change)
+        change = self.snapshot.update({('recordings', '1'): REMOVED, ('state',): {'channel_id': '3'}})
+        self.assertEqual(3, change['version'])
+        self.assertEqual({'state': {'channel_id': '3'}, 'recordings': {'2': {'id': 2}}},
+                         self.snapshot.snapshot()['data'])
+
+    def test_patches_since(self):
+        old = self.snapshot.snapshot()
+        self.snapshot.update({('recordings', '2'): {'id': 2}})
+        self.snapshot.update({('recordings', '1'): REMOVED})
+        change = self.snapshot.patches_since(old['version'])
+        self.assertEqual((3, 1), (change['version'], change['base_version']))
+        self.assertEqual(self.snapshot.snapshot()['data'], json_patch.apply(old['data'], change['patch']))
+        self.assertEqual([], self.snapshot.patches_since(3)['patch'])
+
+        # Only the last history_size patches are kept
+        for i in range(3):
+            self.snapshot.update({('state',): {'channel_id': str(i)}})
+        self.assertIsNone(self.snapshot.patches_since(old['version']))
+        self.assertIsNone(self.snapshot.patches_since(99))
+        self.assertIsNotNone(self.snapshot.patches_since(3))
+
+    def test_patches_are_not_changed(self):
+        first = self.snapshot.patches_since(0)
+        self.snapshot.update({('recordings', '1'): REMOVED})
+        self.assertEqual({'1': {'id': 1}}, first['patch'][1]['value'])
+        held = self.snapshot.snapshot()
+        held['data']['state']['channel_id'] = 'changed'
+        self.assertEqual('1', self.snapshot.snapshot()['data']['state']['channel_id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
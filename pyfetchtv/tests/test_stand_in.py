@@ -0,0 +1,118 @@
+import time
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.const.urls import PATH_EPG
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_box_interface import RecordProgramParameters
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.testing.synthetic import SyntheticConfig
+
+TIMEOUT = 5
+
+
+def wait_for(condition, timeout=TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+class TestStandIn(unittest.TestCase):
+    """
+    End-to-end against the local stand-in, no network access required.
+    """
+
+    def setUp(self) -> None:
+        self.config = SyntheticConfig(boxes=2, channels=5, recordings=10)
+        self.stand_in = FetchTvStandIn(self.config)
+        self.stand_in.start()
+        self.fetchtv = FetchTV(**self.stand_in.fetchtv_options)
+
+    def tearDown(self) -> None:
+        self.fetchtv.close()
+        self.stand_in.close()
+
+    def login(self):
+        self.assertTrue(self.fetchtv.login(self.config.activation_code, self.config.pin))
+        self.assertTrue(wait_for(lambda: len(self.fetchtv.get_boxes()) == 2))
+
+    def test_login(self):
+        self.assertFalse(self.fetchtv.login('wrong', 'wrong'))
+        self.assertFalse(self.fetchtv.is_connected)
+        self.login()
+        self.assertTrue(self.fetchtv.is_connected)
+        box = self.fetchtv.get_box('box1')
+        self.assertEqual(10, len(box.recordings.items))
+        self.assertTrue(wait_for(lambda: 'channels' in self.fetchtv.epg))
+        self.assertEqual(5, len(self.fetchtv.get_epg()))
+        self.assertIsNotNone(box.get_current_program())
+
+    def test_commands(self):
+        received = []
+        self.fetchtv.add_subscriber('test', received.append, groups=[MessageType.RECORDING])
+        self.login()
+        box = self.fetchtv.get_box('box1')
+        box.record_program(RecordProgramParameters(channel_id='1', program_id='p1', epg_program_id='e1')) \
+            .result(TIMEOUT)
+        self.assertTrue(wait_for(lambda: len(received) == 1))
+        self.assertEqual(MessageTypeIn.RECORD_PROGRAM_SUCCESS, received[0].command)
+        self.assertEqual(['p1'], [r.program_id for r in box.recordings.future.values()])
+
+        box.delete_recordings([1, 2]).result(TIMEOUT)
+        self.assertEqual([1, 2], sorted(r.id for r in box.recordings.pending_delete))
+
+    def test_readiness(self):
+        # A slow EPG download doesn't hold up the boxes or their commands
+        self.stand_in.add_fault(PATH_EPG, status=0, delay_sec=1.5)
+        self.assertTrue(self.fetchtv.login(self.config.activation_code, self.config.pin))
+        boxes = self.fetchtv.boxes_ready.result(TIMEOUT)
+        self.assertEqual(['box1', 'box2'], sorted(boxes.keys()))
+        box = self.fetchtv.get_box('box2')
+        box.record_program(RecordProgramParameters(channel_id='1', program_id='p1', epg_program_id='e1')) \
+            .result(TIMEOUT)
+        self.assertFalse(self.fetchtv.epg_ready.done())
+        self.assertEqual(5, len(self.fetchtv.epg_ready.result(TIMEOUT)['channels']))
+        self.assertEqual(5, len(self.fetchtv.epg_channels))
+
+    def test_readiness_without_every_box(self):
+        # A deactivated box is never waited for, a switched off one only until boxes_ready_timeout_sec
+        config = SyntheticConfig(boxes=1, channels=2, recordings=2, inactive_boxes=1)
+        with FetchTvStandIn(config) as stand_in, FetchTV(**stand_in.fetchtv_options) as fetchtv:
+            self.assertTrue(fetchtv.login(config.activation_code, config.pin))
+            self.assertEqual(['box1'], list(fetchtv.boxes_ready.result(TIMEOUT).keys()))
+        config = SyntheticConfig(boxes=1, channels=2, recordings=2, offline_boxes=1)
+        with FetchTvStandIn(config) as stand_in, \
+                FetchTV(boxes_ready_timeout_sec=2, **stand_in.fetchtv_options) as fetchtv:
+            self.assertTrue(fetchtv.login(config.activation_code, config.pin))
+            self.assertTrue(wait_for(lambda: fetchtv.get_box('box1')))
+            self.assertFalse(fetchtv.boxes_ready.done())
+            self.assertEqual(['box1'], list(fetchtv.boxes_ready.result(TIMEOUT).keys()))
+
+    def test_reconnects(self):
+        self.login()
+        self.stand_in.drop_connections()
+        self.assertTrue(wait_for(lambda: self.stand_in.stats['connections'] == 2, timeout=10))
+        self.assertTrue(wait_for(lambda: self.fetchtv.is_connected))
+        self.assertEqual('PONG', self.fetchtv.get_box('box2').ping().result(TIMEOUT)['type'])
+
+    def test_reconnects_after_missed_pongs(self):
+        self.fetchtv.close()
+        self.fetchtv = FetchTV(ping_sec=0.2, max_missed_pongs=2, **self.stand_in.fetchtv_options)
+        self.login()
+        self.assertTrue(wait_for(lambda: self.stand_in.received('PING') > 0))
+        alive = self.stand_in.received('ARE_YOU_ALIVE')
+        media_state = self.stand_in.received('MEDIA_STATE')
+        self.stand_in.silence()
+        # Nothing answers the pings, the connection is replaced
+        self.assertTrue(wait_for(lambda: self.stand_in.stats['connections'] == 2))
+        # Then each box is asked for its state again
+        self.assertTrue(wait_for(lambda: self.stand_in.received('ARE_YOU_ALIVE') >= alive + 2))
+        self.assertTrue(wait_for(lambda: self.stand_in.received('MEDIA_STATE') >= media_state + 2))
+        self.assertEqual('PONG', self.fetchtv.get_box('box1').ping().result(TIMEOUT)['type'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from pyfetchtv.api.const.message_types import MessageType, MessageTypeIn
+from pyfetchtv.api.helpers.subscriptions import SubscriptionTable
+
+
+def _callback(msg):
+    pass
+
+
+def _other(msg):
+    pass
+
+
+class TestSubscriptionTable(unittest.TestCase):
+
+    def test_unfiltered_matches_everything(self):
+        table = SubscriptionTable()
+        table.add('all', _callback)
+        self.assertEqual([_callback], table.match(MessageType.STATE, MessageTypeIn.PAUSED, 'box1'))
+        self.assertEqual([_callback], table.match(MessageType.BOX, MessageTypeIn.BOX_FOUND, 'box2'))
+
+    def test_filters_combine(self):
+        table = SubscriptionTable()
+        table.add('state', _callback, groups=[MessageType.STATE], terminal_ids=['box1'])
+        table.add('deletes', _other, commands=[MessageTypeIn.RECORDINGS_DELETE])
+        self.assertEqual([_callback], table.match(MessageType.STATE, MessageTypeIn.PAUSED, 'box1'))
+        self.assertEqual([], table.match(MessageType.STATE, MessageTypeIn.PAUSED, 'box2'))
+        self.assertEqual([], table.match(MessageType.BOX, MessageTypeIn.BOX_FOUND, 'box1'))
+        self.assertEqual([_other], table.match(MessageType.RECORDINGS, MessageTypeIn.RECORDINGS_DELETE, 'box2'))
+
+    def test_remove_and_replace(self):
+        table = SubscriptionTable()
+        table.add('sub', _callback, groups=[MessageType.STATE])
+        self.assertEqual([_callback], table.match(MessageType.STATE, MessageTypeIn.PAUSED, 'box1'))
+        table.add('sub', _other, groups=[MessageType.SERIES])
+        self.assertEqual([], table.match(MessageType.STATE, MessageTypeIn.PAUSED, 'box1'))
+        self.assertEqual([_other], table.match(MessageType.SERIES, MessageTypeIn.SERIES_ADDED, 'box1'))
+        table.remove('sub')
+        self.assertEqual(0, len(table))
+        self.assertEqual([], table.match(MessageType.SERIES, MessageTypeIn.SERIES_ADDED, 'box1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
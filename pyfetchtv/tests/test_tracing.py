@@ -0,0 +1,68 @@
+import unittest
+
+from pyfetchtv.api.fetchtv import FetchTV
+from pyfetchtv.api.fetchtv_box_interface import RecordProgramParameters
+from pyfetchtv.api.helpers.tracing import Tracer, RecordingHook, OpenTelemetryHook
+from pyfetchtv.testing.server import FetchTvStandIn
+from pyfetchtv.tests.test_stand_in import wait_for, TIMEOUT
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_disabled_without_hooks(self):
+        tracer = Tracer()
+        span = tracer.start_span('http', action='login')
+        span.finish()
+        self.assertFalse(tracer.enabled)
+        self.assertIsNone(span.context_id)
+
+    def test_hooks(self):
+        hook = RecordingHook()
+        tracer = Tracer([hook])
+        span = tracer.start_span('command', 'box1_1', type='PING')
+        span.add_event('sent')
+        span.finish()
+        span.finish(ValueError('ignored'))
+        self.assertEqual([span], hook.find(context_id='box1_1'))
+        self.assertIsNone(span.error)
+        self.assertEqual(['sent'], [name for name, _ in span.events])
+        self.assertGreaterEqual(span.duration, 0)
+
+    def test_open_telemetry_optional(self):
+        # A no-op when opentelemetry is not installed
+        hook = OpenTelemetryHook()
+        tracer = Tracer([hook])
+        tracer.start_span('http').finish()
+
+
+class TestFetchTvTracing(unittest.TestCase):
+
+    def test_command_and_response_one_span(self):
+        hook = RecordingHook()
+        with FetchTvStandIn() as stand_in:
+            fetchtv = FetchTV(tracer=Tracer([hook]), **stand_in.fetchtv_options)
+            try:
+                fetchtv.login(stand_in.config.activation_code, stand_in.config.pin)
+                self.assertTrue(wait_for(lambda: fetchtv.get_boxes()))
+                fetchtv.add_subscriber('test', lambda msg: None)
+                fetchtv.get_box('box1').record_program(
+                    RecordProgramParameters(channel_id='1', epg_program_id='e1', program_id='p1')).result(TIMEOUT)
+                self.assertTrue(wait_for(lambda: hook.find('dispatch')))
+            finally:
+                fetchtv.close()
+
+        # The EPG channels are fetched while logging in
+        logins = [s for s in hook.find('http') if s.attributes['action'] == 'login']
+        self.assertEqual(1, len(logins))
+        self.assertEqual(200, logins[0].attributes['status'])
+        commands = [s for s in hook.find('command') if s.attributes['type'] == 'RECORD_PROGRAM']
+        self.assertEqual(1, len(commands))
+        command = commands[0]
+        self.assertEqual('RECORDINGS_UPDATE', command.attributes['response_type'])
+        self.assertEqual(['sent'], [name for name, _ in command.events])
+        self.assertTrue(command.context_id.startswith('box1_'))
+        self.assertTrue(any(s.attributes['type'] == 'RECORDINGS_UPDATE' for s in hook.find('message')))
+
+
+if __name__ == '__main__':
+    unittest.main()